@@ -3,7 +3,6 @@ from datetime import datetime
 import sys, os, time
 import requests
 
-from flask_sqlalchemy import SQLAlchemy
 
 from flask import Flask, render_template, g
 from flask_login import LoginManager, current_user
@@ -32,7 +31,9 @@ app.config.from_object('config.ActivityVolumeSettings')
 
 # Define the database object which is imported
 # by modules and views
-db = SQLAlchemy(app)
+# its engines are tuned for their backend (see GameSQLAlchemy)
+from app.server.database import GameSQLAlchemy
+db = GameSQLAlchemy(app)
 
 # Import a module / component using its blueprint handler variable (mod_auth)
 from app.server.views import main
@@ -0,0 +1,79 @@
+"""
+Run a game headless, without the web app
+
+The scenario is read from app/game_configs, like a game started from the admin page
+e.g.
+    python -m app.server.cli --debug
+    python -m app.server.cli --live --time-multiplier 2000
+    python -m app.server.cli --set RATE_USER_AUTHS_FROM_WORK=0.5 --set ORDER_OUTPUT=False
+    python -m app.server.cli --state-db sqlite:////tmp/run1.db
+    python -m app.server.cli --replay-spool
+"""
+import ast
+import argparse
+
+# Import internal modules
+from app import before_first_request
+from app.server.models import db, GameSession
+from app.server.settings import gameSettings
+from app.server.game_functions import start_game
+from app.server.modules.logging.ingestion import ReliableIngestClient
+from app.server.modules.logging.kusto_clients import kustoClients
+
+
+def parse_setting(setting: str) -> "tuple[str, object]":
+    """
+    Parse a KEY=VALUE setting, the value is read as a python literal if it is one
+    e.g. "LIVE_LOOKAHEAD_DAYS=2" -> ("LIVE_LOOKAHEAD_DAYS", 2)
+    """
+    key, _, value = setting.partition("=")
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    return key.strip().upper(), value
+
+
+def main(argv: "list[str]" = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a game headless")
+    parser.add_argument("--debug", action="store_true",
+                        help="don't write to Azure (ADX_DEBUG_MODE)")
+    parser.add_argument("--live", action="store_true",
+                        help="stream logs as the game clock passes them (LIVE_MODE)")
+    parser.add_argument("--time-multiplier", type=int,
+                        help="how much faster than real time a live game runs")
+    parser.add_argument("--set", dest="settings", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a setting from config.py, can be given multiple times")
+    parser.add_argument("--state-db", metavar="URL",
+                        help="database URL for this run's game state (instead of GAME_STATE_DATABASE_URI)")
+    parser.add_argument("--replay-spool", action="store_true",
+                        help="upload the batches that failed to upload (INGEST_SPOOL_DIR) again, instead of running a game")
+    args = parser.parse_args(argv)
+
+    if args.state_db:
+        db.set_bind_url("game_state", args.state_db)
+
+    # overrides also apply to replays, e.g. INGEST_SPOOL_DIR and the retry settings
+    gameSettings.update(dict(parse_setting(setting) for setting in args.settings))
+
+    if args.replay_spool:
+        count_uploaded, count_failed = ReliableIngestClient(kustoClients.get_ingest_client()).replay()
+        print(f"Replayed {count_uploaded} spooled batches, {count_failed} failed and are still spooled")
+        return
+    if args.debug:
+        gameSettings.ADX_DEBUG_MODE = True
+    if args.live:
+        gameSettings.LIVE_MODE = True
+
+    # make sure the admin team and the game session exist, as the web app does on its first request
+    before_first_request()
+    if args.time_multiplier:
+        current_session = db.session.query(GameSession).get(1)
+        current_session.time_multiplier = args.time_multiplier
+        db.session.commit()
+
+    start_game()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+from functools import partial
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record, pragmas: dict) -> None:
+    """
+    Run PRAGMA statements on every new SQLite connection
+    e.g. {"journal_mode": "WAL"} -> PRAGMA journal_mode=WAL
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma, value in pragmas.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+class GameSQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy with engines tuned for the backend behind each database URL
+
+    - SQLite connections are set up with SQLITE_PRAGMAS from the config (WAL journaling etc.) when they are opened,
+      and keep Flask-SQLAlchemy's default pool, so the game and the views never share a connection
+    - any other backend (e.g. Postgres) gets a connection pool configured by DATABASE_POOL_OPTIONS
+    """
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        if not sa_url.drivername.startswith("sqlite"):
+            for option, value in app.config["DATABASE_POOL_OPTIONS"].items():
+                options.setdefault(option, value)
+        return super().apply_driver_hacks(app, sa_url, options)
+
+    def set_bind_url(self, bind: str, url: str) -> None:
+        """
+        Point a bind at another database, e.g. to give a run its own game state database
+        The engine is recreated on its next use, and missing tables are created
+        """
+        app = self.get_app()
+        self.session.remove()
+        self.get_engine(app, bind=bind).dispose()
+        app.config["SQLALCHEMY_BINDS"] = {**app.config["SQLALCHEMY_BINDS"], bind: url}
+        self.create_all(bind=bind)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", partial(set_sqlite_pragmas, pragmas=self.get_app().config["SQLITE_PRAGMAS"]))
+        return engine
@@ -1,14 +1,16 @@
 import glob
-from flask_security import roles_required
-
-from flask import Blueprint, request, render_template, \
-                  flash, g, session, redirect, url_for, abort, current_app, jsonify
+import copy
+import random
+import numpy as np
 from sqlalchemy import asc
 from  sqlalchemy.sql.expression import func, select
 from datetime import datetime, date, time, timedelta
+from time import sleep
+from contextlib import contextmanager
 
 # Import module models (i.e. Company, Employee, Actor, DNSRecord)
 from app.server.models import db, GameSession
+from app.server.settings import gameSettings
 from app.server.modules.organization.Company import Company, Employee
 from app.server.modules.infrastructure.DNSRecord import DNSRecord
 from app.server.modules.logging.uploadLogs import LogUploader
@@ -23,6 +25,17 @@ from app.server.modules.helpers.config_helper import read_config_from_yaml
 from app.server.modules.endpoints.endpoint_controller import gen_system_files_on_host, gen_user_files_on_host, gen_system_processes_on_host
 from app.server.modules.file.malware import Malware
 from app.server.modules.helpers.config_helper import load_malware_obj_from_yaml_by_file, read_list_from_file
+from app.server.modules.helpers.identifier_factory import identifierFactory
+from app.server.modules.helpers.faker_pool import fakerPool
+from app.server.modules.helpers.memory_budget import memoryBudget
+from app.server.modules.logging.rate_limiter import ingestionGovernor
+from app.server.modules.infrastructure.address_allocator import addressAllocator
+from app.server.modules.infrastructure.Infrastructure import Domain, IP
+from app.server.modules.infrastructure.noise_domain_pool import noiseDomainPool
+from app.server.modules.infrastructure.infrastructure_graph import InfrastructureGraph
+from app.server.modules.triggers.scheduler import eventScheduler
+from app.server.modules.helpers.url_synthesizer import URLSynthesizer
+from app.server.modules.clock.Clock import GameClock
 
 from app.server.utils import *
 from app.server.modules.file.vt_seed_files import FILES_MALICIOUS_VT_SEED_HASHES
@@ -38,10 +51,19 @@ def start_game() -> None:
     """
     print("Starting the game...")
 
+    # with an IDENTIFIER_SEED, every random generator of the game starts from it
+    if gameSettings.IDENTIFIER_SEED is not None:
+        seed_random_generators(gameSettings.IDENTIFIER_SEED)
+
     # instantiate a logUploader. This instance is used by all other modules to send logs to azure
     # we use a singular instances in order to queue up muliple rows of logs and send them all at once
     global LOG_UPLOADER
-    LOG_UPLOADER = LogUploader(queue_limit=10000)
+    LOG_UPLOADER = LogUploader(queue_limit=gameSettings.LOG_QUEUE_LIMIT)
+    ingestionGovernor.reset(rows_per_second=gameSettings.INGEST_ROWS_PER_SECOND,
+                            bytes_per_second=gameSettings.INGEST_BYTES_PER_SECOND,
+                            target_latency=gameSettings.INGEST_TARGET_LATENCY_SECONDS,
+                            min_batch_rows=gameSettings.INGEST_MIN_BATCH_ROWS,
+                            max_batch_rows=gameSettings.INGEST_MAX_BATCH_ROWS)
     LOG_UPLOADER.create_tables(reset=True)
 
     global MALWARE_OBJECTS
@@ -50,6 +72,29 @@ def start_game() -> None:
     global LEGIT_DOMAINS # Legit omains from Alex top 1M
     LEGIT_DOMAINS = read_list_from_file('app/server/modules/helpers/alexa_top100k.txt')
 
+    # hashes, IPs, uuids, hostnames and user agents all come from one seeded stream
+    identifierFactory.seed(gameSettings.IDENTIFIER_SEED)
+    fakerPool.configure(pool_size=gameSettings.FAKER_POOL_SIZE,
+                        refill_after=gameSettings.FAKER_POOL_REFILL_AFTER,
+                        refill_fraction=gameSettings.FAKER_POOL_REFILL_FRACTION)
+
+    # public IPs that are already in use can't be handed out again
+    addressAllocator.reset()
+    addressAllocator.reserve([address for address, in db.session.query(IP.address)])
+    addressAllocator.reserve([address for address, in db.session.query(Employee.home_ip_addr)])
+
+    noiseDomainPool.reset(capacity=gameSettings.NOISE_DOMAIN_POOL_SIZE)
+    InfrastructureGraph.reset()
+    eventScheduler.reset()
+    URLSynthesizer.reset()
+
+    # what to release when the game goes over its memory budget
+    memoryBudget.reset(budget_mb=gameSettings.MEMORY_BUDGET_MB, check_interval=gameSettings.MEMORY_CHECK_INTERVAL_ROWS)
+    memoryBudget.register("logs", LOG_UPLOADER.spill)
+    memoryBudget.register("infrastructure", InfrastructureGraph.persist_all)
+    memoryBudget.register("session", spill_session_objects)
+    publish_progress()
+
     # The is current game session
     # This data object tracks whether or not the game is currently running
     # It allows us to start/stop/restart the game from the views
@@ -71,28 +116,87 @@ def start_game() -> None:
     # You can customize the length of the game in the company.yaml config file
     company = Company.query.get(1)
     current_date = date.fromisoformat(company.activity_start_date)
-    while current_date <= date.fromisoformat(company.activity_end_date):
+    end_date = date.fromisoformat(company.activity_end_date)
+
+    # In live mode, the game clock starts at the first day of activity when the game starts in real life
+    # each day is generated LIVE_LOOKAHEAD_DAYS before the clock reaches it,
+    # and rows are uploaded as the clock passes them
+    game_clock = None
+    if gameSettings.LIVE_MODE:
+        game_clock = GameClock(game_start=datetime.combine(current_date, datetime.min.time()).timestamp(),
+                               time_multiplier=current_session.time_multiplier)
+        current_session.start_time = str(game_clock.real_start)
+        db.session.commit()
+        print(f"Live game clock running {game_clock.time_multiplier}x faster than real time")
+
+    is_stopped = False
+    while current_date <= end_date:
+        if game_clock:
+            lookahead = timedelta(days=gameSettings.LIVE_LOOKAHEAD_DAYS)
+            day_start = datetime.combine(current_date - lookahead, datetime.min.time()).timestamp()
+            # rows are backdated up to ORDERING_WATERMARK_LAG_DAYS before the day they are generated on
+            # so only rows before that are complete, however far the game clock has run
+            release_limit = datetime.combine(current_date - timedelta(days=gameSettings.ORDERING_WATERMARK_LAG_DAYS), datetime.min.time()).timestamp()
+            if not stream_live_logs(game_clock, until=day_start, current_session=current_session, release_limit=release_limit):
+                is_stopped = True
+                break
+
         print("##########################################")
         print(f"## Running for day {current_date}...")
         print("##########################################")
         
-        for actor in actors: 
-            if actor.is_default_actor:
-                # Default actor is used to create noise
-                generate_activity_new(actor, current_date, employees, num_passive_dns=200) 
-            else:
-                # generate activity of actors defined in actor config
-                # num_email is actually number of emails waves sent
-                # waves contain multiple emails
-                # TODO: abstract this out to the actor / make this more elegant
-                generate_activity_new(actor, 
-                                  current_date,
-                                  employees, 
-                                  num_passive_dns=random.randint(5, 10), 
-                                  num_email=random.randint(0, 3)
-                )
-
-        current_date += timedelta(days=1)
+        with day_unit_of_work():
+            for actor in actors: 
+                if actor.is_default_actor:
+                    # Default actor is used to create noise
+                    generate_activity_new(actor, current_date, employees, num_passive_dns=200) 
+                else:
+                    # generate activity of actors defined in actor config
+                    # num_email is actually number of emails waves sent
+                    # waves contain multiple emails
+                    # TODO: abstract this out to the actor / make this more elegant
+                    generate_activity_new(actor, 
+                                      current_date,
+                                      employees, 
+                                      num_passive_dns=random.randint(5, 10), 
+                                      num_email=random.randint(0, 3)
+                    )
+
+            current_date += timedelta(days=1)
+
+            # release the trigger stages (clicks, downloads, payloads...) that happen before the next day starts
+            count_actions = eventScheduler.run_until(datetime.combine(current_date, datetime.min.time()).timestamp())
+            print(f"Ran {count_actions} scheduled trigger actions, {len(eventScheduler)} still scheduled")
+
+        memoryBudget.check()
+
+        # upload the rows that no later event can come before
+        # live games upload rows as the game clock passes them instead
+        LOG_UPLOADER.flush()
+        if not game_clock:
+            watermark_date = current_date - timedelta(days=gameSettings.ORDERING_WATERMARK_LAG_DAYS)
+            LOG_UPLOADER.release(watermark=Clock.from_timestamp_to_string(datetime.combine(watermark_date, datetime.min.time()).timestamp()))
+        publish_progress()
+
+    if not is_stopped:
+        # run the trigger stages that fall after the end of the game
+        with day_unit_of_work():
+            eventScheduler.drain()
+        if game_clock:
+            game_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time()).timestamp()
+            is_stopped = not stream_live_logs(game_clock, until=game_end, current_session=current_session)
+
+    if is_stopped:
+        # the game clock hasn't reached the rows that are still held,
+        # uploading them now would show players activity from the future
+        print("Game stopped")
+        LOG_UPLOADER.discard()
+    else:
+        LOG_UPLOADER.finalize()
+    publish_progress()
+    InfrastructureGraph.export_all(gameSettings.INFRASTRUCTURE_EXPORT_DIR)
+    print(f"Memory: {memoryBudget.get_stats()}")
+    print(f"Ingestion: {LOG_UPLOADER.ingest.get_stats()}")
     print("Done running!")
 
     # count_cycles = 10
@@ -131,6 +235,131 @@ def start_game() -> None:
     # ##########################################
 
 
+@contextmanager
+def day_unit_of_work():
+    """
+    Scope the database work of one simulated day
+
+    At the end of the day, the day's new actor infrastructure is bulk inserted and committed
+    in one go, and the write-once infrastructure objects are expunged, so the session's identity map
+    (and the time each commit takes) doesn't grow over the game.
+    Actors and employees are read on every day, so they aren't expired (and reloaded) on commit
+    """
+    session = db.session()
+    expire_on_commit, session.expire_on_commit = session.expire_on_commit, False
+    # memory spills during the day only flush, see spill_session_objects
+    session.info["in_unit_of_work"] = True
+    try:
+        yield session
+
+        commit_start = datetime.now()
+        count_nodes = InfrastructureGraph.persist_all()
+        count_objects = release_session_objects()
+        print(f"Committed {count_nodes} new infrastructure nodes in {(datetime.now() - commit_start).total_seconds():.3f}s, expunged {count_objects} objects")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.expire_on_commit = expire_on_commit
+        session.info["in_unit_of_work"] = False
+
+
+def seed_random_generators(seed: int) -> None:
+    """
+    Seed python's random, numpy's global generator and the Faker pool,
+    so a new game with the same seed makes the same choices
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    fakerPool.fake.seed_instance(seed)
+
+
+# progress of the running game, published by the game's thread for the admin progress endpoint
+# it is replaced as a whole, so readers never see the uploader's dicts while they change
+PROGRESS = {}
+
+
+def publish_progress() -> None:
+    """
+    Copy the game's progress, called from the thread that runs the game
+    """
+    global PROGRESS
+    progress = {
+        "memory": memoryBudget.get_stats(),
+        "ingestion": ingestionGovernor.get_stats()
+    }
+    log_uploader = globals().get("LOG_UPLOADER")
+    if log_uploader:
+        # time up to which each table has been uploaded
+        progress["watermarks"] = log_uploader.watermarks
+        progress["late_rows"] = log_uploader.count_late_rows
+        progress["queued_rows"] = log_uploader.get_queue_length()
+        progress["upload_errors"] = log_uploader.ingest.get_stats()
+    PROGRESS = copy.deepcopy(progress)
+
+
+def get_progress() -> dict:
+    """
+    Progress of the running game, for the admin progress endpoint
+    """
+    current_session = db.session.query(GameSession).get(1)
+    return {
+        "state": current_session.state if current_session else False,
+        **PROGRESS
+    }
+
+
+def release_session_objects(commit: bool = True) -> int:
+    """
+    Commit (or only flush) the session and expunge the infrastructure objects it holds
+    Actors and employees stay in the session, they are used on every day of the game
+    Returns the number of objects expunged
+    """
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+    objects = [obj for obj in db.session.identity_map.values() if isinstance(obj, (DNSRecord, Domain, IP))]
+    for obj in objects:
+        db.session.expunge(obj)
+    return len(objects)
+
+
+def spill_session_objects() -> int:
+    """
+    Release the session's objects when the game is over its memory budget
+    Inside a day's unit of work, the objects are flushed and expunged without committing,
+    so the day is still committed (or rolled back) as a whole
+    """
+    return release_session_objects(commit=not db.session().info.get("in_unit_of_work", False))
+
+
+def stream_live_logs(game_clock: GameClock, until: float, current_session: GameSession, release_limit: float = None) -> bool:
+    """
+    Upload held rows as the game clock passes them, until the game clock reaches until
+    Rows after release_limit are held even when the clock has passed them,
+    as rows before them may still be generated
+
+    Returns False if the game was stopped in the meantime
+    """
+    interval = gameSettings.LIVE_RELEASE_INTERVAL_SECONDS
+    LOG_UPLOADER.flush()
+    while True:
+        watermark = game_clock.now() if release_limit is None else min(game_clock.now(), release_limit)
+        LOG_UPLOADER.release(watermark=Clock.from_timestamp_to_string(watermark))
+        publish_progress()
+
+        # the game can be stopped from the views
+        db.session.refresh(current_session)
+        if not current_session.state:
+            return False
+
+        seconds_left = game_clock.seconds_until(until)
+        if not seconds_left:
+            return True
+        sleep(min(interval, seconds_left))
+
+
 def init_setup():
     """
     These actions are conducted at the start of a new game session
@@ -230,7 +459,7 @@ def generate_activity_new(actor: Actor,
     if date.fromisoformat(actor.activity_start_date) <= current_date <= date.fromisoformat(actor.activity_end_date) and\
         Clock.weekday_to_string(current_date.weekday()) in actor.working_days_list:
         # There's a 10% chance the actor will take the day off
-        if random.random() <= current_app.config['ACTOR_SKIPS_DAY_RATE']:
+        if random.random() <= gameSettings.ACTOR_SKIPS_DAY_RATE:
             print(f"Actor {actor} is randomly taking a day off today: {current_date}!")
             return
         print(f"Generating activity for actor {actor.name}")
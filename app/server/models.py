@@ -2,8 +2,6 @@ import random
 import string
 import json
 import datetime
-from faker import Faker
-from faker.providers import internet
 from flask_security import RoleMixin, UserMixin
 # Import password / encryption helper tools
 from werkzeug.security import check_password_hash, generate_password_hash
@@ -14,9 +12,6 @@ from flask import jsonify
 from app import db
 from app.server.modules.helpers.word_generator import WordGenerator
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(internet)
 
 wordGenerator = WordGenerator()
 
@@ -24,6 +19,8 @@ wordGenerator = WordGenerator()
 class Base(db.Model):
 
     __abstract__    = True
+    # game models live in the game state database, see SQLALCHEMY_BINDS
+    __bind_key__    = "game_state"
 
     id              = db.Column(db.Integer, primary_key=True)
 
@@ -38,7 +35,8 @@ class Base(db.Model):
         removes any empty string values from list
         """
         vals = field_value_as_str.split("~")
-        return list(set([f for f in vals if f!='']))
+        # dict.fromkeys keeps the values in order, so the list is the same in every process
+        return list(dict.fromkeys([f for f in vals if f!='']))
 
 
 ##########################################################
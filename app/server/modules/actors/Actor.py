@@ -1,9 +1,8 @@
 # Import external modules
 import random
 import json
-from faker import Faker
+import numpy as np
 import glob
-from faker.providers import internet
 import names
 from datetime import date
 
@@ -15,11 +14,13 @@ from app.server.modules.helpers.word_generator import WordGenerator
 from app.server.modules.helpers.markov_sentence_generator import SentenceGenerator
 from app.server.modules.file.malware import Malware
 from app.server.modules.helpers.config_helper import read_config_from_yaml
+from app.server.modules.infrastructure.noise_domain_pool import noiseDomainPool
+from app.server.modules.infrastructure.infrastructure_graph import InfrastructureGraph
+
+FREEMAIL_DOMAINS = ['yahoo.com', 'gmail.com', 'aol.com', 'verizon.com', 'yandex.com','hotmail.com','protonmail.com','qq.com']
 
 # Instantiate classes to be used here
 wordGenerator = WordGenerator()
-fake = Faker()
-fake.add_provider(internet)
 sentenceGenerator = SentenceGenerator()
 
 class Actor(Base):
@@ -130,11 +131,14 @@ class Actor(Base):
 
     @property
     def domains_list(self):
-        return [domain.name for domain in self.domains]
+        if self.is_default_actor:
+            # noise domains are not stored, the default actor uses the noise domain pool
+            return noiseDomainPool.get_domains().tolist()
+        return list(InfrastructureGraph.for_actor(self).domains)
             
     @property
     def ips_list(self):
-        return [ip.address for ip in self.ips]
+        return list(InfrastructureGraph.for_actor(self).ips)
 
     @property
     def water_hole_domains_list(self):
@@ -205,20 +209,14 @@ class Actor(Base):
 
         if self.is_default_actor:
             return random.choice(LEGIT_DOMAINS)
-        return random.choice(self.domains_list)
+        return InfrastructureGraph.for_actor(self).get_random_domain()
 
 
     def get_ips(self, count_of_ips:int=10) -> "list[str]":
         """
         Get a list of IPs for the actor
         """
-        actor_ips = [ip.address for ip in self.ips]
-        if actor_ips:
-            if count_of_ips == 1:
-                random.choice(actor_ips)
-            return random.choices(actor_ips, k=count_of_ips)
-        else:
-            return []
+        return InfrastructureGraph.for_actor(self).get_random_ips(count_of_ips)
         
 
     def get_email_subject(self) -> str:
@@ -232,6 +230,17 @@ class Actor(Base):
             return sentenceGenerator.genSentence()
 
 
+    def get_email_subjects(self, count:int) -> np.ndarray:
+        """
+        Batch version of get_email_subject
+        Returns count subject lines
+        """
+        subjects = Actor.string_to_list(self.subjects)
+        if subjects:
+            return np.array(subjects, dtype=object)[np.random.randint(0, len(subjects), count)]
+        else:
+            return np.array(sentenceGenerator.genSentences(count), dtype=object)
+
     def get_sender_address(self) -> str:
         """
         Return a random email from the actor's pool of email addresses
@@ -244,6 +253,27 @@ class Actor(Base):
             return random.choice(Actor.string_to_list(self.sender_emails))
 
 
+    def get_sender_addresses(self, count:int) -> np.ndarray:
+        """
+        Batch version of get_sender_address
+        Default actor addresses are assembled from arrays of theme words and email domains
+        """
+        if not self.is_default_actor:
+            sender_emails = np.array(Actor.string_to_list(self.sender_emails), dtype=object)
+            return sender_emails[np.random.randint(0, len(sender_emails), count)]
+
+        sender_themes = np.array(Actor.string_to_list(self.sender_themes), dtype=object)
+        email_domains = np.array(self.sender_domains_list or FREEMAIL_DOMAINS, dtype=object)
+        splitters = np.array(["", "_", "."], dtype=object)
+
+        # get one or two words from our sender themes
+        first_words = sender_themes[np.random.randint(0, len(sender_themes), count)]
+        second_words = sender_themes[np.random.randint(0, len(sender_themes), count)]
+        two_words = np.random.randint(1, 3, count) == 2
+        prefixes = np.where(two_words, first_words + splitters[np.random.randint(0, len(splitters), count)] + second_words, first_words)
+
+        return prefixes + "@" + email_domains[np.random.randint(0, len(email_domains), count)]
+
     def gen_partner_address(self) -> str:
         """
         Returns a partner email address
@@ -265,7 +295,7 @@ class Actor(Base):
         if self.sender_domains_list:
             email_domain = random.choice(self.sender_domains_list)
         else:
-            email_domain = random.choice(['yahoo.com', 'gmail.com', 'aol.com', 'verizon.com', 'yandex.com','hotmail.com','protonmail.com','qq.com'])
+            email_domain = random.choice(FREEMAIL_DOMAINS)
 
         # get one or two words from our sender themes
         words = random.choices(sender_themes, k=random.randint(1,2))
@@ -1,6 +1,5 @@
 # Import external modules
 import random
-from faker import Faker
 
 from app.server.modules.clock.Clock import Clock
 
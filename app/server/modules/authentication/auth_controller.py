@@ -1,58 +1,79 @@
 ### for now we assume there is only one mail server
 # TODO: model this as an object later
 import random
-import uuid
-from faker import Faker
-from faker.providers import user_agent
+import numpy as np
 from datetime import date
 
 from app.server.modules.authentication.authenticationEvent import AuthenticationEvent
 from app.server.modules.organization.Company import Employee
 from app.server.models import GameSession
 from app.server.modules.clock.Clock import Clock 
+from app.server.modules.helpers.identifier_factory import identifierFactory
+from app.server.modules.triggers.scheduler import eventScheduler
 from app.server.models import db
 from app.server.utils import *
-from flask import current_app
+from app.server.settings import gameSettings
 
 AUTH_RESULTS = ["Successful Login", "Failed Login"]
+MAIL_SERVER_HOSTNAME = "MAIL-SERVER01"
+
+# Failed logins draw their (incorrect) password from a pre-generated pool
+FAILED_PASSWORD_POOL_SIZE = 5000
+FAILED_PASSWORD_HASHES = None
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(user_agent)
 
 @timing
 def auth_random_user_to_mail_server(employees:"list[Employee]", num_auth_events_per_user:int, percent_employees_to_generate:float, start_date:date, start_hour: int, day_length_hours:int) -> None:
     """
     Get a random company user and have them login to the mail server
+    The day's logins are built as arrays and sent to the uploader as one batch
     """
     users = random.choices(employees, k=int(len(employees)*percent_employees_to_generate))
-    #Get the current game session from the database
-    # this should be centralized somewhere as well
-    
-    # TODO: This is not very performant
-    for user in users:
-        for _ in range(num_auth_events_per_user):
-            # TODO: This should be more accurate prob
-            if random.random() <= current_app.config['RATE_USER_AUTHS_FROM_WORK']:
-                auth_ip = user.ip_addr
-            else:
-                auth_ip = user.home_ip_addr
-
-            auth_result = random.choice(AUTH_RESULTS)
-            if auth_result == "Successful Login":
-                password = f"{user.username}2023"
-            else:
-                # Get a random password (that is incorrect) if we have an unsuccessful login
-                password = f"{uuid.uuid4()}"
-
-            auth_to_mail_server(
-                timestamp=Clock.generate_bimodal_timestamp(start_date=start_date, start_hour=start_hour, day_length=day_length_hours).timestamp(),
-                username=user.username,
-                src_ip= auth_ip,
-                user_agent=user.user_agent,
-                result= random.choice(AUTH_RESULTS),
-                password=password
-            )
+    count_events = len(users) * num_auth_events_per_user
+    if not count_events:
+        return
+
+    user_indices = np.repeat(np.arange(len(users)), num_auth_events_per_user)
+    usernames = np.array([user.username for user in users], dtype=object)
+    user_agents = np.array([user.user_agent for user in users], dtype=object)
+    work_ips = np.array([user.ip_addr for user in users], dtype=object)
+    home_ips = np.array([user.home_ip_addr for user in users], dtype=object)
+    # successful logins use the user's password
+    password_hashes = np.array([AuthenticationEvent.hash_password(f"{user.username}2023") for user in users], dtype=object)
+
+    # TODO: This should be more accurate prob
+    from_work = np.random.random(count_events) <= gameSettings.RATE_USER_AUTHS_FROM_WORK
+    successful = np.random.randint(0, len(AUTH_RESULTS), count_events) == 0
+
+    # Get a random password (that is incorrect) if we have an unsuccessful login
+    failed_password_hashes = get_failed_password_hashes()
+    failed_password_hashes = failed_password_hashes[np.random.randint(0, len(failed_password_hashes), count_events)]
+
+    timestamps = Clock.generate_bimodal_timestamps(start_date=start_date, start_hour=start_hour, day_length=day_length_hours, count=count_events)
+
+    upload_auth_events_batch_to_azure({
+        "timestamp": Clock.from_timestamps_to_strings(timestamps),
+        "hostname": np.full(count_events, MAIL_SERVER_HOSTNAME, dtype=object),
+        "src_ip": np.where(from_work, work_ips[user_indices], home_ips[user_indices]),
+        "user_agent": user_agents[user_indices],
+        "username": usernames[user_indices],
+        "result": np.where(successful, AUTH_RESULTS[0], AUTH_RESULTS[1]),
+        "password_hash": np.where(successful, password_hashes[user_indices], failed_password_hashes)
+    })
+
+
+def get_failed_password_hashes() -> np.ndarray:
+    """
+    Return the pool of hashed random passwords used for failed logins
+    The pool is generated the first time it is needed
+    """
+    global FAILED_PASSWORD_HASHES
+    if FAILED_PASSWORD_HASHES is None:
+        FAILED_PASSWORD_HASHES = np.array(
+            [AuthenticationEvent.hash_password(password) for password in identifierFactory.uuids(FAILED_PASSWORD_POOL_SIZE)],
+            dtype=object
+        )
+    return FAILED_PASSWORD_HASHES
 
 @timing
 def actor_password_spray(actor: Actor, start_date: date, num_employees:int = 25, num_passwords:int = 5) -> None:
@@ -70,7 +91,7 @@ def actor_password_spray(actor: Actor, start_date: date, num_employees:int = 25,
     # TODO: abstract this out to the actor
     targeted_employees = random.choices(get_employees(roles_list=["IT associate"]), k=num_employees)
 
-    spray_passwords = [f"{uuid.uuid4()}" for _ in range(num_passwords)]
+    spray_passwords = identifierFactory.uuids(num_passwords)
 
     # user agent should be actor specific  
     # TODO: abstract this out to the actor
@@ -85,7 +106,7 @@ def actor_password_spray(actor: Actor, start_date: date, num_employees:int = 25,
             auth_to_mail_server(
                 timestamp=spray_time,
                 username=employee.username,
-                src_ip=fake.ipv4_public() ,
+                src_ip=identifierFactory.public_ipv4s(1)[0],
                 user_agent=user_agent,
                 result=result,
                 password=password
@@ -98,7 +119,7 @@ def actor_password_spray(actor: Actor, start_date: date, num_employees:int = 25,
                                                                workday_start_hour=actor.activity_start_hour,
                                                                workday_length_hours=actor.workday_length_hours,
                                                                working_days_of_week=actor.working_days_list)
-                Trigger.actor_downloads_files_from_email(recipient=employee.username, src_ip=actor_ip, time=login_time)
+                eventScheduler.schedule(login_time, Trigger.actor_downloads_files_from_email, recipient=employee.username, src_ip=actor_ip)
             
 
 # def auth_user_to_mail_server(user: Employee, num_auth_events:int) -> None:
@@ -137,12 +158,11 @@ def actor_password_spray(actor: Actor, start_date: date, num_employees:int = 25,
     
 
 
-
 def auth_to_mail_server( timestamp:float, username:str, src_ip:str, user_agent:str, result:str, password:str) -> None:
 
     auth_event =  AuthenticationEvent(
         timestamp= timestamp,
-        hostname="MAIL-SERVER01",
+        hostname=MAIL_SERVER_HOSTNAME,
         username= username,
         src_ip= src_ip,
         user_agent= user_agent,
@@ -161,3 +181,10 @@ def upload_auth_event_to_azure(auth_event: AuthenticationEvent):
             table_name= "AuthenticationEvents")
 
 
+def upload_auth_events_batch_to_azure(columns: "dict[str, list]"):
+    from app.server.game_functions import LOG_UPLOADER
+    LOG_UPLOADER.send_batch(
+            data = columns,
+            table_name= "AuthenticationEvents")
+
+
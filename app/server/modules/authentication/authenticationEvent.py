@@ -14,9 +14,14 @@ class AuthenticationEvent:
         self.user_agent = user_agent
         self.username = username
         self.result = result
-        self.password_hash = hashlib.md5(password.encode('utf-8')).hexdigest()
+        self.password_hash = AuthenticationEvent.hash_password(password)
         
 
+    @staticmethod
+    def hash_password(password: str) -> str:
+        """Return the md5 hash that is logged in place of a password"""
+        return hashlib.md5(password.encode('utf-8')).hexdigest()
+
     def stringify(self) -> dict:
         return {
             "timestamp": Clock.from_timestamp_to_string(self.timestamp),
@@ -36,6 +36,20 @@ class Clock():
             scale=bimodal_std[index].total_seconds()))
         
         return timestamp
+
+    @staticmethod
+    def generate_bimodal_timestamps(start_date: date, start_hour: int, day_length: int, count: int) -> np.ndarray:
+        """
+        Vectorized version of generate_bimodal_timestamp
+        Generate count timestamps (floats) from the same bimodal distribution in one call
+        """
+        start_time = datetime.combine(start_date, time(hour=start_hour)).timestamp()
+        midpoint = start_time + (day_length * 3600) / 2
+        bimodal_mean = np.array([midpoint - 2 * 3600, midpoint + 2 * 3600])
+        bimodal_std = 3600
+        weights = [0.4, 0.6]
+        index = np.random.choice([0, 1], p=weights, size=count)
+        return np.random.normal(loc=bimodal_mean[index], scale=bimodal_std)
     
     @staticmethod
     def get_random_time() -> time:
@@ -63,6 +77,14 @@ class Clock():
         """
         return str(datetime.fromtimestamp(timestamp))
 
+    @staticmethod
+    def from_timestamps_to_strings(timestamps: "np.ndarray") -> "list[str]":
+        """
+        params: timestamps - array of datetimes as timestamps (float)
+        Return timestamps as strings, formatted like from_timestamp_to_string
+        """
+        return [str(datetime.fromtimestamp(timestamp)) for timestamp in np.asarray(timestamps).tolist()]
+
     @staticmethod
     def increment_time(start_time: float, increment: int) -> float:
         """
@@ -182,4 +204,57 @@ class Clock():
 
         increment_value = (days * 86400) + (hours * 3600) + (minutes * 60) + seconds
 
-        return start_time + increment_value
\ No newline at end of file
+        return start_time + increment_value
+
+    @staticmethod
+    def delay_times_by(start_times: np.ndarray, factor: str, is_negative=False, is_random=False) -> np.ndarray:
+        """
+        Vectorized version of delay_time_by
+        Increment an array of times, each by its own random amount
+        """
+        increments = {
+            "month": (31, 86400),
+            "days": (7, 86400),
+            "hours": (24, 3600),
+            "minutes": (60, 60),
+            "seconds": (60, 1)
+        }
+        if factor not in increments:
+            raise Exception('"factor" must be one of the following values: ["days","hours","minutes","seconds"]')
+
+        start_times = np.asarray(start_times, dtype=float)
+        if is_random:
+            direction = np.random.choice([1, -1], size=start_times.shape)
+        elif is_negative:
+            direction = -1
+        else:
+            direction = 1
+
+        max_value, unit_seconds = increments[factor]
+        return start_times + np.random.randint(1, max_value + 1, start_times.shape) * unit_seconds * direction
+
+class GameClock():
+    """
+    The in-game clock of a live game
+
+    Game time starts at game_start (a timestamp) when the game starts in real life,
+    and runs time_multiplier times faster than real time,
+    e.g. with a multiplier of 1000 a game day lasts about a minute and a half
+    """
+
+    def __init__(self, game_start: float, time_multiplier: int, real_start: float = None) -> None:
+        self.game_start = game_start
+        self.time_multiplier = time_multiplier or 1
+        self.real_start = real_start or datetime.now().timestamp()
+
+    def now(self) -> float:
+        """
+        Current game time, as a timestamp
+        """
+        return self.game_start + (datetime.now().timestamp() - self.real_start) * self.time_multiplier
+
+    def seconds_until(self, game_time: float) -> float:
+        """
+        Real seconds until the game clock reaches game_time
+        """
+        return max(0.0, (game_time - self.now()) / self.time_multiplier)
@@ -3,20 +3,14 @@ import enum
 import random
 from datetime import datetime
 from unicodedata import name
-from faker import Faker
-from faker.providers import internet, lorem
 
 
 # Import internal modules
 from app.server.models import *
 from app.server.modules.clock.Clock import Clock
+from app.server.modules.helpers.faker_pool import fakerPool
 from app.server.modules.actors.Actor import Actor
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(internet)
-fake.add_provider(lorem)
-
 
 class Email:
     """
@@ -43,7 +37,7 @@ class Email:
 
         if not link:
             # this should not occur
-            self.link = fake.uri()
+            self.link = fakerPool.get_one("uri")
         else:
             self.link = link
 
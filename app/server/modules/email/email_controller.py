@@ -1,14 +1,12 @@
 # Import external modules
 from enum import Enum
 import random
-from faker import Faker
-from faker.providers import internet, lorem
+import numpy as np
 import names
 from datetime import date, datetime
 
 
 # Import internal modules
-from flask import current_app
 from app.server.models import *
 from app.server.modules.email.email import Email
 from app.server.modules.outbound_browsing.browsing_controller import browse_website
@@ -19,11 +17,6 @@ from app.server.modules.actors.Actor import Actor
 from app.server.modules.organization.Company import Company, Employee
 from app.server.utils import *
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(internet)
-fake.add_provider(lorem)
-
 
 class EmailType(Enum):
     """
@@ -39,6 +32,13 @@ INTERNAL_EMAIL_AUTHENTICITY = 95
 PARTNER_EMAIL_AUTHENTICITY = 90
 DEFAULT_ACTOR_NAME = "Default"
 
+# 85% of inbound emails make it past the mail filters
+# (the same as 70% passing, and half of the rest being let through on a second look)
+INBOUND_EMAIL_ACCEPTED_RATE = 0.85
+# The default actor stops sending a wave after each recipient with this probability (performance savings)
+# the recipients it moves on from are triggered, so most waves are one untriggered email
+DEFAULT_ACTOR_STOP_RATE = 0.8
+
 
 def get_random_actor():
     """Return a random actor from the database"""
@@ -50,38 +50,102 @@ def gen_email(employees: "list[Employee]", partners: "list[str]", actor: Actor,
     Make a call to the Azure email function
     to create an email, post to log analytics
     and send a secondary request to generate browsing traffic
+
+    The whole day's email plan (type, sender, recipients, subject and link) is generated as arrays.
+    The emails are queued as one batch and only the recipients who act on an email
+    are fanned out into follow-on events by the trigger
     """
 
-    actor_domains = [domain.name for domain in actor.domains]
+    actor_domains = get_actor_domains(actor)
     num_employees_to_generate = int(len(employees) * percent_employees_to_generate)
+    count_emails = num_employees_to_generate * count_emails_per_user
+    if not (count_emails and len(actor_domains) and employees):
+        return
 
-    for employee in random.choices(employees, k=num_employees_to_generate):
-        for _ in range(count_emails_per_user):
-            # time is returned as timestamp (float)
-            time = Clock.generate_bimodal_timestamp(start_date=start_date, start_hour=actor.activity_start_hour, day_length=actor.workday_length_hours).timestamp()
-
-            # Randomly pick an email type
-            email_type = random.choice([t.value for t in EmailType])
-
-            # Depending on the email type selected, call a different function
-            if email_type == EmailType.INBOUND.value:
-                wave_size = random.randint(1, actor.max_wave_size)
-                recipients = random.choices(employees, k=wave_size)
-                gen_inbound_mail(recipients, actor, actor_domains, time)
+    # time is returned as timestamp (float)
+    times = Clock.generate_bimodal_timestamps(start_date=start_date, start_hour=actor.activity_start_hour, day_length=actor.workday_length_hours, count=count_emails)
+    subjects = actor.get_email_subjects(count_emails)
+    links = get_links(actor, actor_domains, count_emails)
 
-            elif email_type == EmailType.OUTBOUND.value:
-                sender = random.choice(employees)
-                gen_outbound_mail(sender, actor, actor_domains, time)
+    # Randomly pick an email type for each email
+    email_types = np.array([t for t in EmailType if partners or t != EmailType.PARTNER], dtype=object)
+    email_types = email_types[np.random.randint(0, len(email_types), count_emails)]
 
-            elif email_type == EmailType.INTERNAL.value:
-                sender = random.choice(employees)
-                recipient = random.choice(employees)
-                gen_internal_mail(sender, recipient, actor, actor_domains, time)
+    employee_emails = np.array([employee.email_addr for employee in employees], dtype=object)
 
-            elif email_type == EmailType.PARTNER.value:
-                partner_domain = random.choice(partners)
-                employee = random.choice(employees)
-                gen_partner_mail(employee, partner_domain, actor, actor_domains, time)
+    # Inbound emails are sent as a wave to multiple recipients
+    # every recipient gets their own row
+    inbound = np.flatnonzero(email_types == EmailType.INBOUND)
+    wave_sizes = np.random.randint(1, actor.max_wave_size + 1, len(inbound))
+    # number of recipients of each wave that get the email, and that are triggered
+    triggered_sizes = wave_sizes
+    if actor.is_default_actor:
+        count_until_stop = np.random.geometric(DEFAULT_ACTOR_STOP_RATE, len(inbound))
+        wave_sizes = np.minimum(wave_sizes, count_until_stop)
+        triggered_sizes = np.minimum(wave_sizes, count_until_stop - 1)
+    inbound_senders = actor.get_sender_addresses(len(inbound))
+    inbound_reply_tos = actor.get_sender_addresses(len(inbound)) if actor.spoofs_email else inbound_senders
+    inbound_rows = np.repeat(inbound, wave_sizes)
+    inbound_recipients = np.random.randint(0, len(employees), len(inbound_rows))
+    inbound_senders = np.repeat(inbound_senders, wave_sizes)
+
+    # Outbound emails go from an employee to someone outside the company
+    outbound = np.flatnonzero(email_types == EmailType.OUTBOUND)
+    outbound_senders = employee_emails[np.random.randint(0, len(employees), len(outbound))]
+    outbound_recipients = fakerPool.get("ascii_email", len(outbound))
+
+    # Internal emails go from one employee to another
+    internal = np.flatnonzero(email_types == EmailType.INTERNAL)
+    internal_senders = employee_emails[np.random.randint(0, len(employees), len(internal))]
+    internal_recipients = employee_emails[np.random.randint(0, len(employees), len(internal))]
+
+    # Partner emails are sent to or from one of the company's partner organizations
+    partner = np.flatnonzero(email_types == EmailType.PARTNER)
+    partner_employees = employee_emails[np.random.randint(0, len(employees), len(partner))]
+    partner_emails = fakerPool.get("email_prefix", len(partner)) + "@" + np.array(partners, dtype=object)[np.random.randint(0, len(partners), len(partner))]
+    partner_is_inbound = np.random.random(len(partner)) < 0.5
+
+    inbound_accepted = np.random.random(len(inbound_rows)) < INBOUND_EMAIL_ACCEPTED_RATE
+
+    rows = np.concatenate([inbound_rows, outbound, internal, partner])
+    senders = np.concatenate([
+        inbound_senders,
+        outbound_senders,
+        internal_senders,
+        np.where(partner_is_inbound, partner_emails, partner_employees)
+    ])
+    send_emails_batch_to_azure({
+        "event_time": Clock.from_timestamps_to_strings(times[rows]),
+        "sender": senders,
+        "reply_to": np.concatenate([np.repeat(inbound_reply_tos, wave_sizes), senders[len(inbound_rows):]]),
+        "recipient": np.concatenate([
+            employee_emails[inbound_recipients],
+            outbound_recipients,
+            internal_recipients,
+            np.where(partner_is_inbound, partner_employees, partner_emails)
+        ]),
+        "subject": subjects[rows],
+        "accepted": np.concatenate([
+            inbound_accepted,
+            np.ones(len(rows) - len(inbound_rows), dtype=bool)
+        ]),
+        "link": links[rows]
+    })
+
+    # Initiate the trigger for the recipients receiving inbound emails
+    # these are the first triggered_sizes recipients of each wave
+    position_in_wave = np.arange(len(inbound_rows)) - np.repeat(np.cumsum(wave_sizes) - wave_sizes, wave_sizes)
+    triggered = np.flatnonzero(position_in_wave < np.repeat(triggered_sizes, wave_sizes))
+
+    Trigger.users_receive_emails(
+        times=times[inbound_rows[triggered]],
+        recipients=[employees[i] for i in inbound_recipients[triggered]],
+        links=links[inbound_rows[triggered]],
+        subjects=subjects[inbound_rows[triggered]],
+        accepted=inbound_accepted[triggered],
+        authenticity=actor.effectiveness,
+        actor=actor
+    )
 
 @timing
 def gen_actor_email(employees: "list[Employee]", actor: Actor, start_date: date) -> None:
@@ -103,102 +167,52 @@ def gen_inbound_mail(recipients: "list[Employee]", actor: Actor, actor_domains:"
     """
     Generate an email from someone outside the company to someone inside
     """
-    link, domain = get_link(actor, actor_domains, return_domain=True)
+    link = get_link(actor, actor_domains)
     sender = actor.get_sender_address()
     reply_to = actor.get_sender_address() if actor.spoofs_email else sender
     subject = actor.get_email_subject()
-
-    for recipient in recipients:
-        email = Email(
-            time=time,
-            sender=sender,
-            recipient=recipient.email_addr,
-            subject=subject,
-            reply_to=reply_to,
-            link=link,
-            domain=domain,
-            actor=actor,
-            accepted=random.choices([True, False], weights=(70, 30), k=1)[0],
-            authenticity=actor.effectiveness
-        )
-
-        send_email_to_azure(email)
-
-        # Initiate the trigger for the recipient receiving the constructed email
-        # We should skip this most of the time for the default actor (performance savings)
-        if actor.is_default_actor and (random.random() < 0.8):
-            return
-        
-        Trigger.user_receives_email(email, recipient)
-
-
-def gen_outbound_mail(sender: Employee, actor: Actor, actor_domains:"list[str]", time: float) -> None:
-    """
-    Generate an email from someone inside the company to someone outside
-    """
-    email = Email(
-        time=time,
-        sender=sender.email_addr,
-        recipient=fake.ascii_email(),
-        subject=actor.get_email_subject(),
-        link=get_link(actor, actor_domains=actor_domains),
-        accepted=True
+    accepted = np.random.random(len(recipients)) < INBOUND_EMAIL_ACCEPTED_RATE
+
+    send_emails_batch_to_azure({
+        "event_time": [Clock.from_timestamp_to_string(time)] * len(recipients),
+        "sender": [sender] * len(recipients),
+        "reply_to": [reply_to] * len(recipients),
+        "recipient": [recipient.email_addr for recipient in recipients],
+        "subject": [subject] * len(recipients),
+        "accepted": accepted,
+        "link": [link] * len(recipients)
+    })
+
+    # Initiate the trigger for the recipients receiving the constructed email
+    Trigger.users_receive_emails(
+        times=[time] * len(recipients),
+        recipients=recipients,
+        links=[link] * len(recipients),
+        subjects=[subject] * len(recipients),
+        accepted=accepted,
+        authenticity=actor.effectiveness,
+        actor=actor
     )
 
-    send_email_to_azure(email)
-
 
-def gen_internal_mail(sender: Employee, recipient: Employee, actor: Actor, actor_domains:"list[str]", time: float) -> None:
+def send_email_to_azure(email):
     """
-    Generate mail from someone inside the company to someone else in the company
+    Upload email object to azure
     """
-    email = Email(
-        time=time,
-        sender=sender.email_addr,
-        recipient=recipient.email_addr,
-        subject=actor.get_email_subject(),
-        link=get_link(actor, actor_domains=actor_domains),
-        accepted=True,
-        authenticity=INTERNAL_EMAIL_AUTHENTICITY
-    )
-
-    send_email_to_azure(email)
+    from app.server.game_functions import LOG_UPLOADER
 
-def gen_partner_mail(employee: Employee, partner_domain: str, actor: Actor, actor_domains:"list[str]", time: float) -> None:
-    """
-    Generates mail to/from one of the company's partner organizations
-    """
-    # Determine partner email directionality (inbound or outbound)
-    directionality = random.choice([EmailType.INBOUND.value, EmailType.OUTBOUND.value])
-
-    partner_email = f"{get_email_prefix()}@{partner_domain}"
-
-    # Set the sender and recipient based on the directionality
-    if directionality == EmailType.INBOUND.value:
-        sender = partner_email
-        recipient = employee.email_addr
-    else:
-        sender = employee.email_addr
-        recipient = partner_email
-
-    email = Email(
-        time=time,
-        sender=sender,
-        recipient=recipient,
-        subject=actor.get_email_subject(),
-        link=get_link(actor, actor_domains),
-        accepted=True,
-        authenticity=PARTNER_EMAIL_AUTHENTICITY
-    )
+    LOG_UPLOADER.send_request(
+        data=[email.stringify()],
+        table_name="Email")
 
-    send_email_to_azure(email)
 
-def send_email_to_azure(email):
+def send_emails_batch_to_azure(columns: "dict[str, list]"):
     """
-    Upload email object to azure
+    Upload a batch of emails, given as columns, to azure
+    Column names match Email.stringify()
     """
     from app.server.game_functions import LOG_UPLOADER
 
-    LOG_UPLOADER.send_request(
-        data=[email.stringify()],
+    LOG_UPLOADER.send_batch(
+        data=columns,
         table_name="Email")
@@ -1,28 +1,64 @@
 # Import external modules
 from enum import Enum
 from multiprocessing import parent_process
-import random
-from faker import Faker
-from faker.providers import internet, lorem
-import re
+import numpy as np
 from datetime import date
 
 # Import internal modules
-from flask import current_app
+from app.server.settings import gameSettings
 from app.server.models import *
 from app.server.modules.endpoints.file_creation_event import FileCreationEvent, File
 from app.server.modules.endpoints.processes import ProcessEvent, Process
+from app.server.modules.endpoints.process_templates import CommandlineTemplates
+from app.server.modules.helpers.identifier_factory import identifierFactory
+from app.server.modules.helpers.faker_pool import fakerPool
 from app.server.modules.logging.uploadLogs import LogUploader
 from app.server.modules.clock.Clock import Clock
 from app.server.utils import *
 from app.server.modules.constants.legit_files import *
 from app.server.modules.constants.constants import COMMON_USER_FILE_LOCATIONS, LEGIT_USER_COMMANDLINES, LEGIT_SYSTEM_COMMANDLINES, LEGIT_PARENT_PROCESSES, LEGIT_SYSTEM_PARENT_PROCESSES, FILE_CREATING_PROCESSES, LEGIT_EXECUTABLES_TO_INSTALL
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(internet)
-fake.add_provider(lorem)
-fake.add_provider(file)
+
+# processes that create system files
+SYSTEM_FILE_CREATING_PROCESSES = ['svchost.exe','wuauclt.exe'] #TODO: Add more of these!
+
+# Commandline templates are compiled once
+# system processes always run as "System"
+USER_COMMANDLINES = CommandlineTemplates(LEGIT_USER_COMMANDLINES)
+SYSTEM_COMMANDLINES = CommandlineTemplates(LEGIT_SYSTEM_COMMANDLINES, substitutions={"{username}": "System", "{filename}": "System"})
+
+# Legit windows files as arrays, e.g. sha256 -> Windows/System32/xcopy.exe
+LEGIT_WINDOWS_FILE_HASHES = np.array(list(LEGIT_WINDOWS_FILES.keys()), dtype=object)
+LEGIT_WINDOWS_FILE_PATHS = np.array(["C:\\" + path.replace("/", "\\") for path in LEGIT_WINDOWS_FILES.values()], dtype=object)
+LEGIT_WINDOWS_FILE_NAMES = np.array([path.split("/")[-1] for path in LEGIT_WINDOWS_FILES.values()], dtype=object)
+
+# User file locations split around the {username} placeholder
+USER_FILE_LOCATION_PREFIXES = np.array([location.split("{username}")[0] for location in COMMON_USER_FILE_LOCATIONS], dtype=object)
+USER_FILE_LOCATION_SUFFIXES = np.array([location.split("{username}")[-1] for location in COMMON_USER_FILE_LOCATIONS], dtype=object)
+USER_FILE_LOCATION_CATEGORIES = np.array([
+    'image' if "Pictures" in location else
+    'video' if "Videos" in location else
+    'audio' if "Music" in location else
+    'office'
+    for location in COMMON_USER_FILE_LOCATIONS
+], dtype=object)
+
+
+def get_random_file_names(category: str, count: int) -> np.ndarray:
+    """
+    Get count random file names of a faker file category (e.g. office, image)
+    """
+    return fakerPool.get("file_name", count, category=category)
+
+
+def get_employee_columns(employees: "list[Employee]", employee_indices: np.ndarray) -> "tuple[np.ndarray, np.ndarray]":
+    """
+    Return (hostnames, usernames) arrays for the given employee indices
+    """
+    hostnames = np.array([employee.hostname for employee in employees], dtype=object)
+    usernames = np.array([employee.username for employee in employees], dtype=object)
+    return hostnames[employee_indices], usernames[employee_indices]
+
 
 @timing
 def gen_system_files_on_host(start_date: date, start_hour: int, workday_length_hours: int, percent_employees_to_generate: float, count_of_events_per_user:int=2) -> None:
@@ -38,177 +74,147 @@ def gen_system_files_on_host(start_date: date, start_hour: int, workday_length_h
             "size": 4510,
             "process_name": "svchost.exe"
     }
+    All of the day's rows are uploaded as one batch
     """
     from app.server.modules.alerts.alerts_controller import generate_host_alert
 
     total_num_employees = get_company().count_employees
     employees = get_employees(count=int(total_num_employees*percent_employees_to_generate))
+    count_events = len(employees) * count_of_events_per_user
+    if not count_events:
+        return
 
-    for employee in employees:
-        hash_path_pairs = random.choices(list(LEGIT_WINDOWS_FILES.items()), k=count_of_events_per_user)
-        
-        for hash, path in hash_path_pairs:
-            filename = path.split("/")[-1]
-            time = Clock.generate_bimodal_timestamp(start_date, start_hour, workday_length_hours).timestamp()
-            
-            file_creation_event = FileCreationEvent(
-                hostname=employee.hostname, #Pick a random employee to generate system files
-                username=employee.username, # Get this from the random employee
-                timestamp=time,
-                filename=filename, # Get the filename from the path 
-                path="C:/"+path, # Add a drive letter
-                sha256=hash,
-                process_name=random.choice(['svchost.exe','wuauclt.exe']) #TODO: Add more of these!
-            )
-
-            if random.random() < current_app.config['FP_RATE_HOST_ALERTS'] and ".exe" in filename: #FP: Use reports legit system file
-                generate_host_alert(
-                    time=Clock.delay_time_by(time, factor="minutes"),
-                    hostname=employee.hostname,
-                    filename=filename,
-                    sha256=hash
-                )
-
-            upload_endpoint_event_to_azure(file_creation_event, table_name="FileCreationEvents")      
+    employee_indices = np.repeat(np.arange(len(employees)), count_of_events_per_user)
+    hostnames, usernames = get_employee_columns(employees, employee_indices)
+    file_indices = np.random.randint(0, len(LEGIT_WINDOWS_FILE_HASHES), count_events)
+    filenames = LEGIT_WINDOWS_FILE_NAMES[file_indices]
+    hashes = LEGIT_WINDOWS_FILE_HASHES[file_indices]
+    timestamps = Clock.generate_bimodal_timestamps(start_date, start_hour, workday_length_hours, count_events)
+
+    upload_endpoint_batch_to_azure({
+        "timestamp": Clock.from_timestamps_to_strings(timestamps),
+        "hostname": hostnames,
+        "username": usernames,
+        "sha256": hashes,
+        "path": LEGIT_WINDOWS_FILE_PATHS[file_indices],
+        "filename": filenames,
+        "process_name": np.array(SYSTEM_FILE_CREATING_PROCESSES, dtype=object)[np.random.randint(0, len(SYSTEM_FILE_CREATING_PROCESSES), count_events)]
+    }, table_name="FileCreationEvents")
+
+    #FP: Use reports legit system file
+    is_exe = np.array([".exe" in filename for filename in filenames])
+    for i in np.flatnonzero((np.random.random(count_events) < gameSettings.FP_RATE_HOST_ALERTS) & is_exe):
+        generate_host_alert(
+            time=Clock.delay_time_by(float(timestamps[i]), factor="minutes"),
+            hostname=hostnames[i],
+            filename=filenames[i],
+            sha256=hashes[i]
+        )
 
 
 @timing
 def gen_system_processes_on_host(start_date: date, start_hour: int, workday_length_hours: int, percent_employees_to_generate: float, count_of_events_per_user:int=2) -> None:
     """
     Generates ProcessEvents for users
+    Every other event also generates a user process, the rest are system processes
+    All of the day's rows are uploaded as one batch
     """
     total_num_employees = get_company().count_employees
     employees = get_employees(count=int(total_num_employees*percent_employees_to_generate))
-    
-    for employee in employees:
-        for i in range(count_of_events_per_user):
-            # Half the time, make a user event too
-            # This is an attempted performance improvement (instead of 2 loops)
-            if (i%2 == 0):
-                process = get_legit_user_process(
-                    username=employee.username, 
-                    filename=fake.file_name(category='office')
-                )
-                parent_name, parent_hash = random.choice(list(LEGIT_PARENT_PROCESSES.items()))
-
-                process_event=ProcessEvent(
-                    timestamp=Clock.generate_bimodal_timestamp(start_date, start_hour, workday_length_hours).timestamp(),
-                    parent_process_name=parent_name,
-                    parent_process_hash=parent_hash,
-                    process_commandline=process.process_commandline,
-                    process_name=process.process_name,
-                    hostname=employee.hostname,
-                    username=employee.username,
-                )
-                upload_endpoint_event_to_azure(process_event, table_name="ProcessEvents")
-                #process_events.append(process_event)
-            
-            # Generates ProcessEvents for system
-            # Always generate a system event
-                process = get_legit_system_process(
-                    username=employee.username, 
-                    filename=fake.file_name(category='office')
-                )
-                parent_name, parent_hash = random.choice(list(LEGIT_SYSTEM_PARENT_PROCESSES.items()))
-
-                process_event=ProcessEvent(
-                    timestamp=Clock.generate_bimodal_timestamp(start_date, start_hour, workday_length_hours).timestamp(),         
-                    parent_process_name=parent_name,
-                    parent_process_hash=parent_hash,
-                    process_commandline=process.process_commandline,
-                    process_name=process.process_name,
-                    hostname=employee.hostname,
-                    username="System"
-                )
-                upload_endpoint_event_to_azure(process_event, table_name="ProcessEvents")
-                #process_events.append(process_event)
-
-    # print(f"uploading {len(process_events)}  events to ADX")
-    #upload_endpoint_event_to_azure(process_events, table_name="ProcessEvents")
-    
-    
-
-def get_legit_system_process(username: str = None, filename: str = None) -> Process:
-    """
-    Build a legitimate process and return it
-    """
-    process_commandline = random.choice(LEGIT_SYSTEM_COMMANDLINES)
-    if username:
-        process_commandline = process_commandline.replace("{username}","System")
-    if filename:
-        process_commandline = process_commandline.replace("{filename}","System") # Need to add Network Service and other non-user accounts
-
-    try:
-        process_name = re.search('([^\\\\]+\\.exe)',process_commandline.lower()).group(1)
-    except:
-        process_name = "PARSE_ERROR.exe"
-
-    return Process(
-        process_name=process_name,
-        process_commandline=process_commandline
+
+    # Half the time, make a user event too
+    count_events_per_user = len(range(0, count_of_events_per_user, 2))
+    count_events = len(employees) * count_events_per_user
+    if not count_events:
+        return
+
+    employee_indices = np.repeat(np.arange(len(employees)), count_events_per_user)
+    hostnames, usernames = get_employee_columns(employees, employee_indices)
+
+    user_commandlines, user_process_names = USER_COMMANDLINES.render(
+        USER_COMMANDLINES.get_random_indices(count_events),
+        usernames=usernames,
+        filenames=get_random_file_names('office', count_events)
     )
+    user_parent_names, user_parent_hashes = get_random_parent_processes(LEGIT_PARENT_PROCESSES, count_events)
+
+    # Generates ProcessEvents for system
+    # Always generate a system event
+    system_commandlines, system_process_names = SYSTEM_COMMANDLINES.render(SYSTEM_COMMANDLINES.get_random_indices(count_events))
+    system_parent_names, system_parent_hashes = get_random_parent_processes(LEGIT_SYSTEM_PARENT_PROCESSES, count_events)
+
+    timestamps = Clock.generate_bimodal_timestamps(start_date, start_hour, workday_length_hours, 2 * count_events)
+
+    upload_endpoint_batch_to_azure({
+        "timestamp": Clock.from_timestamps_to_strings(timestamps),
+        "parent_process_name": np.concatenate([user_parent_names, system_parent_names]),
+        "parent_process_hash": np.concatenate([user_parent_hashes, system_parent_hashes]),
+        "process_commandline": np.concatenate([user_commandlines, system_commandlines]),
+        "process_name": np.concatenate([user_process_names, system_process_names]),
+        "process_hash": identifierFactory.sha256s(2 * count_events),
+        "hostname": np.concatenate([hostnames, hostnames]),
+        "username": np.concatenate([usernames, np.full(count_events, "System", dtype=object)])
+    }, table_name="ProcessEvents")
+
 
-def get_legit_user_process(username: str = None, filename: str = None) -> Process:
+def get_random_parent_processes(parent_processes: "dict[str, str]", count: int) -> "tuple[np.ndarray, np.ndarray]":
     """
-    Build a legitimate process and return it
+    Pick count parent processes from a dict of process name -> hash
+    Returns (parent_process_names, parent_process_hashes)
     """
-    process_commandline = random.choice(LEGIT_USER_COMMANDLINES)
-    if username:
-        process_commandline = process_commandline.replace("{username}",username)
-    if filename:
-        process_commandline = process_commandline.replace("{filename}",filename)
-
-    try:
-        process_name = re.search('([^\\\\]+\\.exe)',process_commandline.lower()).group(1)
-    except:
-        process_name = "PARSE_ERROR.exe"
-
-    return Process(
-        process_name=process_name,
-        process_commandline=process_commandline
-    )
+    names = np.array(list(parent_processes.keys()), dtype=object)
+    hashes = np.array(list(parent_processes.values()), dtype=object)
+    indices = np.random.randint(0, len(names), count)
+    return names[indices], hashes[indices]
+
 
 @timing
 def gen_user_files_on_host(start_date: date, start_hour: int, workday_length_hours: int, percent_employees_to_generate:float, count_of_events_per_user:int=5) -> None:
     """
     Generates FileCreationEvents for user files generated on a host
-    TODO: Example here
+    e.g. a document written to a user's Documents folder by chrome.exe
+    All of the day's rows are uploaded as one batch
     """
     employees = get_employees()
+    if not employees:
+        return
 
     # This will make files related to normal productivity stuff
-    for employee in random.choices(employees, k=int(len(employees)*percent_employees_to_generate)):
-        for _ in range(count_of_events_per_user):
-            path = random.choice(COMMON_USER_FILE_LOCATIONS).replace("{username}",employee.username)
-            if "Pictures" in path:
-                category='image'
-            elif "Videos" in path:
-                category='video'
-            elif "Music" in path:
-                category='audio'
-            else:
-                category='office'
-                
-            write_file_to_host(
-                hostname=employee.hostname,
-                username=employee.username,
-                process_name=random.choice(FILE_CREATING_PROCESSES),
-                timestamp=Clock.generate_bimodal_timestamp(start_date, start_hour, workday_length_hours).timestamp(),
-                file=File(
-                    filename=fake.file_name(category=category),
-                    path=path
-                )
-            )
+    count_users = int(len(employees)*percent_employees_to_generate)
+    count_events = count_users * count_of_events_per_user
+    employee_indices = np.repeat(np.random.randint(0, len(employees), count_users), count_of_events_per_user)
+
+    locations = np.random.randint(0, len(COMMON_USER_FILE_LOCATIONS), count_events)
+    filenames = np.empty(count_events, dtype=object)
+    for category in np.unique(USER_FILE_LOCATION_CATEGORIES):
+        rows = np.flatnonzero(USER_FILE_LOCATION_CATEGORIES[locations] == category)
+        filenames[rows] = get_random_file_names(category, len(rows))
+
     # This will create legit executables/applications
-    for employee in random.choices(employees, k=10): #FIX THIS LATER
-        write_file_to_host(
-            hostname=employee.hostname,
-            username=employee.username,
-            process_name=random.choice(FILE_CREATING_PROCESSES),
-            timestamp=Clock.generate_bimodal_timestamp(start_date, start_hour, workday_length_hours).timestamp(),
-            file=random.choice(LEGIT_EXECUTABLES_TO_INSTALL)
-        )
-    
+    count_installs = 10 #FIX THIS LATER
+    installs = np.random.randint(0, len(LEGIT_EXECUTABLES_TO_INSTALL), count_installs)
+    install_files = [LEGIT_EXECUTABLES_TO_INSTALL[i] for i in installs]
+    employee_indices = np.concatenate([employee_indices, np.random.randint(0, len(employees), count_installs)])
+
+    hostnames, usernames = get_employee_columns(employees, employee_indices)
+    install_usernames = usernames[count_events:]
+    paths = np.concatenate([
+        USER_FILE_LOCATION_PREFIXES[locations] + usernames[:count_events] + USER_FILE_LOCATION_SUFFIXES[locations] + filenames,
+        np.array([file.path.replace("{username}", username) for file, username in zip(install_files, install_usernames)], dtype=object)
+    ])
+    timestamps = Clock.generate_bimodal_timestamps(start_date, start_hour, workday_length_hours, len(employee_indices))
+
+    upload_endpoint_batch_to_azure({
+        "timestamp": Clock.from_timestamps_to_strings(timestamps),
+        "hostname": hostnames,
+        "username": usernames,
+        "sha256": np.concatenate([identifierFactory.sha256s(count_events), [file.sha256 for file in install_files]]),
+        "path": np.array([path.replace("/", "\\") for path in paths], dtype=object),
+        "filename": np.concatenate([filenames, [file.filename for file in install_files]]),
+        "process_name": np.array(FILE_CREATING_PROCESSES, dtype=object)[np.random.randint(0, len(FILE_CREATING_PROCESSES), len(employee_indices))]
+    }, table_name="FileCreationEvents")
+
+
 def upload_endpoint_event_to_azure(events, table_name: str) -> None:
 
     """
@@ -233,6 +239,18 @@ def upload_endpoint_event_to_azure(events, table_name: str) -> None:
             table_name=table_name)
 
 
+def upload_endpoint_batch_to_azure(columns: "dict[str, list]", table_name: str) -> None:
+    """
+    Upload a batch of endpoint events, given as columns, to ADX
+    Column names match the stringify() output of the table's event type
+    """
+    from app.server.game_functions import LOG_UPLOADER
+
+    LOG_UPLOADER.send_batch(
+        data=columns,
+        table_name=table_name)
+
+
 def write_file_to_host(hostname: str, username: str, process_name: str, timestamp: float, file: File) -> None:
     """
     Uploads a FileCreationEvent for a given host, time, and File
@@ -1,5 +1,6 @@
 import random
 from app.server.modules.clock.Clock import Clock
+from app.server.modules.helpers.identifier_factory import identifierFactory
 
 class File:
     def __init__(self, filename:str, path:str, sha256:str=None, size:int=None):
@@ -15,8 +16,7 @@ class File:
         """
         Helper function to get a random file hash (SHA256) when one is not provided
         """
-        hash = random.getrandbits(256)
-        return "%032x" % hash
+        return identifierFactory.sha256s(1)[0]
 
     @staticmethod
     def get_random_filesize() -> int:
@@ -0,0 +1,76 @@
+import re
+import numpy as np
+
+# Matches the executable in a commandline, e.g. C:\Windows\system32\svchost.exe -k netsvcs -> svchost.exe
+PROCESS_NAME_REGEX = re.compile('([^\\\\]+\\.exe)')
+PLACEHOLDER_REGEX = re.compile('(\\{username\\}|\\{filename\\})')
+
+
+def get_process_name(process_commandline: str) -> str:
+    """
+    Parse the process name out of a commandline
+    """
+    try:
+        return PROCESS_NAME_REGEX.search(process_commandline.lower()).group(1)
+    except:
+        return "PARSE_ERROR.exe"
+
+
+class CommandlineTemplates:
+    """
+    A compiled list of commandline templates, e.g. LEGIT_USER_COMMANDLINES
+
+    Each template is split around its {username} and {filename} placeholders once,
+    and its process name is extracted once, so that commandlines can be rendered
+    for a whole batch of events from arrays of template indices, usernames and filenames
+    """
+
+    def __init__(self, commandlines: "list[str]", substitutions: "dict[str, str]" = None) -> None:
+        self.templates = []
+        process_names = []
+        for commandline in commandlines:
+            # fixed substitutions are applied at compile time
+            for placeholder, value in (substitutions or {}).items():
+                commandline = commandline.replace(placeholder, value)
+
+            parts = PLACEHOLDER_REGEX.split(commandline)
+            # parts alternates between text segments and placeholders
+            self.templates.append((parts[0::2], parts[1::2]))
+
+            # if a placeholder is part of the process name, it has to be parsed after rendering
+            process_name = get_process_name(commandline)
+            process_names.append(None if "{" in process_name else process_name)
+
+        self.process_names = np.array(process_names, dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def get_random_indices(self, count: int) -> np.ndarray:
+        return np.random.randint(0, len(self.templates), count)
+
+    def render(self, template_indices: np.ndarray, usernames: np.ndarray = None, filenames: np.ndarray = None) -> "tuple[np.ndarray, np.ndarray]":
+        """
+        Render one commandline per template index
+        Returns (process_commandlines, process_names)
+        """
+        values = {
+            "{username}": usernames,
+            "{filename}": filenames
+        }
+
+        commandlines = np.empty(len(template_indices), dtype=object)
+        for template_index in np.unique(template_indices):
+            rows = np.flatnonzero(template_indices == template_index)
+            segments, placeholders = self.templates[template_index]
+
+            commandline = np.full(len(rows), segments[0], dtype=object)
+            for placeholder, segment in zip(placeholders, segments[1:]):
+                commandline = commandline + values[placeholder][rows] + segment
+            commandlines[rows] = commandline
+
+        process_names = self.process_names[template_indices]
+        for row in np.flatnonzero(process_names == None):
+            process_names[row] = get_process_name(commandlines[row])
+
+        return commandlines, process_names
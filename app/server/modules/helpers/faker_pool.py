@@ -0,0 +1,96 @@
+import numpy as np
+from faker import Faker
+from faker.providers import internet, file, user_agent, lorem
+
+
+class FakerPool:
+    """
+    Serves Faker values from pre-generated pools instead of calling Faker for every event
+
+    A pool holds pool_size values of one kind, e.g. "ascii_email" or "file_name" with category="audio".
+    Pools are filled the first time they are used and values are served by random index.
+    Once a pool has served refill_after times its size, the oldest refill_fraction
+    of its slots are replaced with new values, so that the number of distinct values
+    keeps growing slowly over the game instead of staying fixed
+    """
+
+    def __init__(self, pool_size: int = 2000, refill_after: int = 10, refill_fraction: float = 0.1) -> None:
+        self.fake = Faker()
+        self.fake.add_provider(internet)
+        self.fake.add_provider(file)
+        self.fake.add_provider(user_agent)
+        self.fake.add_provider(lorem)
+
+        # kind -> function returning a single value, for values that don't come from faker
+        self.custom_providers = {}
+        # kind -> pool size, for kinds that are too slow to generate pool_size of
+        self.custom_pool_sizes = {}
+        self.configure(pool_size, refill_after, refill_fraction)
+
+    def configure(self, pool_size: int = 2000, refill_after: int = 10, refill_fraction: float = 0.1) -> None:
+        """
+        Set the pool size and refill policy
+        Existing pools are dropped and refilled on their next use
+        """
+        self.pool_size = pool_size
+        self.refill_after = refill_after
+        self.refill_fraction = refill_fraction
+
+        # pool key -> array of values
+        self.pools = {}
+        # pool key -> number of values served since the last refill
+        self.served = {}
+        # pool key -> index of the oldest slot, where the next refill starts
+        self.cursors = {}
+
+    def register(self, kind: str, provider, pool_size: int = None) -> None:
+        """
+        Pool values produced by a function that takes no arguments
+        Optionally give the kind its own pool size
+        """
+        self.custom_providers[kind] = provider
+        if pool_size:
+            self.custom_pool_sizes[kind] = pool_size
+
+    def _generate(self, kind: str, count: int, kwargs: dict) -> np.ndarray:
+        provider = self.custom_providers.get(kind) or getattr(self.fake, kind)
+        return np.array([provider(**kwargs) for _ in range(count)], dtype=object)
+
+    def _refill(self, key: tuple, kind: str, kwargs: dict) -> None:
+        """
+        Replace the oldest slots of a pool with new values
+        """
+        pool = self.pools[key]
+        count_refill = max(1, int(len(pool) * self.refill_fraction))
+        slots = (self.cursors[key] + np.arange(count_refill)) % len(pool)
+        pool[slots] = self._generate(kind, count_refill, kwargs)
+
+        self.cursors[key] = (self.cursors[key] + count_refill) % len(pool)
+        self.served[key] = 0
+
+    def get(self, kind: str, count: int, **kwargs) -> np.ndarray:
+        """
+        Get count values of a kind
+        kind is a faker provider method (or registered provider) and kwargs are passed to it
+        e.g. get("file_name", 10, category="office")
+        """
+        key = (kind,) + tuple(sorted(kwargs.items()))
+        pool_size = self.custom_pool_sizes.get(kind, self.pool_size)
+        if key not in self.pools:
+            self.pools[key] = self._generate(kind, pool_size, kwargs)
+            self.served[key] = 0
+            self.cursors[key] = 0
+        elif self.served[key] >= self.refill_after * pool_size:
+            self._refill(key, kind, kwargs)
+
+        self.served[key] += count
+        pool = self.pools[key]
+        return pool[np.random.randint(0, len(pool), count)]
+
+    def get_one(self, kind: str, **kwargs):
+        return self.get(kind, 1, **kwargs)[0]
+
+
+# shared pool used by all generators
+# sizes and refill policy are set at the start of each game from the FAKER_POOL_* config values
+fakerPool = FakerPool()
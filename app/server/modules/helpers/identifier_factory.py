@@ -0,0 +1,204 @@
+import re
+import numpy as np
+
+from app.server.settings import gameSettings
+
+# (network, prefix length) of IPv4 ranges that are not publicly routable
+RESERVED_IPV4_NETWORKS = [
+    (0x00000000, 8),    # 0.0.0.0/8
+    (0x0A000000, 8),    # 10.0.0.0/8
+    (0x64400000, 10),   # 100.64.0.0/10
+    (0x7F000000, 8),    # 127.0.0.0/8
+    (0xA9FE0000, 16),   # 169.254.0.0/16
+    (0xAC100000, 12),   # 172.16.0.0/12
+    (0xC0000000, 24),   # 192.0.0.0/24
+    (0xC0000200, 24),   # 192.0.2.0/24
+    (0xC0586300, 24),   # 192.88.99.0/24
+    (0xC0A80000, 16),   # 192.168.0.0/16
+    (0xC6120000, 15),   # 198.18.0.0/15
+    (0xC6336400, 24),   # 198.51.100.0/24
+    (0xCB007100, 24),   # 203.0.113.0/24
+    (0xE0000000, 4),    # 224.0.0.0/4
+    (0xF0000000, 4),    # 240.0.0.0/4
+]
+OCTET_STRINGS = np.array([str(octet) for octet in range(256)], dtype=object)
+
+HOSTNAME_CHARACTERS = np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789", dtype=np.uint8)
+HOSTNAME_SUFFIXES = np.array(["-DESKTOP", "-LAPTOP", "-MACHINE"], dtype=object)
+
+# user agents are rendered from a browser template and a platform
+USER_AGENT_TEMPLATES = {
+    "firefox": "Mozilla/5.0 ({platform}; rv:{major}.0) Gecko/20100101 Firefox/{major}.0",
+    "chrome": "Mozilla/5.0 ({platform}) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36",
+    "edge": "Mozilla/5.0 ({platform}) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36 Edg/{major}.0.{build}.{patch}"
+}
+USER_AGENT_MAJOR_VERSIONS = {
+    "firefox": (60, 116),
+    "chrome": (70, 119),
+    "edge": (79, 119)
+}
+USER_AGENT_PLATFORMS = {
+    "windows": ["Windows NT 10.0; Win64; x64", "Windows NT 10.0; WOW64", "Windows NT 6.3; Win64; x64", "Windows NT 6.1; Win64; x64"],
+    "mac": ["Macintosh; Intel Mac OS X 10_15_7", "Macintosh; Intel Mac OS X 10.14", "Macintosh; Intel Mac OS X 11_6"],
+    "linux": ["X11; Linux x86_64", "X11; Ubuntu; Linux x86_64", "X11; Fedora; Linux x86_64"]
+}
+# profile -> (browsers, platforms)
+# windows: work machines, firefox: random web visitors, any: home devices
+USER_AGENT_PROFILES = {
+    "windows": (["firefox", "chrome", "edge"], ["windows"]),
+    "firefox": (["firefox"], ["windows", "mac", "linux"]),
+    "any": (["firefox", "chrome", "edge"], ["windows", "mac", "linux"])
+}
+USER_AGENT_FIELD_REGEX = re.compile('(\\{\\w+\\})')
+
+
+class IdentifierFactory:
+    """
+    Generates synthetic identifiers in bulk:
+    file hashes, uuids, public IPs, hostnames and user agents
+
+    Every identifier is cut from a single seeded stream of random bytes,
+    and formatted with array operations rather than one Faker call per row
+    """
+
+    # number of random bytes drawn from the generator at a time
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, seed: int = None) -> None:
+        self.seed(seed)
+
+    def seed(self, seed: int = None) -> None:
+        """
+        (Re)start the byte stream
+        The same seed always produces the same identifiers
+        """
+        self.rng = np.random.default_rng(seed)
+        self._buffer = b""
+        self._position = 0
+
+    def get_bytes(self, count: int) -> bytes:
+        """
+        Take the next count bytes from the stream
+        """
+        if self._position + count > len(self._buffer):
+            self._buffer = self._buffer[self._position:] + self.rng.bytes(max(count, IdentifierFactory.BLOCK_SIZE))
+            self._position = 0
+        random_bytes = self._buffer[self._position:self._position + count]
+        self._position += count
+        return random_bytes
+
+    def get_uint8s(self, shape) -> np.ndarray:
+        count = int(np.prod(shape))
+        return np.frombuffer(self.get_bytes(count), dtype=np.uint8).reshape(shape)
+
+    def get_uint32s(self, count: int) -> np.ndarray:
+        return np.frombuffer(self.get_bytes(4 * count), dtype=">u4").astype(np.uint32)
+
+    def get_integers(self, low: int, high: int, count: int) -> np.ndarray:
+        """
+        Integers in [low, high)
+        """
+        return (self.get_uint32s(count) % (high - low)).astype(np.int64) + low
+
+    @staticmethod
+    def _to_strings(characters: np.ndarray) -> np.ndarray:
+        """
+        Convert a (count, width) array of ascii codes to an array of strings
+        """
+        count, width = characters.shape
+        return np.ascontiguousarray(characters, dtype=np.uint8).view(f"S{width}").ravel().astype(str).astype(object)
+
+    def get_hex_strings(self, count: int, num_bytes: int) -> np.ndarray:
+        hex_string = self.get_bytes(num_bytes * count).hex().encode()
+        return np.frombuffer(hex_string, dtype=f"S{2 * num_bytes}").astype(str).astype(object)
+
+    def sha256s(self, count: int) -> np.ndarray:
+        """
+        Generate count random SHA256 hashes
+        """
+        return self.get_hex_strings(count, 32)
+
+    def uuids(self, count: int) -> np.ndarray:
+        """
+        Generate count random (version 4) uuids, e.g. for passwords
+        """
+        uuid_bytes = self.get_uint8s((count, 16)).copy()
+        uuid_bytes[:, 6] = (uuid_bytes[:, 6] & 0x0F) | 0x40
+        uuid_bytes[:, 8] = (uuid_bytes[:, 8] & 0x3F) | 0x80
+
+        hex_characters = np.frombuffer(uuid_bytes.tobytes().hex().encode(), dtype=np.uint8).reshape(count, 32)
+        # 8-4-4-4-12
+        hex_characters = np.insert(hex_characters, [8, 12, 16, 20], ord("-"), axis=1)
+        return IdentifierFactory._to_strings(hex_characters)
+
+    @staticmethod
+    def ipv4_strings(addresses: np.ndarray) -> np.ndarray:
+        """
+        Format uint32 addresses in dotted notation
+        """
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        octets = [OCTET_STRINGS[(addresses >> shift) & 255] for shift in (24, 16, 8, 0)]
+        return octets[0] + "." + octets[1] + "." + octets[2] + "." + octets[3]
+
+    def public_ipv4_ints(self, count: int) -> np.ndarray:
+        """
+        Generate count random public IPv4 addresses as uint32 values
+        Addresses that fall in a reserved range are redrawn
+        """
+        addresses = np.empty(0, dtype=np.uint32)
+        while len(addresses) < count:
+            candidates = self.get_uint32s(count - len(addresses))
+            is_public = np.ones(len(candidates), dtype=bool)
+            for network, prefix_length in RESERVED_IPV4_NETWORKS:
+                mask = np.uint32((0xFFFFFFFF << (32 - prefix_length)) & 0xFFFFFFFF)
+                is_public &= (candidates & mask) != np.uint32(network)
+            addresses = np.concatenate([addresses, candidates[is_public]])
+        return addresses
+
+    def public_ipv4s(self, count: int) -> np.ndarray:
+        """
+        Generate count random public IPv4 addresses
+        """
+        return IdentifierFactory.ipv4_strings(self.public_ipv4_ints(count))
+
+    def hostnames(self, count: int) -> np.ndarray:
+        """
+        Generate count device hostnames
+        Example: X7O9-DESKTOP
+        """
+        prefixes = HOSTNAME_CHARACTERS[self.get_uint8s((count, 4)) % len(HOSTNAME_CHARACTERS)]
+        return IdentifierFactory._to_strings(prefixes) + HOSTNAME_SUFFIXES[self.get_integers(0, len(HOSTNAME_SUFFIXES), count)]
+
+    def user_agents(self, count: int, profile: str = "any") -> np.ndarray:
+        """
+        Generate count user agents for a profile in USER_AGENT_PROFILES
+        """
+        browsers, platform_types = USER_AGENT_PROFILES[profile]
+        platforms = np.array([platform for platform_type in platform_types for platform in USER_AGENT_PLATFORMS[platform_type]], dtype=object)
+
+        browser_indices = self.get_integers(0, len(browsers), count)
+        user_agents = np.empty(count, dtype=object)
+        for browser_index, browser in enumerate(browsers):
+            rows = np.flatnonzero(browser_indices == browser_index)
+            if not len(rows):
+                continue
+            values = {
+                "{platform}": platforms[self.get_integers(0, len(platforms), len(rows))],
+                "{major}": self.get_integers(*USER_AGENT_MAJOR_VERSIONS[browser], len(rows)).astype(str).astype(object),
+                "{build}": self.get_integers(3000, 6000, len(rows)).astype(str).astype(object),
+                "{patch}": self.get_integers(0, 200, len(rows)).astype(str).astype(object)
+            }
+            parts = USER_AGENT_FIELD_REGEX.split(USER_AGENT_TEMPLATES[browser])
+            # parts alternates between text segments and fields
+            user_agent = np.full(len(rows), parts[0], dtype=object)
+            for field, segment in zip(parts[1::2], parts[2::2]):
+                user_agent = user_agent + values[field] + segment
+            user_agents[rows] = user_agent
+
+        return user_agents
+
+
+# shared factory used by all generators
+# it is seeded from IDENTIFIER_SEED in the config, when it is created (for the identifiers
+# of built-in files, made when their modules are imported) and again at the start of each game
+identifierFactory = IdentifierFactory(seed=gameSettings.IDENTIFIER_SEED)
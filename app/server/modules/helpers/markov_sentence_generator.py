@@ -1,6 +1,7 @@
 import requests
 import random
 import re
+import numpy as np
 
 class SentenceGenerator:
     """
@@ -17,6 +18,14 @@ class SentenceGenerator:
             sentence += random.choice(self.words) + ' '
         return sentence.strip().lower().capitalize()
 
+    def genSentences(self, count, length=10) -> "list[str]":
+        """
+        Generate count sentences at once
+        Words for all sentences are picked with a single index array
+        """
+        word_indices = np.random.randint(0, len(self.word_array), (count, length))
+        return [" ".join(words).lower().capitalize() for words in self.word_array[word_indices].tolist()]
+
 
     def load_text(self):
         """
@@ -33,6 +42,7 @@ class SentenceGenerator:
         response = response.translate(table)
 
         self.words = [self.fix_caps(w) for w in re.findall(r"[\w]+|[.,!?;]", response) if len(w) > 1]
+        self.word_array = np.array(self.words, dtype=object)
 
 
     def fix_caps(self, word):
@@ -0,0 +1,107 @@
+import os
+import gc
+from datetime import datetime
+
+
+class MemoryBudget:
+    """
+    Keeps the resident memory (RSS) of a game under a budget
+
+    Whatever holds rows or objects in memory registers a spill handler,
+    e.g. the log uploader writes its buffers to disk and the game releases the ORM session.
+    Every check_interval queued rows, the RSS is read from /proc/self/statm;
+    if it is over budget, every handler is called and the spill is recorded.
+
+    On systems without /proc the RSS can't be read and the budget is never enforced
+    """
+
+    STATM_PATH = "/proc/self/statm"
+
+    def __init__(self) -> None:
+        self.spill_handlers = {}
+        self.reset()
+
+    def reset(self, budget_mb: int = None, check_interval: int = 10000) -> None:
+        """
+        Set the budget (in MB, None to disable it) and how many rows to queue between checks
+        Registered handlers are kept
+        """
+        self.budget_bytes = budget_mb * 1024 * 1024 if budget_mb else None
+        self.check_interval = check_interval
+        self.rows_since_check = 0
+        self.peak_rss = 0
+        # one dict per spill, see spill()
+        self.spills = []
+
+    def register(self, name: str, handler) -> None:
+        """
+        Register a function that frees memory
+        It may return the number of rows or objects it released
+        """
+        self.spill_handlers[name] = handler
+
+    @staticmethod
+    def get_rss_bytes() -> int:
+        """
+        Current resident memory of the process, 0 if it can't be read
+        """
+        try:
+            with open(MemoryBudget.STATM_PATH) as f:
+                resident_pages = int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            return 0
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+    def add_rows(self, count: int) -> None:
+        """
+        Count rows that were queued, and check the budget every check_interval rows
+        """
+        if not self.budget_bytes:
+            return
+        self.rows_since_check += count
+        if self.rows_since_check >= self.check_interval:
+            self.check()
+
+    def check(self) -> bool:
+        """
+        Spill if the process is over budget
+        Returns True if it spilled
+        """
+        self.rows_since_check = 0
+        rss = MemoryBudget.get_rss_bytes()
+        self.peak_rss = max(self.peak_rss, rss)
+        if not self.budget_bytes or rss <= self.budget_bytes:
+            return False
+        self.spill(rss)
+        return True
+
+    def spill(self, rss: int) -> None:
+        released = {}
+        for name, handler in self.spill_handlers.items():
+            released[name] = handler() or 0
+        gc.collect()
+
+        rss_after = MemoryBudget.get_rss_bytes()
+        self.spills.append({
+            "time": str(datetime.now()),
+            "rss_mb": round(rss / 1024 / 1024, 1),
+            "rss_after_mb": round(rss_after / 1024 / 1024, 1),
+            "released": released
+        })
+        print(f"Memory budget exceeded ({self.spills[-1]['rss_mb']} MB): spilled {released}, now at {self.spills[-1]['rss_after_mb']} MB")
+
+    def get_stats(self) -> dict:
+        rss = MemoryBudget.get_rss_bytes()
+        self.peak_rss = max(self.peak_rss, rss)
+        return {
+            "budget_mb": self.budget_bytes // 1024 // 1024 if self.budget_bytes else None,
+            "rss_mb": round(rss / 1024 / 1024, 1),
+            "peak_rss_mb": round(self.peak_rss / 1024 / 1024, 1),
+            "count_spills": len(self.spills),
+            "last_spill": self.spills[-1] if self.spills else None
+        }
+
+
+# shared budget for the game
+# it is reset at the start of each game from MEMORY_BUDGET_MB in the config
+memoryBudget = MemoryBudget()
@@ -0,0 +1,170 @@
+import numpy as np
+
+from app.server.modules.helpers.word_generator import WordGenerator
+
+# instantiate word genertor
+wordGenerator = WordGenerator()
+
+
+class URLSynthesizer:
+    """
+    Generates URLs in bulk for an actor
+
+    The vocabularies used to build a URL (directory words, parameter names, login paths,
+    file names and the actor's uri types) are compiled into arrays once per actor.
+    URLs are then assembled from random index arrays, N at a time, instead of
+    rebuilding the word lists and concatenating strings for every event.
+
+    browsing uri example:
+        - share/files?type=protect?tracking=evening?id=discuss
+    malware_delivery uri example:
+        - online/published/files/public/runner.xls
+    phishing uri example:
+        - images/share/login
+    """
+
+    URI_TYPES = ["browsing", "phishing", "malware_delivery"]
+    SCHEMES = ["http://", "https://"]
+    DIR_WORDS = ['share', 'files', 'search', 'published', 'online', 'images', 'modules', 'public']
+    PARAM_NAMES = ['query', 'source', 'id', 'keyword', 'search', 'user', 'uid', 'aid', 'tracking', 'type']
+    LOGIN_PATHS = ['login', 'login.html', 'signin', 'sign_in', 'enter', 'login?language=en', 'auth']
+    FILE_EXTENSIONS = ['zip', 'rar', 'docx', '7z', 'pptx', 'xls', 'exe']
+
+    # each url draws its parameter values from a small set of words (like a real site would)
+    COUNT_PARAM_VALUES = 10
+
+    # cache of compiled synthesizers, keyed by actor name
+    _synthesizers = {}
+
+    def __init__(self, uri_types: "list[str]" = None, file_names: "list[str]" = None, words: "list[str]" = None) -> None:
+        # drawn from numpy's global generator, so seeding it (IDENTIFIER_SEED) also fixes the urls
+        self.rng = np.random.default_rng(np.random.randint(0, 2 ** 32))
+
+        self.uri_types = np.array(uri_types or URLSynthesizer.URI_TYPES, dtype=object)
+        self.file_names = np.array(file_names or [], dtype=object)
+        self.words = np.array(words or wordGenerator.words, dtype=object)
+
+        self.schemes = np.array(URLSynthesizer.SCHEMES, dtype=object)
+        self.dir_words = np.array(URLSynthesizer.DIR_WORDS, dtype=object)
+        self.param_prefixes = np.array([f"?{name}=" for name in URLSynthesizer.PARAM_NAMES], dtype=object)
+        self.login_paths = np.array([f"/{path}" for path in URLSynthesizer.LOGIN_PATHS], dtype=object)
+        self.file_extensions = np.array([f".{ext}" for ext in URLSynthesizer.FILE_EXTENSIONS], dtype=object)
+
+        # dir_paths[depth] holds every possible directory path of that depth
+        self.dir_paths = {}
+
+    @classmethod
+    def for_actor(cls, actor: "Actor" = None) -> "URLSynthesizer":
+        """
+        Return the compiled synthesizer for an actor
+        Actor vocabularies are parsed from the database strings only the first time
+        """
+        key = actor.name if actor else None
+        if key not in cls._synthesizers:
+            if actor:
+                cls._synthesizers[key] = URLSynthesizer(
+                    uri_types=actor.get_attacks_by_type("email"),
+                    file_names=actor.get_file_names()
+                )
+            else:
+                cls._synthesizers[key] = URLSynthesizer()
+        return cls._synthesizers[key]
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Forget the compiled synthesizers, e.g. when a new game starts with other actor configs
+        """
+        cls._synthesizers = {}
+
+    def _get_dir_paths(self, depth: int) -> np.ndarray:
+        """
+        Build every directory path of the given depth
+        e.g. depth 2 -> ["share/share", "share/files", ...]
+        """
+        if depth not in self.dir_paths:
+            paths = self.dir_words
+            for _ in range(depth - 1):
+                paths = np.add.outer(paths, "/" + self.dir_words).ravel()
+            self.dir_paths[depth] = paths
+        return self.dir_paths[depth]
+
+    def get_uri_types(self, count: int) -> np.ndarray:
+        """
+        Pick a uri type for each url from the types available to the actor
+        """
+        return self.uri_types[self.rng.integers(0, len(self.uri_types), count)]
+
+    def get_uri_paths(self, count: int, uri_type: str = None, max_depth: int = 4, max_params: int = 6, uri_types: np.ndarray = None) -> np.ndarray:
+        """
+        Generate count uri paths
+        uri_type sets a single type for the whole batch, otherwise one is picked per path
+        """
+        if uri_types is None:
+            uri_types = np.full(count, uri_type, dtype=object) if uri_type else self.get_uri_types(count)
+
+        # directory component: a uniform pick among all paths of a uniform depth
+        depths = self.rng.integers(1, max_depth + 1, count)
+        paths = np.empty(count, dtype=object)
+        for depth in range(1, max_depth + 1):
+            rows = np.flatnonzero(depths == depth)
+            if len(rows):
+                dir_paths = self._get_dir_paths(depth)
+                paths[rows] = dir_paths[self.rng.integers(0, len(dir_paths), len(rows))]
+
+        rows = np.flatnonzero(uri_types == "browsing")
+        if len(rows):
+            paths[rows] += self._get_query_strings(len(rows), max_params)
+
+        rows = np.flatnonzero(uri_types == "malware_delivery")
+        if len(rows):
+            paths[rows] += self._get_file_names(len(rows))
+
+        rows = np.flatnonzero(uri_types == "phishing")
+        if len(rows):
+            paths[rows] += self.login_paths[self.rng.integers(0, len(self.login_paths), len(rows))]
+
+        return paths
+
+    def _get_query_strings(self, count: int, max_params: int) -> np.ndarray:
+        """
+        Generate count query strings with 1 to max_params parameters
+        e.g. ?type=protect?tracking=evening?id=discuss
+        """
+        num_params = self.rng.integers(1, max_params + 1, count)
+        value_words = self.rng.integers(0, len(self.words), (count, URLSynthesizer.COUNT_PARAM_VALUES))
+        value_picks = self.rng.integers(0, URLSynthesizer.COUNT_PARAM_VALUES, (count, max_params))
+        values = self.words[np.take_along_axis(value_words, value_picks, axis=1)]
+        params = self.param_prefixes[self.rng.integers(0, len(self.param_prefixes), (count, max_params))] + values
+
+        # blank out the parameters past each url's parameter count, then join the rest
+        params[np.arange(max_params) >= num_params[:, None]] = ""
+        return params.sum(axis=1)
+
+    def _get_file_names(self, count: int) -> np.ndarray:
+        """
+        Generate count file names for malware delivery urls
+        Actor file names override the random ones
+        """
+        if len(self.file_names):
+            file_names = self.file_names[self.rng.integers(0, len(self.file_names), count)]
+        else:
+            file_names = (self.words[self.rng.integers(0, len(self.words), count)]
+                          + self.file_extensions[self.rng.integers(0, len(self.file_extensions), count)])
+        return "/" + file_names
+
+    def get_links(self, count: int, domains: "list[str]", return_domains: bool = False, uri_type: str = None):
+        """
+        Generate count links on the given domains
+        Optionally return the domain used in each link so that callers don't have to parse it out
+        """
+        domains = np.asarray(domains, dtype=object)
+        link_domains = domains[self.rng.integers(0, len(domains), count)]
+        links = (self.schemes[self.rng.integers(0, len(self.schemes), count)]
+                 + link_domains
+                 + "/"
+                 + self.get_uri_paths(count, uri_type=uri_type))
+
+        if return_domains:
+            return links, link_domains
+        return links
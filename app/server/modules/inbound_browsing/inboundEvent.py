@@ -1,14 +1,11 @@
 
 # Import external modules
 import random
-from faker import Faker
-from faker.providers import user_agent
 
 from app.server.modules.clock.Clock import Clock
+from app.server.modules.helpers.identifier_factory import identifierFactory
 
 #  instantiate faker
-fake = Faker()
-fake.add_provider(user_agent)
 STATUS_CODES = ["202", "301", "302", "404", "403"]
 
 
@@ -22,7 +19,7 @@ class InboundBrowsingEvent:
 
         self.time = Clock.from_timestamp_to_string(time)
         self.src_ip = src_ip
-        self.user_agent = user_agent or fake.firefox()
+        self.user_agent = user_agent or identifierFactory.user_agents(1, profile="firefox")[0]
         self.url = url
         self.method = method
         self.status_code = status_code or random.choice(STATUS_CODES)
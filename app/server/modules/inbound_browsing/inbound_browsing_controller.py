@@ -1,26 +1,29 @@
 
 # Import external modules
 import random
-from faker import Faker
+import numpy as np
 import urllib.parse
 from enum import Enum
 from datetime import date
 
 
-from faker.providers import user_agent, internet
 from app.server.utils import *
 from app.server.modules.inbound_browsing.inboundEvent import InboundBrowsingEvent
 from app.server.modules.helpers.markov_sentence_generator import SentenceGenerator
+from app.server.modules.helpers.url_synthesizer import URLSynthesizer
+from app.server.modules.helpers.identifier_factory import identifierFactory
+from app.server.modules.infrastructure.address_allocator import addressAllocator
 from app.server.modules.clock.Clock import Clock
 from app.server.modules.constants.constants import *
  
 #  instantiate faker
-fake = Faker()
-fake.add_provider(user_agent)
-fake.add_provider(internet)
 STATUS_CODES = ["200", "301", "404", "500"]
 sentenceGenerator = SentenceGenerator()
 
+# likelyhood of each BrowsingType (STATIC, BLOG, MAIL, SEARCH, OTHER)
+DEFAULT_BROWSING_TYPE_WEIGHTS = [47, 30, 3, 10, 10]
+ACTOR_BROWSING_TYPE_WEIGHTS = [10, 10, 0, 70, 10]
+
 
 class BrowsingType(Enum):
     """
@@ -37,67 +40,88 @@ def gen_inbound_browsing_activity(actor: Actor, start_date: date, num_inbound_br
     """
     Generate browsing to the company's website by random users
     This is background noise
+
+    For non-default actors, this is recon browsing from the actor's IPs
+    All of the rows are built as columns and uploaded as one batch
     """
-    for _ in range(num_inbound_browsing_events):
-
-        # Choose an IP for the browsing
-        # If non-default actor, then choose an actor IP as the source        
-        if actor.is_default_actor:
-            src_ip = fake.ipv4_public()
-        else:
-            src_ip = actor.get_ips(count_of_ips=1)[0]
-        status_code = random.choice(STATUS_CODES)
-        method = "GET"
-
-        # Generate a random sentence to be used for blog or search term
-        random_sentence =  sentenceGenerator.genSentence()
-
-        #weights determine likelyhood of each browsing type
-        if actor.is_default_actor:
-            weights = [47, 30, 3, 10, 10]
-        else:
-            weights = [10, 10, 0, 70, 10]
-
-        # URI Path should be one of three things (for now)
-        # Browsing to static page on company website
-        # browsing to dynamic uri on blog of website
-        # downloading file from mailserver (this will serve to hide our exfil for now
-        user_agent = None
-        browsing_type = random.choices(population = [t.value for t in BrowsingType], weights=weights, k=1)[0]
-        
-        if browsing_type == BrowsingType.STATIC.value:
-            uri_path = random.choice(WEBSITE_STATIC_PATHS)
-        elif browsing_type == BrowsingType.BLOG.value:
-            blog_title = random_sentence.replace(" ", "-").lower()
-            uri_path = "blog/" + blog_title
-        elif browsing_type == BrowsingType.MAIL.value and not actor.is_default_actor:
-            # We do not want random mail browsing for malicious actor
+    count = num_inbound_browsing_events
+    if not count:
+        return
+    company_domain = get_company().domain
+
+    # Choose an IP for the browsing
+    # If non-default actor, then choose an actor IP as the source        
+    if actor.is_default_actor:
+        src_ips = addressAllocator.get_unallocated_public_ips(count)
+    else:
+        src_ips = np.array(actor.get_ips(count_of_ips=count), dtype=object)
+    user_agents = identifierFactory.user_agents(count, profile="firefox")
+
+    #weights determine likelyhood of each browsing type
+    if actor.is_default_actor:
+        weights = np.array(DEFAULT_BROWSING_TYPE_WEIGHTS)
+    else:
+        weights = np.array(ACTOR_BROWSING_TYPE_WEIGHTS)
+
+    # URI Path should be one of three things (for now)
+    # Browsing to static page on company website
+    # browsing to dynamic uri on blog of website
+    # downloading file from mailserver (this will serve to hide our exfil for now
+    browsing_types = np.random.choice(np.array(list(BrowsingType), dtype=object), size=count, p=weights / weights.sum())
+    uri_paths = np.empty(count, dtype=object)
+
+    rows = np.flatnonzero(browsing_types == BrowsingType.STATIC)
+    uri_paths[rows] = np.array(WEBSITE_STATIC_PATHS, dtype=object)[np.random.randint(0, len(WEBSITE_STATIC_PATHS), len(rows))]
+
+    # Generate random sentences to be used for blog titles, only for the blog rows
+    rows = np.flatnonzero(browsing_types == BrowsingType.BLOG)
+    uri_paths[rows] = ["blog/" + sentence.replace(" ", "-").lower() for sentence in sentenceGenerator.genSentences(len(rows))]
+
+    # We do not want random mail browsing for default actor
+    rows = np.flatnonzero(browsing_types == BrowsingType.MAIL)
+    if actor.is_default_actor:
+        uri_paths[rows] = get_uri_paths(len(rows), uri_type="browsing")
+    else:
+        for row in rows:
             employee = get_random_employee()
-            src_ip = employee.home_ip_addr  #overide this value with the employee's home IP 
-            user_agent = employee.home_ua
-            uri_path = make_email_exfil_url(employee.username, add_prefix=False)
-        elif browsing_type == BrowsingType.SEARCH.value:
-            if not actor.is_default_actor and actor.get_recon_search_terms():
-                search_term = random.choice(actor.get_recon_search_terms())
-            else:
-                search_term = random_sentence
-            uri_path = f"search?query={urllib.parse.quote(search_term)}"
-        else:
-            uri_path = get_uri_path(uri_type="browsing")
-        
+            src_ips[row] = employee.home_ip_addr  #overide this value with the employee's home IP 
+            user_agents[row] = employee.home_ua
+            uri_paths[row] = make_email_exfil_url(employee.username, add_prefix=False, company_domain=company_domain)
+
+    rows = np.flatnonzero(browsing_types == BrowsingType.SEARCH)
+    recon_search_terms = [] if actor.is_default_actor else actor.get_recon_search_terms()
+    if recon_search_terms:
+        search_terms = np.array(recon_search_terms, dtype=object)[np.random.randint(0, len(recon_search_terms), len(rows))]
+    else:
+        search_terms = sentenceGenerator.genSentences(len(rows))
+    uri_paths[rows] = [f"search?query={urllib.parse.quote(search_term)}" for search_term in search_terms]
+
+    rows = np.flatnonzero(browsing_types == BrowsingType.OTHER)
+    uri_paths[rows] = get_uri_paths(len(rows), uri_type="browsing")
 
+    schemes = np.array(["http://", "https://"], dtype=object)
+    urls = schemes[np.random.randint(0, len(schemes), count)] + company_domain + "/" + uri_paths
 
-        url = random.choice(["http://", "https://"]) + get_company().domain + "/" + uri_path
+    times = Clock.generate_bimodal_timestamps(start_date, actor.activity_start_hour, actor.workday_length_hours, count)
+    # if actor is not default, then recon should happen retroactively
+    # recon will happen a couple days back
+    if not actor.is_default_actor:
+        times = Clock.delay_times_by(times, factor="days", is_negative=True)
 
-        # if actor is not default, then recon should happen retroactively
-        if actor.is_default_actor:
-            time = Clock.generate_bimodal_timestamp(start_date, actor.activity_start_hour, actor.workday_length_hours).timestamp()
-        else:
-            # recon will happen a couple days back
-            time = Clock.generate_bimodal_timestamp(start_date, actor.activity_start_hour, actor.workday_length_hours).timestamp()
-            time = Clock.delay_time_by(time, factor="days", is_negative=True)
+    upload_inbound_batch_to_azure({
+        "timestamp": Clock.from_timestamps_to_strings(times),
+        "method": np.full(count, "GET", dtype=object),
+        "src_ip": src_ips,
+        "user_agent": user_agents,
+        "url": urls
+    })
 
-        gen_inbound_request(time, src_ip, method, status_code, url, user_agent=user_agent)
+
+def get_uri_paths(count: int, uri_type: str) -> np.ndarray:
+    """
+    Generate count uri paths of a given type
+    """
+    return URLSynthesizer.for_actor().get_uri_paths(count, uri_type=uri_type)
 
 
 def gen_inbound_request(time:float, src_ip:str, method:str, status_code:str, url:str, user_agent:str=None) -> None:
@@ -116,12 +140,12 @@ def gen_inbound_request(time:float, src_ip:str, method:str, status_code:str, url
 
     upload_event_to_azure(browsing_event)
 
-def make_email_exfil_url(targeted_user: str, add_prefix:bool=True) -> str:
+def make_email_exfil_url(targeted_user: str, add_prefix:bool=True, company_domain:str=None) -> str:
     """
     Takes a targeted user as a parameter and returns a URL indicative of email exfil
     """
 
-    company_domain = get_company().domain
+    company_domain = company_domain or get_company().domain
 
     # add domain to the prefix
     if add_prefix:
@@ -142,3 +166,14 @@ def upload_event_to_azure(event):
     LOG_UPLOADER.send_request(
             data = [event.stringify()],
             table_name= "InboundBrowsing")
+
+
+def upload_inbound_batch_to_azure(columns: "dict[str, list]"):
+    """
+    Upload a batch of inbound browsing rows, given as columns
+    Column names match InboundBrowsingEvent.stringify()
+    """
+    from app.server.game_functions import LOG_UPLOADER
+    LOG_UPLOADER.send_batch(
+            data = columns,
+            table_name= "InboundBrowsing")
@@ -3,14 +3,11 @@ from app.server.models import Base
 import random
 from app import db
 from app.server.modules.helpers.word_generator import WordGenerator
+from app.server.modules.infrastructure.address_allocator import addressAllocator
 
 # Import external modules
-from faker import Faker
-from faker.providers import internet
 
 # Instantiate objects
-fake = Faker()
-fake.add_provider(internet)
 
 wordGenerator = WordGenerator()
 
@@ -36,25 +33,32 @@ class Domain(Base):
         """
         Assemble a domain name using the list of theme words from the Actor object
         """
+        return Domain.get_domain_name(self.actor)
+
+    @staticmethod
+    def get_domain_name(actor) -> str:
+        """
+        Assemble a domain name for an actor, without creating a Domain
+        """
         from app.server.game_functions import LEGIT_DOMAINS
 
         separators = ["","-" ]
-        tlds = self.actor.tld_values
+        tlds = actor.tld_values
         
         # if actor is default, let's get a larger list of randomised words
-        if self.actor.is_default_actor:
+        if actor.is_default_actor:
             return random.choice(LEGIT_DOMAINS)
         else:
             # Splitting string representation of list from db into actual list
-            domain_themes = self.actor.domain_theme_values
-        domain_depth = self.actor.domain_depth or random.randint(1,2)
+            domain_themes = actor.domain_theme_values
+        domain_depth = actor.domain_depth or random.randint(1,2)
         words = random.choices(domain_themes, k=domain_depth)
         # THIS IS A HACK! You can optionally provide a list of domains (rather than theme words) in the actor config under 'domain_themes"
         if domain_depth == 1 and "." in words[0]:
-            domain = random.choice(separators).join(list(set(words)))
+            domain = random.choice(separators).join(list(dict.fromkeys(words)))
         # This is the normal behavior (ie theme_word.tld)
         else:
-            domain = random.choice(separators).join(list(set(words))) + "." + random.choice(tlds)
+            domain = random.choice(separators).join(list(dict.fromkeys(words))) + "." + random.choice(tlds)
 
         return domain
 
@@ -69,4 +73,5 @@ class IP(Base):
 
     def __init__(self, actor): 
         self.actor = actor
-        self.address = fake.ipv4_public()
\ No newline at end of file
+        # the allocator guarantees the address is not used by any other IP
+        self.address = addressAllocator.allocate_public_ips(1)[0]
@@ -3,12 +3,8 @@ from app.server.models import Base
 from app import db
 
 # Import external modules
-from faker import Faker
-from faker.providers import internet
 
 # Instantiate objects
-fake = Faker()
-fake.add_provider(internet)
 
 class WhoIsRecord(Base):
     """
@@ -43,4 +39,3 @@ class WhoIsRecord(Base):
         self.registrant_email = registrant_email
 
 
-
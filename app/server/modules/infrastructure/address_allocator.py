@@ -0,0 +1,105 @@
+import ipaddress
+import numpy as np
+
+from app.server.modules.helpers.identifier_factory import IdentifierFactory, identifierFactory
+
+# Internal addresses are handed out in order, filling each subnet before moving to the next
+# the network address, the gateway (.1) and the broadcast address of each subnet are skipped
+INTERNAL_SUBNETS = [
+    ipaddress.IPv4Network("192.168.0.0/16"),
+    ipaddress.IPv4Network("10.0.0.0/8")
+]
+INTERNAL_SUBNET_CAPACITIES = np.array([subnet.num_addresses - 3 for subnet in INTERNAL_SUBNETS])
+INTERNAL_SUBNET_STARTS = np.concatenate([[0], np.cumsum(INTERNAL_SUBNET_CAPACITIES)])
+
+
+class AddressAllocator:
+    """
+    Hands out unique public IPs for infrastructure and employees' homes
+
+    Allocated addresses are tracked as a set of ints
+    Checking or marking an address is O(1) and needs no database query,
+    and random public addresses take a few dozen bytes each instead of a page of bits per /16
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.allocated = set()
+
+    @property
+    def count_allocated(self) -> int:
+        return len(self.allocated)
+
+    def _is_allocated(self, address: int) -> bool:
+        return address in self.allocated
+
+    def _mark(self, address: int) -> bool:
+        """
+        Mark an address as allocated
+        Returns False if it already was
+        """
+        if address in self.allocated:
+            return False
+        self.allocated.add(address)
+        return True
+
+    def is_allocated(self, address: str) -> bool:
+        return self._is_allocated(int(ipaddress.IPv4Address(address)))
+
+    def reserve(self, addresses: "list[str]") -> None:
+        """
+        Mark addresses that are already in use, e.g. IPs loaded from the database
+        """
+        for address in addresses:
+            if address:
+                self._mark(int(ipaddress.IPv4Address(address)))
+
+    def allocate_public_ips(self, count: int) -> np.ndarray:
+        """
+        Get count public IPs that have never been allocated before, and allocate them
+        """
+        allocated = []
+        while len(allocated) < count:
+            for address in identifierFactory.public_ipv4_ints(count - len(allocated)).tolist():
+                if self._mark(address):
+                    allocated.append(address)
+        return IdentifierFactory.ipv4_strings(allocated)
+
+    def get_unallocated_public_ips(self, count: int) -> np.ndarray:
+        """
+        Get count public IPs that are not allocated, without allocating them
+        Used for noise, which must not collide with actor infrastructure
+        """
+        addresses = identifierFactory.public_ipv4_ints(count)
+        collisions = [i for i, address in enumerate(addresses.tolist()) if self._is_allocated(address)]
+        while collisions:
+            replacements = identifierFactory.public_ipv4_ints(len(collisions))
+            addresses[collisions] = replacements
+            collisions = [i for i in collisions if self._is_allocated(int(addresses[i]))]
+        return IdentifierFactory.ipv4_strings(addresses)
+
+    @staticmethod
+    def get_internal_ips(start_index: int, count: int) -> np.ndarray:
+        """
+        Get the internal IPs at positions start_index to start_index + count of the subnet plan
+        e.g. 0 -> 192.168.0.2, 65533 -> 10.0.0.2
+        """
+        indices = np.arange(start_index, start_index + count)
+        if count and indices[-1] >= INTERNAL_SUBNET_STARTS[-1]:
+            raise Exception("ERROR: The internal subnet plan has run out of addresses")
+
+        subnets = np.searchsorted(INTERNAL_SUBNET_STARTS, indices, side="right") - 1
+        networks = np.array([int(subnet.network_address) for subnet in INTERNAL_SUBNETS], dtype=np.uint32)
+        addresses = networks[subnets] + 2 + (indices - INTERNAL_SUBNET_STARTS[subnets])
+        return IdentifierFactory.ipv4_strings(addresses)
+
+    @staticmethod
+    def get_internal_ip(index: int) -> str:
+        return AddressAllocator.get_internal_ips(index, 1)[0]
+
+
+# shared allocator used by all generators
+# it is reset and seeded with the addresses in the database at the start of each game
+addressAllocator = AddressAllocator()
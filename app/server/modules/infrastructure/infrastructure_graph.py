@@ -0,0 +1,229 @@
+import os
+import random
+import numpy as np
+
+from app import db
+from app.server.modules.infrastructure.Infrastructure import Domain, IP
+from app.server.modules.infrastructure.address_allocator import addressAllocator
+
+
+class InfrastructureGraph:
+    """
+    An actor's infrastructure, held in memory as a bipartite graph of domains and IPs
+
+    Nodes are kept in lists (with a name -> node index dict), so picking a random
+    domain or IP is O(1) instead of loading every row of a relationship.
+    Each passive DNS record is an edge between a domain and an IP, stored in growable arrays.
+    The pivot depth of a node is the number of hops from the first infrastructure the actor
+    created, i.e. how many pivots a player needs to reach it.
+
+    New nodes are written to the database in bulk once per day by persist()
+    """
+
+    # initial capacity of the edge and node arrays, they double when full
+    INITIAL_CAPACITY = 256
+
+    # cache of graphs, keyed by actor name
+    _graphs = {}
+
+    def __init__(self, actor: "Actor") -> None:
+        self.actor = actor
+        self.actor_id = actor.id
+
+        self.domains = []
+        self.domain_index = {}
+        self.ips = []
+        self.ip_index = {}
+
+        # per node stats, indexed like self.domains and self.ips
+        self.domain_degrees = np.zeros(InfrastructureGraph.INITIAL_CAPACITY, dtype=np.int32)
+        self.domain_depths = np.zeros(InfrastructureGraph.INITIAL_CAPACITY, dtype=np.int32)
+        self.ip_degrees = np.zeros(InfrastructureGraph.INITIAL_CAPACITY, dtype=np.int32)
+        self.ip_depths = np.zeros(InfrastructureGraph.INITIAL_CAPACITY, dtype=np.int32)
+
+        # edge i connects self.edge_domains[i] and self.edge_ips[i]
+        self.edge_domains = np.zeros(InfrastructureGraph.INITIAL_CAPACITY, dtype=np.int32)
+        self.edge_ips = np.zeros(InfrastructureGraph.INITIAL_CAPACITY, dtype=np.int32)
+        self.count_edges = 0
+
+        # nodes that are not in the database yet
+        self.unsaved_domains = []
+        self.unsaved_ips = []
+
+    @classmethod
+    def for_actor(cls, actor: "Actor") -> "InfrastructureGraph":
+        """
+        Return the graph for an actor
+        The actor's domains and IPs are loaded from the database only the first time
+        """
+        if actor.name not in cls._graphs:
+            graph = InfrastructureGraph(actor)
+            for domain, in db.session.query(Domain.name).filter(Domain.actor_id == actor.id):
+                graph._add_domain(domain)
+            for address, in db.session.query(IP.address).filter(IP.actor_id == actor.id):
+                graph._add_ip(address)
+            cls._graphs[actor.name] = graph
+        return cls._graphs[actor.name]
+
+    @classmethod
+    def reset(cls) -> None:
+        cls._graphs = {}
+
+    @staticmethod
+    def _grow(array: np.ndarray, size: int) -> np.ndarray:
+        if size <= len(array):
+            return array
+        grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _add_domain(self, name: str, depth: int = 0) -> int:
+        """
+        Add a domain node if it doesn't exist yet, return its index
+        """
+        if name in self.domain_index:
+            return self.domain_index[name]
+        index = self.domain_index[name] = len(self.domains)
+        self.domains.append(name)
+        self.domain_degrees = InfrastructureGraph._grow(self.domain_degrees, index + 1)
+        self.domain_depths = InfrastructureGraph._grow(self.domain_depths, index + 1)
+        self.domain_depths[index] = depth
+        return index
+
+    def _add_ip(self, address: str, depth: int = 0) -> int:
+        """
+        Add an IP node if it doesn't exist yet, return its index
+        """
+        if address in self.ip_index:
+            return self.ip_index[address]
+        index = self.ip_index[address] = len(self.ips)
+        self.ips.append(address)
+        self.ip_degrees = InfrastructureGraph._grow(self.ip_degrees, index + 1)
+        self.ip_depths = InfrastructureGraph._grow(self.ip_depths, index + 1)
+        self.ip_depths[index] = depth
+        return index
+
+    def _add_edge(self, domain_index: int, ip_index: int) -> None:
+        self.edge_domains = InfrastructureGraph._grow(self.edge_domains, self.count_edges + 1)
+        self.edge_ips = InfrastructureGraph._grow(self.edge_ips, self.count_edges + 1)
+        self.edge_domains[self.count_edges] = domain_index
+        self.edge_ips[self.count_edges] = ip_index
+        self.count_edges += 1
+
+        self.domain_degrees[domain_index] += 1
+        self.ip_degrees[ip_index] += 1
+
+    def has_infrastructure(self) -> bool:
+        return bool(self.domains and self.ips)
+
+    def get_random_domain(self) -> str:
+        return self.domains[random.randrange(len(self.domains))]
+
+    def get_random_ips(self, count: int) -> "list[str]":
+        if not self.ips:
+            return []
+        return random.choices(self.ips, k=count)
+
+    def new_thread(self) -> "tuple[str, str]":
+        """
+        Create a new domain and a new IP that resolve to each other
+        This starts a new pivot chain
+        """
+        domain = Domain.get_domain_name(self.actor)
+        is_new = domain not in self.domain_index
+        domain_index = self._add_domain(domain)
+        if is_new:
+            self.unsaved_domains.append(domain)
+
+        ip = addressAllocator.allocate_public_ips(1)[0]
+        ip_index = self._add_ip(ip)
+        self.unsaved_ips.append(ip)
+
+        self._add_edge(domain_index, ip_index)
+        return domain, ip
+
+    def resolve_domain_to_new_ip(self) -> "tuple[str, str]":
+        """
+        Choose an existing domain and give it a new IP
+        """
+        domain_index = random.randrange(len(self.domains))
+        ip = addressAllocator.allocate_public_ips(1)[0]
+        ip_index = self._add_ip(ip, depth=self.domain_depths[domain_index] + 1)
+        self.unsaved_ips.append(ip)
+
+        self._add_edge(domain_index, ip_index)
+        return self.domains[domain_index], ip
+
+    def resolve_new_domain_to_ip(self) -> "tuple[str, str]":
+        """
+        Choose an existing IP and give it a new domain
+        """
+        ip_index = random.randrange(len(self.ips))
+        domain = Domain.get_domain_name(self.actor)
+        is_new = domain not in self.domain_index
+        domain_index = self._add_domain(domain, depth=self.ip_depths[ip_index] + 1)
+        if is_new:
+            self.unsaved_domains.append(domain)
+
+        self._add_edge(domain_index, ip_index)
+        return domain, self.ips[ip_index]
+
+    def get_stats(self) -> "dict[str, float]":
+        """
+        Size, degree and pivot depth stats of the graph
+        """
+        count_domains, count_ips = len(self.domains), len(self.ips)
+        degrees = np.concatenate([self.domain_degrees[:count_domains], self.ip_degrees[:count_ips]])
+        depths = np.concatenate([self.domain_depths[:count_domains], self.ip_depths[:count_ips]])
+        return {
+            "domains": count_domains,
+            "ips": count_ips,
+            "edges": self.count_edges,
+            "mean_degree": float(degrees.mean()) if len(degrees) else 0.0,
+            "max_degree": int(degrees.max()) if len(degrees) else 0,
+            "max_pivot_depth": int(depths.max()) if len(depths) else 0
+        }
+
+    def persist(self) -> int:
+        """
+        Write the nodes created since the last call to the database, in bulk
+        They are committed with the rest of the day's unit of work
+        Returns the number of nodes written
+        """
+        count_nodes = len(self.unsaved_domains) + len(self.unsaved_ips)
+        if self.unsaved_domains:
+            db.session.bulk_insert_mappings(Domain, [{"name": domain, "actor_id": self.actor_id} for domain in self.unsaved_domains])
+        if self.unsaved_ips:
+            db.session.bulk_insert_mappings(IP, [{"address": ip, "actor_id": self.actor_id} for ip in self.unsaved_ips])
+
+        self.unsaved_domains = []
+        self.unsaved_ips = []
+        return count_nodes
+
+    def export(self, path: str) -> None:
+        """
+        Export the graph to a compressed numpy file
+        Edges are stored as node indices into the domain and ip arrays
+        """
+        count_domains, count_ips = len(self.domains), len(self.ips)
+        np.savez_compressed(
+            path,
+            domains=np.array(self.domains, dtype=str),
+            ips=np.array(self.ips, dtype=str),
+            edge_domains=self.edge_domains[:self.count_edges],
+            edge_ips=self.edge_ips[:self.count_edges],
+            domain_depths=self.domain_depths[:count_domains],
+            ip_depths=self.ip_depths[:count_ips]
+        )
+
+    @classmethod
+    def persist_all(cls) -> int:
+        return sum(graph.persist() for graph in cls._graphs.values())
+
+    @classmethod
+    def export_all(cls, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for actor_name, graph in cls._graphs.items():
+            file_name = "".join(c if c.isalnum() else "_" for c in actor_name)
+            graph.export(os.path.join(directory, f"infrastructure_{file_name}.npz"))
+            print(f"Infrastructure for actor {actor_name}: {graph.get_stats()}")
@@ -0,0 +1,47 @@
+import numpy as np
+
+
+class NoiseDomainPool:
+    """
+    The legit domains that the default actor's noise (browsing, email links) is built on
+
+    Domains that show up in noise passive DNS are added to a ring buffer of fixed capacity.
+    Once it is full, the oldest domains are evicted, so the pool rotates over the game
+    and sampling from it costs the same on day 1 and on day 100
+    """
+
+    def __init__(self, capacity: int = 5000) -> None:
+        self.reset(capacity)
+
+    def reset(self, capacity: int = 5000) -> None:
+        self.capacity = capacity
+        self.domains = np.empty(capacity, dtype=object)
+        # number of filled slots
+        self.size = 0
+        # slot of the oldest domain, which is overwritten next once the pool is full
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, domains: "list[str]") -> None:
+        """
+        Add domains to the pool, evicting the oldest ones once it is full
+        """
+        domains = np.asarray(domains, dtype=object)[-self.capacity:]
+        slots = (self.cursor + np.arange(len(domains))) % self.capacity
+        self.domains[slots] = domains
+
+        self.cursor = (self.cursor + len(domains)) % self.capacity
+        self.size = min(self.size + len(domains), self.capacity)
+
+    def get_domains(self) -> np.ndarray:
+        """
+        All domains currently in the pool
+        """
+        return self.domains[:self.size]
+
+
+# shared pool, fed by gen_passive_dns for the default actor
+# its capacity is set at the start of each game from NOISE_DOMAIN_POOL_SIZE in the config
+noiseDomainPool = NoiseDomainPool()
@@ -1,16 +1,17 @@
 # Import internal modules
 from app.server.modules.actors.Actor import Actor
-from app.server.models import db
-from app.server.modules.infrastructure.DNSRecord import DNSRecord
-from app.server.modules.infrastructure.Infrastructure import Domain, IP
+from app.server.modules.infrastructure.address_allocator import addressAllocator
+from app.server.modules.infrastructure.noise_domain_pool import noiseDomainPool
+from app.server.modules.infrastructure.infrastructure_graph import InfrastructureGraph
 from app.server.modules.logging.uploadLogs import LogUploader
 from app.server.utils import *
 from app.server.modules.clock.Clock import Clock
 
 # Import external modules
-from flask import current_app
+from app.server.settings import gameSettings
 from datetime import datetime, date, time
 import random
+import numpy as np
 
 
 def difficulty_to_dns_threads(difficulty):
@@ -50,82 +51,102 @@ def gen_passive_dns(actor: Actor, current_date: date, count_of_records: int = 10
     # For all non-default actors, indicators should be pivotable
     # Result is that 3x number of specified records will be created
     # print(f"Generting {count_of_records} records for actor {actor}")
-    new_records = []
 
     if not actor.is_default_actor and actor.generates_infrastructure:
         # This is a malicious actor
-
-        # TODO: Check if this actor is actually supposed to generate infra
-        base_time = datetime.timestamp(Clock.generate_bimodal_timestamp(start_date=current_date, start_hour=actor.activity_start_hour, day_length=actor.workday_length_hours))
+        # new infrastructure is grown on the actor's in-memory graph
+        # and written to the database at the end of the day
+        graph = InfrastructureGraph.for_actor(actor)
+        pairs = []
         for i in range(count_of_records):
-            if actor.domains_list and actor.ips:            
-                if random.random() < current_app.config['RATE_DOMAIN_RESOLVES_TO_NEW_IP']:
-                    # half the time
+            if graph.has_infrastructure():
+                if random.random() < gameSettings.RATE_DOMAIN_RESOLVES_TO_NEW_IP:
                     #choose an existing domain and give it a new ip
-                    new_ip =IP(actor=actor)
-                    timestamp = Clock.delay_time_by(base_time, factor="days", is_negative=True)
-
-                    new_record = DNSRecord(
-                        time=timestamp,
-                        domain = actor.get_domain(), 
-                        ip = new_ip.address
-                    )
-                    db.session.add(new_ip)
+                    pairs.append(graph.resolve_domain_to_new_ip())
                 else:
-                    # the other half the time
+                    # the other times
                     # choose an existing ip and give it a new domain
-                    new_domain = Domain(actor=actor)
-                    timestamp = Clock.delay_time_by(base_time, factor="days", is_negative=True)
-
-                    new_record = DNSRecord(
-                        time=timestamp,
-                        domain = new_domain.name, 
-                        ip=random.choice(actor.ips_list)
-                    )
-                    db.session.add(new_domain)
+                    pairs.append(graph.resolve_new_domain_to_ip())
             else:
                 ### ONLY WHEN NO DOMAINS EXISTS
                 ### CREATE THREE IP/DOMAIN PAIRS
                 num_threads = difficulty_to_dns_threads(actor.difficulty)
                 for i in range(num_threads):  # This shoudl be defined on the actor
-                    domain = Domain(actor=actor)
-                    ip = IP(actor=actor)
-                    timestamp = Clock.delay_time_by(base_time, factor="days", is_negative=True)
-
-                    new_record = DNSRecord(
-                        time=timestamp,
-                        domain=domain.name, 
-                        ip=ip.address
-                    )
-
-                    db.session.add(domain)
-                    db.session.add(ip)
-                    new_records.append(new_record.stringify())
-                db.session.commit()
-
-            db.session.add(new_record) 
-            new_records.append(new_record.stringify())
-    else:
+                    pairs.append(graph.new_thread())
+
+        # TODO: Check if this actor is actually supposed to generate infra
+        base_time = datetime.timestamp(Clock.generate_bimodal_timestamp(start_date=current_date, start_hour=actor.activity_start_hour, day_length=actor.workday_length_hours))
+        times = Clock.delay_times_by(np.full(len(pairs), base_time), factor="days", is_negative=True)
+        upload_dns_batch_to_azure({
+            "timestamp": Clock.from_timestamps_to_strings(times),
+            "ip": [ip for domain, ip in pairs],
+            "domain": [domain for domain, ip in pairs]
+        })
+    elif actor.is_default_actor:
         # this is the default actor
-        # Time of day doesn't matter for default PDNS
+        # noise records are built as columns, no db objects are needed for them
+        gen_noise_passive_dns(current_date, count_of_records)
+    else:
+        # this actor's infrastructure is not pivotable: every record is a new ip/domain pair
+        graph = InfrastructureGraph.for_actor(actor)
+        pairs = [graph.new_thread() for i in range(count_of_records)]
+
+        # Time of day doesn't matter for these PDNS records
         rand_time = time(
                 hour=random.randint(0,23),
                 minute=random.randint(0,59),
                 second=random.randint(0,59)
             )
         default_datetime = datetime.timestamp(datetime.combine(current_date,rand_time))
-        for i in range(count_of_records):
-            record = DNSRecord(
-                time = Clock.delay_time_by(default_datetime, factor="days", is_negative=True),
-                domain=Domain(actor=actor).name,
-                ip=IP(actor=actor).address
-            )
-            new_records.append(record.stringify())
-            db.session.add(record)
-        db.session.commit()
+        times = Clock.delay_times_by(np.full(len(pairs), default_datetime), factor="days", is_negative=True)
+        upload_dns_batch_to_azure({
+            "timestamp": Clock.from_timestamps_to_strings(times),
+            "ip": [ip for domain, ip in pairs],
+            "domain": [domain for domain, ip in pairs]
+        })
+
+
 
-    upload_dns_records_to_azure(new_records)
-        
+def gen_noise_passive_dns(current_date: date, count_of_records: int) -> None:
+    """
+    Generate passive DNS noise for the default actor
+    Domains are picked from the legit domain list and paired with random public IPs
+    """
+    from app.server.game_functions import LEGIT_DOMAINS
+
+    if not count_of_records:
+        return
+
+    # Time of day doesn't matter for default PDNS
+    rand_time = time(
+            hour=random.randint(0,23),
+            minute=random.randint(0,59),
+            second=random.randint(0,59)
+        )
+    default_datetime = datetime.timestamp(datetime.combine(current_date,rand_time))
+    times = Clock.delay_times_by(np.full(count_of_records, default_datetime), factor="days", is_negative=True)
+
+    domain_indices = np.random.randint(0, len(LEGIT_DOMAINS), count_of_records)
+    domains = [LEGIT_DOMAINS[i] for i in domain_indices]
+    # the resolved domains are the ones that noise browsing and email links can use
+    noiseDomainPool.add(domains)
+
+    upload_dns_batch_to_azure({
+        "timestamp": Clock.from_timestamps_to_strings(times),
+        "ip": addressAllocator.get_unallocated_public_ips(count_of_records),
+        "domain": domains
+    })
+
+
+def upload_dns_batch_to_azure(columns: "dict[str, list]"):
+    """
+    Upload a batch of dns records, given as columns
+    Column names match DNSRecord.stringify()
+    """
+    from app.server.game_functions import LOG_UPLOADER
+    LOG_UPLOADER.send_batch(
+            data=columns,
+            table_name="PassiveDns")
 
 
 def upload_dns_records_to_azure(dns_records):
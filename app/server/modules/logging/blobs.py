@@ -0,0 +1,121 @@
+import os
+import gzip
+import tempfile
+from itertools import count
+
+# Import external modules
+import pandas as pd
+from azure.kusto.data.data_format import DataFormat
+
+# formats a blob can be written in, and the extension of its file
+# e.g. "csv" -> Email_1.csv.gz
+BLOB_FORMATS = {
+    "csv": (DataFormat.CSV, ".csv.gz"),
+    "multijson": (DataFormat.MULTIJSON, ".json.gz"),
+}
+
+
+def get_data_format(path: str) -> DataFormat:
+    """
+    Return the ingestion format of a blob file, from its extension
+    """
+    for data_format, extension in BLOB_FORMATS.values():
+        if path.endswith(extension):
+            return data_format
+    return DataFormat.CSV
+
+
+class CompressedBlob:
+    """
+    A gzip compressed file that a table's rows are appended to until it is big enough to upload
+
+    Kusto ingests blobs of around 100MB-1GB (uncompressed) most efficiently,
+    so rows are collected into one blob per table instead of uploading every batch on its own.
+    Rows are written as CSV without a header (or as one JSON object per line for multijson),
+    and the uncompressed size is counted, so the ingestion service doesn't have to estimate it
+    """
+
+    # gzip's default (9) is much slower for a slightly smaller file
+    COMPRESSION_LEVEL = 6
+
+    def __init__(self, table_name: str, directory: str, blob_format: str = "csv") -> None:
+        self.table_name = table_name
+        self.directory = directory
+        self.data_format, self.extension = BLOB_FORMATS[blob_format]
+        self.sequence = count(1)
+        # column names, in upload order
+        self.columns = None
+        self._open()
+
+    def _open(self) -> None:
+        self.path = os.path.join(self.directory, f"{self.table_name}_{next(self.sequence)}{self.extension}")
+        self.file = None
+        self.count_rows = 0
+        self.raw_size = 0
+
+    def __len__(self) -> int:
+        return self.count_rows
+
+    def write(self, data_table_df: pd.DataFrame) -> None:
+        """
+        Append a dataframe of rows to the blob
+        """
+        if data_table_df.empty:
+            return
+        if self.columns is None:
+            self.columns = list(data_table_df.columns)
+        data_table_df = data_table_df[self.columns]
+
+        if self.data_format == DataFormat.MULTIJSON:
+            data = data_table_df.to_json(orient="records", lines=True)
+            data = data if data.endswith("\n") else data + "\n"
+        else:
+            data = data_table_df.to_csv(index=False, header=False)
+        data = data.encode("utf-8")
+
+        if self.file is None:
+            self.file = gzip.open(self.path, "wb", compresslevel=CompressedBlob.COMPRESSION_LEVEL)
+        self.file.write(data)
+        self.count_rows += len(data_table_df)
+        self.raw_size += len(data)
+
+    def close(self) -> "tuple[str, int, int]":
+        """
+        Finish the blob, and start a new one for the rows that follow
+        Returns the path of the finished file, its number of rows and its uncompressed size
+        or None if no rows were written
+        """
+        if self.file is None:
+            return None
+        self.file.close()
+        blob = (self.path, self.count_rows, self.raw_size)
+        self._open()
+        return blob
+
+
+class BlobWriter:
+    """
+    Holds a CompressedBlob for each table, in a directory (or a temp dir if None)
+    """
+
+    def __init__(self, directory: str = None, blob_format: str = "csv") -> None:
+        # a temp directory is removed again once every blob has been uploaded
+        self.is_temp_directory = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix="kc7_blobs_")
+        os.makedirs(self.directory, exist_ok=True)
+        self.blob_format = blob_format
+        # table_name -> CompressedBlob
+        self.blobs = {}
+
+    def get_blob(self, table_name: str) -> CompressedBlob:
+        if table_name not in self.blobs:
+            self.blobs[table_name] = CompressedBlob(table_name, self.directory, self.blob_format)
+        return self.blobs[table_name]
+
+    def tables(self) -> "list[str]":
+        return [table_name for table_name, blob in self.blobs.items() if len(blob)]
+
+    def cleanup(self) -> None:
+        if self.is_temp_directory and not self.tables() and os.path.isdir(self.directory) \
+                and not os.listdir(self.directory):
+            os.rmdir(self.directory)
@@ -0,0 +1,197 @@
+import sys
+import numpy as np
+import pandas as pd
+
+from app.server.modules.logging.ordering import get_time_column
+
+# pyarrow is optional, it is only needed to hand buffers to Arrow / Parquet
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+class EventBuffer:
+    """
+    The queued rows of one table, held column by column (struct of arrays)
+
+    - the time column is held as datetime64[us], parsed from the strings made by Clock.from_timestamp_to_string
+    - string columns are dictionary encoded: every distinct value (hostname, username, ip, user agent...)
+      is stored once, and each row holds an int32 code into the column's dictionary
+    - numbers and booleans are held as they are
+
+    Buffers turn into a DataFrame of Categoricals (or an Arrow table of DictionaryArrays) without
+    decoding the strings, and the dictionaries are kept across flushes, so repeated values never
+    have to be stored again
+    """
+
+    # rows given one at a time are encoded in blocks of this many rows
+    PENDING_LIMIT = 1000
+    # dictionaries of columns with mostly unique values (urls, hashes...) are dropped
+    # when the buffer is cleared once they hold more values than this
+    MAX_DICTIONARY_SIZE = 100000
+
+    def __init__(self, columns: "list[str]") -> None:
+        self.columns = list(columns)
+        self.time_column = get_time_column(self.columns)
+
+        # column -> "time", "category" or "raw", decided by the first values seen
+        self.kinds = {}
+        # column -> value -> code, and column -> values by code
+        self.codes = {column: {} for column in self.columns}
+        self.categories = {column: [] for column in self.columns}
+        # column -> list of encoded arrays, one per appended batch
+        self.chunks = {column: [] for column in self.columns}
+
+        # rows given as dicts that haven't been encoded yet
+        self.pending_rows = []
+        self.count_rows = 0
+
+    def __len__(self) -> int:
+        return self.count_rows + len(self.pending_rows)
+
+    def append_row(self, row: dict) -> None:
+        self.pending_rows.append(row)
+        if len(self.pending_rows) >= EventBuffer.PENDING_LIMIT:
+            self._encode_pending_rows()
+
+    def append_columns(self, data: "dict[str, list]") -> None:
+        """
+        Append a batch of rows given as columns, e.g. by LogUploader.send_batch
+        """
+        self._encode_pending_rows()
+        count = len(data[self.columns[0]])
+        if not count:
+            return
+        for column in self.columns:
+            values = data.get(column)
+            if values is None:
+                values = [None] * count
+            self.chunks[column].append(self._encode(column, values))
+        self.count_rows += count
+
+    def _encode_pending_rows(self) -> None:
+        if not self.pending_rows:
+            return
+        rows, self.pending_rows = self.pending_rows, []
+        self.append_columns({column: [row.get(column) for row in rows] for column in self.columns})
+
+    def _get_kind(self, column: str, values) -> str:
+        if column not in self.kinds:
+            first = next((value for value in values if value is not None), "")
+            if column == self.time_column and isinstance(first, str):
+                self.kinds[column] = "time"
+            elif isinstance(first, (bool, int, float, np.bool_, np.number)):
+                self.kinds[column] = "raw"
+            else:
+                self.kinds[column] = "category"
+        return self.kinds[column]
+
+    def _encode(self, column: str, values) -> np.ndarray:
+        kind = self._get_kind(column, values)
+        if kind == "time":
+            return EventBuffer.parse_times(values)
+        if kind == "raw":
+            return np.asarray(values)
+
+        # encode the batch on its own, then map its codes to the column's dictionary
+        # so only the distinct values of the batch go through the python dict
+        batch_codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        codes, categories = self.codes[column], self.categories[column]
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        for i, value in enumerate(uniques.tolist()):
+            if value not in codes:
+                codes[value] = len(categories)
+                categories.append(value)
+            mapping[i] = codes[value]
+        # missing values have the code -1, which is kept as -1
+        mapping[-1] = -1
+        return mapping[batch_codes]
+
+    def _get_column(self, column: str) -> np.ndarray:
+        chunks = self.chunks[column]
+        return np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+
+    @staticmethod
+    def parse_times(values) -> np.ndarray:
+        """
+        Parse time strings made by Clock.from_timestamp_to_string, with or without microseconds
+        Each format is given explicitly, so this works the same on pandas 1.4 and later
+        """
+        values = pd.Series(values, dtype=object)
+        times = pd.to_datetime(values, format="%Y-%m-%d %H:%M:%S.%f", errors="coerce")
+        missing = times.isna() & values.notna()
+        if missing.any():
+            times[missing] = pd.to_datetime(values[missing], format="%Y-%m-%d %H:%M:%S")
+        return times.to_numpy(dtype="datetime64[us]")
+
+    @staticmethod
+    def format_times(times: np.ndarray) -> pd.Series:
+        """
+        Format datetime64 values like Clock.from_timestamp_to_string (str(datetime)),
+        with microseconds only when they are not zero
+        """
+        strings = pd.Series(np.datetime_as_string(times, unit="s"), dtype=object).str.replace("T", " ", regex=False)
+        microseconds = times.astype("int64") % 1000000
+        has_microseconds = microseconds != 0
+        if has_microseconds.any():
+            strings[has_microseconds] += "." + pd.Series(microseconds[has_microseconds]).astype(str).str.zfill(6).to_numpy()
+        return strings
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        The buffered rows, with string columns as Categoricals sharing the buffer's dictionaries
+        and the time column formatted back to strings
+        """
+        self._encode_pending_rows()
+        data = {}
+        for column in self.columns:
+            if not self.count_rows:
+                data[column] = []
+            elif self.kinds[column] == "time":
+                data[column] = EventBuffer.format_times(self._get_column(column))
+            elif self.kinds[column] == "category":
+                data[column] = pd.Categorical.from_codes(self._get_column(column), categories=pd.Index(self.categories[column], dtype=object))
+            else:
+                data[column] = self._get_column(column)
+        return pd.DataFrame(data, columns=self.columns)
+
+    def to_arrow(self) -> "pa.Table":
+        """
+        The buffered rows as an Arrow table, with string columns as DictionaryArrays
+        (e.g. to write Parquet), requires pyarrow
+        """
+        if pa is None:
+            raise Exception("ERROR: pyarrow is required to convert event buffers to Arrow")
+        self._encode_pending_rows()
+        arrays = []
+        for column in self.columns:
+            if self.kinds.get(column) == "category":
+                codes = self._get_column(column)
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), pa.array(self.categories[column])))
+            elif self.count_rows:
+                arrays.append(pa.array(self._get_column(column)))
+            else:
+                arrays.append(pa.array([]))
+        return pa.Table.from_arrays(arrays, names=self.columns)
+
+    def clear(self, drop_dictionaries: bool = False) -> None:
+        """
+        Drop the buffered rows, the dictionaries are kept for the next rows unless they grew too large
+        """
+        for column in self.columns:
+            if drop_dictionaries or len(self.categories[column]) > EventBuffer.MAX_DICTIONARY_SIZE:
+                self.codes[column] = {}
+                self.categories[column] = []
+        self.chunks = {column: [] for column in self.columns}
+        self.pending_rows = []
+        self.count_rows = 0
+
+    def get_memory_usage(self) -> int:
+        """
+        Approximate size of the buffer in bytes
+        """
+        size = sum(chunk.nbytes for chunks in self.chunks.values() for chunk in chunks)
+        size += sum(sys.getsizeof(value) for categories in self.categories.values() for value in categories)
+        size += sum(sys.getsizeof(row) for row in self.pending_rows)
+        return size
@@ -0,0 +1,157 @@
+import os
+import random
+import shutil
+from time import sleep
+from datetime import datetime
+from itertools import count
+
+# Import external modules
+import pandas as pd
+from azure.kusto.data.data_format import DataFormat
+from azure.kusto.ingest import IngestionProperties, ReportLevel, FileDescriptor
+
+# Import internal modules
+from app.server.settings import gameSettings
+from app.server.modules.logging.blobs import BLOB_FORMATS, get_data_format
+
+
+class ReliableIngestClient:
+    """
+    Wraps a Kusto ingest client so that a failed upload never loses rows or stops the game
+
+    Every upload is retried up to INGEST_MAX_RETRIES times, waiting an exponential backoff
+    with full jitter in between (a random time up to INGEST_BACKOFF_SECONDS * 2^attempt,
+    capped at INGEST_MAX_BACKOFF_SECONDS), so throttled uploads spread out instead of retrying in step.
+    A batch that still fails is written to the spool directory (INGEST_SPOOL_DIR) as a CSV file
+    (or a compressed blob is moved there) named after its table, and can be uploaded again later with replay()
+    """
+
+    # spool file names are <table name>__<time>_<sequence>.csv (or .csv.gz, .json.gz for blobs)
+    SPOOL_SEPARATOR = "__"
+
+    def __init__(self, ingest_client) -> None:
+        self.ingest_client = ingest_client
+        self.sequence = count()
+        self.count_retries = 0
+        self.count_spooled = 0
+
+    def ingest_from_dataframe(self, data_table_df: pd.DataFrame, ingestion_properties: IngestionProperties):
+        """
+        Upload a dataframe, retrying on failure
+        Returns the result of the upload, or None if the batch was spooled
+        """
+        try:
+            return self._ingest_with_retries(
+                lambda: self.ingest_client.ingest_from_dataframe(data_table_df, ingestion_properties=ingestion_properties),
+                ingestion_properties.table)
+        except Exception as e:
+            print(f"Failed to upload {len(data_table_df)} rows to {ingestion_properties.table}: {e}")
+            self.spool(data_table_df, ingestion_properties.table)
+            return None
+
+    def ingest_from_file(self, path: str, raw_size: int, ingestion_properties: IngestionProperties):
+        """
+        Upload a compressed blob, declaring its uncompressed size, retrying on failure
+        The file is removed once it is uploaded
+        Returns the result of the upload, or None if the blob was spooled
+        """
+        file_descriptor = FileDescriptor(path, size=raw_size)
+        try:
+            result = self._ingest_with_retries(
+                lambda: self.ingest_client.ingest_from_file(file_descriptor, ingestion_properties=ingestion_properties),
+                ingestion_properties.table)
+        except Exception as e:
+            print(f"Failed to upload {path} to {ingestion_properties.table}: {e}")
+            self.spool_file(path, ingestion_properties.table)
+            return None
+        os.remove(path)
+        return result
+
+    def _ingest_with_retries(self, upload, table_name: str):
+        """
+        Run an upload, raise the last error if every attempt fails
+        """
+        max_retries = gameSettings.INGEST_MAX_RETRIES
+        for attempt in range(max_retries + 1):
+            try:
+                return upload()
+            except Exception as e:
+                if attempt == max_retries:
+                    raise
+                delay = random.uniform(0, min(gameSettings.INGEST_MAX_BACKOFF_SECONDS,
+                                              gameSettings.INGEST_BACKOFF_SECONDS * 2 ** attempt))
+                print(f"Upload to {table_name} failed ({e}), retrying in {delay:.1f}s")
+                self.count_retries += 1
+                sleep(delay)
+
+    def _new_spool_path(self, table_name: str, extension: str) -> str:
+        os.makedirs(gameSettings.INGEST_SPOOL_DIR, exist_ok=True)
+        file_name = f"{table_name}{ReliableIngestClient.SPOOL_SEPARATOR}{datetime.now():%Y%m%d%H%M%S}_{next(self.sequence)}{extension}"
+        return os.path.join(gameSettings.INGEST_SPOOL_DIR, file_name)
+
+    def spool(self, data_table_df: pd.DataFrame, table_name: str) -> str:
+        """
+        Write a batch that couldn't be uploaded to the spool directory
+        """
+        path = self._new_spool_path(table_name, ".csv")
+        data_table_df.to_csv(path, index=False)
+        self.count_spooled += 1
+        print(f"Spooled {len(data_table_df)} rows for {table_name} to {path}")
+        return path
+
+    def spool_file(self, path: str, table_name: str) -> str:
+        """
+        Move a compressed blob that couldn't be uploaded to the spool directory
+        """
+        extension = next((extension for _, extension in BLOB_FORMATS.values() if path.endswith(extension)), ".csv.gz")
+        spool_path = self._new_spool_path(table_name, extension)
+        shutil.move(path, spool_path)
+        self.count_spooled += 1
+        print(f"Spooled {path} for {table_name} to {spool_path}")
+        return spool_path
+
+    def replay(self) -> "tuple[int, int]":
+        """
+        Upload the batches in the spool directory again
+        Batches that are uploaded are removed, the rest stay in the spool
+        Returns the number of batches uploaded and the number still spooled
+        """
+        directory = gameSettings.INGEST_SPOOL_DIR
+        if not os.path.isdir(directory):
+            return 0, 0
+
+        count_uploaded, count_failed = 0, 0
+        for file_name in sorted(os.listdir(directory)):
+            if ReliableIngestClient.SPOOL_SEPARATOR not in file_name:
+                continue
+            is_blob = file_name.endswith(".gz")
+            if not is_blob and not file_name.endswith(".csv"):
+                continue
+            table_name = file_name.split(ReliableIngestClient.SPOOL_SEPARATOR)[0]
+            path = os.path.join(directory, file_name)
+
+            ingestion_properties = IngestionProperties(
+                database=gameSettings.DATABASE,
+                table=table_name,
+                data_format=get_data_format(path) if is_blob else DataFormat.CSV,
+                report_level=ReportLevel.FailuresAndSuccesses
+            )
+            if is_blob:
+                # the uncompressed size is read from the gzip trailer by the ingest client
+                upload = lambda: self.ingest_client.ingest_from_file(FileDescriptor(path), ingestion_properties=ingestion_properties)
+            else:
+                data_table_df = pd.read_csv(path, dtype=str, keep_default_na=False)
+                upload = lambda: self.ingest_client.ingest_from_dataframe(data_table_df, ingestion_properties=ingestion_properties)
+            # a batch that fails again stays where it is, instead of being spooled a second time
+            try:
+                self._ingest_with_retries(upload, table_name)
+            except Exception as e:
+                print(f"Failed to replay {path}: {e}")
+                count_failed += 1
+                continue
+            os.remove(path)
+            count_uploaded += 1
+        return count_uploaded, count_failed
+
+    def get_stats(self) -> dict:
+        return {"retries": self.count_retries, "spooled_batches": self.count_spooled}
@@ -0,0 +1,137 @@
+from threading import Lock
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Import external modules
+from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
+from azure.kusto.data.helpers import dataframe_from_result_table
+from azure.kusto.ingest import QueuedIngestClient
+
+# Import internal modules
+from app.server.settings import gameSettings
+
+
+class KustoClientManager:
+    """
+    Process-wide Kusto clients, shared by the views and the game
+
+    The query client and the ingest client are created once and reused,
+    so AAD tokens are cached by the clients and their HTTP connections are kept alive,
+    instead of authenticating again for every page load or uploader.
+    Reading the database's principals is cached for PERMISSIONS_CACHE_SECONDS
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drop the clients, e.g. after the Azure settings changed
+        """
+        self.client = None
+        self.ingest_client = None
+        self.permissions = None
+        self.permissions_time = None
+
+    @staticmethod
+    def get_connection_string(uri: str) -> KustoConnectionStringBuilder:
+        return KustoConnectionStringBuilder.with_aad_application_key_authentication(
+            uri, gameSettings.CLIENT_ID, gameSettings.CLIENT_SECRET, gameSettings.AAD_TENANT_ID)
+
+    def get_client(self) -> KustoClient:
+        with self.lock:
+            if self.client is None:
+                self.client = KustoClient(KustoClientManager.get_connection_string(gameSettings.KUSTO_URI))
+            return self.client
+
+    def get_ingest_client(self) -> QueuedIngestClient:
+        with self.lock:
+            if self.ingest_client is None:
+                self.ingest_client = QueuedIngestClient(KustoClientManager.get_connection_string(gameSettings.KUSTO_INGEST_URI))
+            return self.ingest_client
+
+    def execute_mgmt(self, command: str):
+        """
+        Run a management command on the game's database
+        Raise the first error that comes back from Kusto
+        """
+        response = self.get_client().execute_mgmt(gameSettings.DATABASE, command)
+        if response.get_exceptions():
+            raise response.get_exceptions()[0]
+        return response
+
+    def execute_script(self, commands: "list[str]"):
+        """
+        Run management commands that depend on each other in order, in a single round-trip
+        The script stops at the first command that fails, and its error is raised
+        """
+        script = "\n\n".join(commands)
+        response = self.execute_mgmt(f".execute database script with (ContinueOnErrors=false) <|\n{script}")
+
+        # a command that fails is reported as a row of the result, not as an error of the response
+        results = dataframe_from_result_table(response.primary_results[0])
+        failed = results[results["Result"] != "Completed"]
+        if not failed.empty:
+            command = failed.iloc[0]
+            raise Exception(f"ERROR: {command['CommandType']} failed ({command['Result']}): {command['Reason']}")
+        return response
+
+    def execute_concurrently(self, commands: "list[str]") -> list:
+        """
+        Run independent management commands at the same time
+        Returns their responses in the order of the commands
+        """
+        if len(commands) <= 1:
+            return [self.execute_mgmt(command) for command in commands]
+        with ThreadPoolExecutor(max_workers=min(len(commands), gameSettings.KUSTO_MAX_CONCURRENT_COMMANDS)) as executor:
+            return list(executor.map(self.execute_mgmt, commands))
+
+    @staticmethod
+    def create_user_permission_command(user_strings: "list[str]") -> str:
+        """
+        Take user strings of the following format:
+        aaduser=user@contoso.com
+        msauser=user@outlook.com
+        and make one command that adds all of them as viewers
+        e.g. .add database SecurityLogs viewers ('aaduser=a@contoso.com', 'msauser=b@outlook.com')
+        """
+        # Does every user_string contain one of the required identifiers?
+        for user_string in user_strings:
+            if not any(prefix in user_string for prefix in ['aaduser=', 'msauser=']):
+                raise Exception("ERROR: The user identifier must be prefixed by either aaduser= or msauser=")
+        principals = ", ".join(f"'{user_string}'" for user_string in user_strings)
+        return f".add database {gameSettings.DATABASE} viewers ({principals})"
+
+    def get_user_permissions(self) -> list:
+        """
+        Get a list of user permissions from ADX
+        The list is cached for PERMISSIONS_CACHE_SECONDS
+        """
+        if self.permissions is not None and \
+                (datetime.now() - self.permissions_time).total_seconds() < gameSettings.PERMISSIONS_CACHE_SECONDS:
+            return self.permissions
+
+        show_permissions_command = f".show database {gameSettings.DATABASE} principals | distinct PrincipalDisplayName"
+        response = self.execute_mgmt(show_permissions_command)
+        self.permissions = dataframe_from_result_table(response.primary_results[0])['PrincipalDisplayName'].unique().tolist()
+        self.permissions_time = datetime.now()
+        return self.permissions
+
+    def add_user_permissions(self, user_strings: "list[str]") -> None:
+        """
+        Add users as viewers of the database
+        Up to MAX_PRINCIPALS_PER_COMMAND users are added by each command, and the commands run concurrently
+        """
+        size = gameSettings.MAX_PRINCIPALS_PER_COMMAND
+        commands = [KustoClientManager.create_user_permission_command(user_strings[i:i + size])
+                    for i in range(0, len(user_strings), size)]
+        try:
+            self.execute_concurrently(commands)
+        finally:
+            # the cached permissions are out of date
+            self.permissions = None
+
+
+# shared clients used by the views and the log uploader
+kustoClients = KustoClientManager()
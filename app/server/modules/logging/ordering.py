@@ -0,0 +1,135 @@
+import os
+import csv
+import heapq
+import itertools
+import tempfile
+import pandas as pd
+
+# columns that rows are ordered by, in order of preference
+# e.g. most tables use "timestamp", Email uses "event_time"
+TIME_COLUMNS = ["timestamp", "event_time"]
+
+
+def get_time_column(columns) -> str:
+    """
+    Return the name of the column a table is ordered by, or None if it has none
+    """
+    for column in TIME_COLUMNS:
+        if column in columns:
+            return column
+    return None
+
+
+class ExternalSorter:
+    """
+    Orders each table's rows by time, without holding the whole table in memory
+
+    Every flushed batch is sorted and written to local disk as a "run".
+    When rows are released, the runs of a table are k-way merged (heapq.merge),
+    reading each run a chunk at a time, so memory use depends on the number of runs
+    and the chunk size rather than on the size of the table.
+
+    Time values are the strings produced by Clock.from_timestamp_to_string,
+    which sort in time order
+    """
+
+    def __init__(self, directory: str = None, chunk_size: int = 10000) -> None:
+        # a temp directory is removed again once every run has been merged
+        self.is_temp_directory = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix="kc7_runs_")
+        os.makedirs(self.directory, exist_ok=True)
+        self.chunk_size = chunk_size
+
+        # table_name -> list of run file paths
+        self.runs = {}
+        # table_name -> column names, in upload order
+        self.columns = {}
+        self.count_runs = 0
+
+    def tables(self) -> "list[str]":
+        return [table_name for table_name, runs in self.runs.items() if runs]
+
+    def _new_run_path(self, table_name: str) -> str:
+        self.count_runs += 1
+        return os.path.join(self.directory, f"{table_name}_{self.count_runs}.csv")
+
+    def add_run(self, table_name: str, data_table_df: pd.DataFrame) -> None:
+        """
+        Sort a batch of rows and write it to disk as a run
+        """
+        if data_table_df.empty:
+            return
+        if table_name not in self.columns:
+            self.columns[table_name] = list(data_table_df.columns)
+        data_table_df = data_table_df[self.columns[table_name]]
+
+        time_column = get_time_column(data_table_df.columns)
+        if time_column:
+            data_table_df = data_table_df.sort_values(time_column, kind="stable")
+
+        path = self._new_run_path(table_name)
+        data_table_df.to_csv(path, index=False)
+        self.runs.setdefault(table_name, []).append(path)
+
+    def _read_run(self, path: str):
+        """
+        Yield the rows of a run as tuples, reading a chunk at a time
+        """
+        for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=self.chunk_size):
+            yield from chunk.itertuples(index=False, name=None)
+
+    def merge(self, table_name: str, watermark: str = None):
+        """
+        Merge the runs of a table and yield its rows as time ordered DataFrames of up to chunk_size rows
+
+        If a watermark is given, only rows before it are yielded;
+        the rest are written back as a single run, to be merged with later runs
+        """
+        paths = self.runs.pop(table_name, [])
+        columns = self.columns[table_name]
+        time_column = get_time_column(columns)
+
+        readers = [self._read_run(path) for path in paths]
+        if time_column:
+            time_index = columns.index(time_column)
+            rows = heapq.merge(*readers, key=lambda row: row[time_index])
+        else:
+            rows = itertools.chain(*readers)
+            watermark = None
+
+        chunk = []
+        for row in rows:
+            if watermark is not None and row[time_index] >= watermark:
+                # every row from here on is after the watermark
+                self._write_remaining_run(table_name, columns, itertools.chain([row], rows))
+                break
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+
+        for path in paths:
+            os.remove(path)
+
+    def discard(self) -> None:
+        """
+        Remove every run without merging it, e.g. when the game is stopped before the rows are due
+        """
+        for paths in self.runs.values():
+            for path in paths:
+                os.remove(path)
+        self.runs = {}
+
+    def cleanup(self) -> None:
+        if self.is_temp_directory and not self.tables() and os.path.isdir(self.directory):
+            os.rmdir(self.directory)
+
+    def _write_remaining_run(self, table_name: str, columns: "list[str]", rows) -> None:
+        path = self._new_run_path(table_name)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        self.runs.setdefault(table_name, []).append(path)
@@ -0,0 +1,132 @@
+from time import sleep, monotonic
+
+
+class TokenBucket:
+    """
+    Allows on average rate units per second, with bursts of up to capacity units
+    A rate of None means no limit
+    """
+
+    def __init__(self, rate: float = None, capacity: float = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = monotonic()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, amount: float) -> float:
+        """
+        Take amount tokens, waiting until they are available
+        Amounts larger than the capacity take the bucket into debt, so a large batch
+        delays the batches after it instead of never going through
+        Returns the number of seconds waited
+        """
+        if not self.rate:
+            return 0.0
+        self._refill()
+        wait = 0.0
+        if self.tokens < min(amount, self.capacity):
+            wait = (min(amount, self.capacity) - self.tokens) / self.rate
+            sleep(wait)
+            self._refill()
+        self.tokens -= amount
+        return wait
+
+
+class IngestionGovernor:
+    """
+    Paces uploads to Kusto, so ingestion arrives at a steady rate instead of in bursts
+
+    Each table has a token bucket for rows per second and one for bytes per second.
+    Batch sizes are adapted to the observed ingestion latency, like TCP's congestion window:
+    they start at min_batch_rows and double after every batch that uploads faster than the target latency
+    (slow start), until the first slow or failed batch halves them.
+    From then on, a fast batch lets the next one grow by min_batch_rows (additive increase)
+    and a slow or failed batch halves the batch size (multiplicative decrease)
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self, rows_per_second: float = None, bytes_per_second: float = None,
+              target_latency: float = 5.0, min_batch_rows: int = 1000, max_batch_rows: int = 100000) -> None:
+        self.rows_per_second = rows_per_second
+        self.bytes_per_second = bytes_per_second
+        self.target_latency = target_latency
+        self.min_batch_rows = min_batch_rows
+        self.max_batch_rows = max_batch_rows
+
+        # table_name -> (rows bucket, bytes bucket)
+        self.buckets = {}
+        # table_name -> rows per batch
+        self.batch_sizes = {}
+        # tables whose batches have been slow or failed, and so have left slow start
+        self.congested = set()
+        # table_name -> dict of counters, see record()
+        self.stats = {}
+        self.started = monotonic()
+
+    def get_batch_size(self, table_name: str) -> int:
+        """
+        Rows per batch for the table
+        A batch can be more than a second's worth of rows, the buckets then delay the batches after it
+        """
+        return self.batch_sizes.setdefault(table_name, self.min_batch_rows)
+
+    def acquire(self, table_name: str, count_rows: int, count_bytes: int) -> float:
+        """
+        Wait until a batch of this many rows and bytes may be uploaded to the table
+        Returns the number of seconds waited
+        """
+        if table_name not in self.buckets:
+            self.buckets[table_name] = (TokenBucket(self.rows_per_second), TokenBucket(self.bytes_per_second))
+        rows_bucket, bytes_bucket = self.buckets[table_name]
+        wait = rows_bucket.consume(count_rows) + bytes_bucket.consume(count_bytes)
+        self.stats.setdefault(table_name, {"rows": 0, "bytes": 0, "batches": 0, "failures": 0, "seconds_waited": 0.0, "last_latency": None})
+        self.stats[table_name]["seconds_waited"] += wait
+        return wait
+
+    def record(self, table_name: str, count_rows: int, count_bytes: int, latency: float, is_success: bool) -> None:
+        """
+        Record an upload, and adapt the table's batch size to its latency
+        """
+        stats = self.stats[table_name]
+        stats["batches"] += 1
+        stats["last_latency"] = round(latency, 3)
+        batch_size = self.get_batch_size(table_name)
+        if is_success:
+            stats["rows"] += count_rows
+            stats["bytes"] += count_bytes
+        else:
+            stats["failures"] += 1
+
+        if is_success and latency <= self.target_latency:
+            batch_size = batch_size + self.min_batch_rows if table_name in self.congested else batch_size * 2
+        else:
+            self.congested.add(table_name)
+            batch_size //= 2
+        self.batch_sizes[table_name] = max(self.min_batch_rows, min(self.max_batch_rows, batch_size))
+
+    def get_stats(self) -> dict:
+        """
+        Per table counters, average rates since the game started and current batch sizes
+        """
+        elapsed = max(monotonic() - self.started, 1e-9)
+        return {
+            table_name: {
+                **stats,
+                "rows_per_second": round(stats["rows"] / elapsed, 1),
+                "bytes_per_second": round(stats["bytes"] / elapsed, 1),
+                "batch_size": self.get_batch_size(table_name)
+            }
+            for table_name, stats in self.stats.items()
+        }
+
+
+# shared governor for all uploads
+# it is reset at the start of each game from the INGEST_* settings in the config
+ingestionGovernor = IngestionGovernor()
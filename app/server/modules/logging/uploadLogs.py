@@ -1,17 +1,16 @@
 # Import external modules
+import os
+from time import monotonic
 from inspect import istraceback
 from multiprocessing.dummy import Process
 import pandas as pd
 import json
-from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
 from azure.kusto.data.exceptions import KustoServiceError
-from azure.kusto.data.helpers import dataframe_from_result_table
 from azure.kusto.data.data_format import DataFormat
-from azure.kusto.ingest import QueuedIngestClient, IngestionProperties, FileDescriptor, BlobDescriptor, ReportLevel, ReportMethod
-from flask import current_app
-from azure.kusto.data.helpers import dataframe_from_result_table
+from azure.kusto.ingest import IngestionProperties, FileDescriptor, BlobDescriptor, ReportLevel, ReportMethod
 
 # Import internal modules
+from app.server.settings import gameSettings
 from app.server.modules.outbound_browsing.outboundEvent import OutboundEvent
 from app.server.modules.endpoints.file_creation_event import FileCreationEvent
 from app.server.modules.endpoints.processes import ProcessEvent
@@ -21,6 +20,13 @@ from app.server.modules.organization.Company import Employee
 from app.server.modules.authentication.authenticationEvent import AuthenticationEvent
 from app.server.modules.inbound_browsing.inboundEvent import InboundBrowsingEvent
 from app.server.modules.alerts.alerts import SecurityAlert
+from app.server.modules.logging.ordering import ExternalSorter, get_time_column
+from app.server.modules.logging.event_buffer import EventBuffer
+from app.server.modules.logging.blobs import BlobWriter
+from app.server.modules.helpers.memory_budget import memoryBudget
+from app.server.modules.logging.kusto_clients import kustoClients
+from app.server.modules.logging.ingestion import ReliableIngestClient
+from app.server.modules.logging.rate_limiter import ingestionGovernor
 
 
 class LogUploader():
@@ -34,139 +40,112 @@ class LogUploader():
 
     def __init__(self, queue_limit=1000):
         # set Azure tenant config variables
-        self.AAD_TENANT_ID = current_app.config["AAD_TENANT_ID"]
-        self.KUSTO_URI = current_app.config["KUSTO_URI"]
-        self.KUSTO_INGEST_URI = current_app.config["KUSTO_INGEST_URI"]
-        self.DATABASE = current_app.config["DATABASE"]
+        self.AAD_TENANT_ID = gameSettings.AAD_TENANT_ID
+        self.KUSTO_URI = gameSettings.KUSTO_URI
+        self.KUSTO_INGEST_URI = gameSettings.KUSTO_INGEST_URI
+        self.DATABASE = gameSettings.DATABASE
         self.CUSTOM_TYPES = [
                                 DNSRecord, Employee,
                                 OutboundEvent, FileCreationEvent, 
                                 Email, AuthenticationEvent, InboundBrowsingEvent, 
                                 ProcessEvent, SecurityAlert]
 
-        # Aauthenticate with AAD application.
-        self.client_id = current_app.config["CLIENT_ID"]
-        self.client_secret = current_app.config["CLIENT_SECRET"]
-
-        # authentication for ingestion client
-        kcsb_ingest = KustoConnectionStringBuilder.with_aad_application_key_authentication(self.KUSTO_INGEST_URI,
-                                                                                           self.client_id, self.client_secret, self.AAD_TENANT_ID)
-
-        # authentication for general client
-        kcsb_data = KustoConnectionStringBuilder.with_aad_application_key_authentication(self.KUSTO_URI,
-                                                                                         self.client_id, self.client_secret, self.AAD_TENANT_ID)
-
-        self.ingest = QueuedIngestClient(kcsb_ingest)
-        self.client = KustoClient(kcsb_data)
+        # The ingestion and general clients are shared by the whole process
+        # they authenticate with the AAD application once and cache their tokens
+        # failed uploads are retried, and spooled to disk if they keep failing
+        self.ingest = ReliableIngestClient(kustoClients.get_ingest_client())
+        self.client = kustoClients.get_client()
 
         # The queue will allow us to upload multiple rows at once
         # This allows the game to runs faster and enable us to make fewer API calls
+        # Rows are held in a columnar, dictionary encoded buffer per table
         # self.queue will be in the format:
         # {
-        #   "table_name": [dict, dict, dict],
-        #   "table_name2": [dict, dict, dict]
+        #   "table_name": EventBuffer,
+        #   "table_name2": EventBuffer
         # }
         self.queue = {}
         # how many records do we hold until submitting everything to kusto
         self.queue_limit = queue_limit
 
+        # When output ordering is enabled, flushed rows are written to disk as sorted runs
+        # and only uploaded when they are released, merged in time order
+        # Live games always hold rows until the game clock passes them
+        self.sorter = None
+        if gameSettings.ORDER_OUTPUT or gameSettings.LIVE_MODE:
+            self.sorter = ExternalSorter(directory=gameSettings.ORDERING_RUN_DIR, chunk_size=queue_limit)
+        # Rows are uploaded as gzip compressed blobs, one per table, of up to INGEST_BLOB_TARGET_MB (uncompressed)
+        # so a large game makes few ingestion operations, each sending much less data
+        self.blob_writer = BlobWriter(directory=gameSettings.INGEST_BLOB_DIR, blob_format=gameSettings.INGEST_BLOB_FORMAT)
+        # time up to which each table's rows have been released
+        # e.g. {"Email": "2023-03-02 00:00:00"}
+        self.watermarks = {}
+        # number of rows per table that arrived after their table's watermark had passed them
+        self.count_late_rows = {}
+
     def create_tables(self, reset: bool = False) -> None:
         """
         Create the tables that the logs will be uploaded to in Kusto
+        All tables are dropped (on reset) and created by a single database script, in one round-trip
         """
         # Get KQL representation of each Class object
-        drop_table_commands = []
-        create_table_commands = []
-
-        for custom_type in self.CUSTOM_TYPES:
-            table_name, kql_repr = custom_type.get_kql_repr()
-            command = LogUploader.create_table_command(table_name, kql_repr)
-            create_table_commands.append(command)
-            if reset:
-                drop_table_commands.append(
-                    f".drop table {table_name} ifexists"
-                )
-
-        # print("\n\n\n".join(drop_table_commands))
-        # print("\n\n\n".join(create_table_commands))
-
-        if current_app.config["ADX_DEBUG_MODE"]:
+        tables = dict(custom_type.get_kql_repr() for custom_type in self.CUSTOM_TYPES)
+
+        commands = []
+        if reset:
+            commands.append(LogUploader.drop_tables_command(list(tables)))
+        commands.append(LogUploader.create_merge_tables_command(tables))
+
+        if gameSettings.ADX_DEBUG_MODE:
             # If ADX_DEBUG_MODE is enabled, return early
             # This will prevent creating tables on the ADX cluster
             return
 
         # Execute the Kql commands
-        for command in (drop_table_commands + create_table_commands):
-            response = self.client.execute_mgmt(self.DATABASE, command)
-            print(response)
+        response = kustoClients.execute_script(commands)
+        print(response)
 
     @staticmethod
-    def create_table_command(table_name: str, table_options: dict) -> str:
+    def drop_tables_command(table_names: "list[str]") -> str:
         """
-        Take in a dictionary of options
-        Generate texts required to create a new table in Kusto
-
-        Input dict: {
-            "time": "string",
-            "method":"string",
-            "scr_ip":"string",
-            "user_agent":"string",
-            "url", "string"
-        }
-        Example:
-        create table ['OutboundBrowsingEvents']  
-            (['time']:string, 
-            ['method']:string, 
-            ['src_ip']:string, 
-            ['user_agent']:string, 
-            ['url']:string)
+        e.g. .drop tables (['Email'], ['PassiveDns']) ifexists
         """
-
-        kql_command = f".create table ['{table_name}']\n"
-        command_parts = [f"['{col}']:{val_type}" for col,
-                         val_type in table_options.items()]
-        kql_command = kql_command + "(" + ",\n".join(command_parts) + ")"
-
-        return kql_command
+        return ".drop tables (" + ", ".join(f"['{table_name}']" for table_name in table_names) + ") ifexists"
 
     @staticmethod
-    def _create_user_permission_command(user_string:str, database: str) -> str:
-        """
-        Take a user string of the following format:
-        aaduser=user@contoso.com
-        msauser=user@outlook.com
+    def create_merge_tables_command(tables: "dict[str, dict]") -> str:
         """
-        # Does the user_string contain one of the required identifiers?
-        if not any(prefix in user_string for prefix in ['aaduser=','msauser=']):
-            raise Exception("ERROR: The user identifier must be prefixed by either aaduser= or msauser=")
-        return f".add database {database} viewers ('{user_string}')"
+        Take in a dictionary of table name -> column options
+        Generate the command that creates all tables in Kusto,
+        or adds missing columns to tables that already exist
 
-    def get_user_permissions(self) -> list:
-        """
-        Get a list of user permissions from ADX
+        Input dict: {
+            "OutboundBrowsingEvents": {
+                "time": "string",
+                "method":"string",
+                "scr_ip":"string",
+                "user_agent":"string",
+                "url", "string"
+            }
+        }
+        Example:
+        .create-merge tables
+        ['OutboundBrowsingEvents'] (['time']:string, ['method']:string, ['src_ip']:string, ['user_agent']:string, ['url']:string),
+        ['Email'] (...)
         """
-        show_permissions_command = f".show database {self.DATABASE} principals | distinct PrincipalDisplayName"
-        response = self.client.execute_mgmt(self.DATABASE, show_permissions_command)
-
-        # Handle errors from Kusto Client
-        if response.get_exceptions():
-            raise response.get_exceptions()
+        table_parts = []
+        for table_name, table_options in tables.items():
+            command_parts = [f"['{col}']:{val_type}" for col, val_type in table_options.items()]
+            table_parts.append(f"['{table_name}'] (" + ", ".join(command_parts) + ")")
 
-        return dataframe_from_result_table(response.primary_results[0])['PrincipalDisplayName'].unique().tolist()
-
-    def add_user_permissions(self, user_string: str) -> None:
-        permission_command = LogUploader._create_user_permission_command(user_string, self.DATABASE)
-        response = self.client.execute_mgmt(self.DATABASE, permission_command)
-        # Raise any errors that come back from 
-        if response.get_exceptions():
-            raise response.get_exceptions()
+        return ".create-merge tables\n" + ",\n".join(table_parts)
 
     def get_queue_length(self):
         """
         Get the number of records stored in the queue
         this does a sum of lengths for lists under each tablename key
         """
-        return sum([len(val) for key, val in self.queue.items()])
+        return sum([len(buffer) for buffer in self.queue.values()])
 
     def send_request(self, data: dict, table_name: str) -> None:
         """
@@ -179,57 +158,194 @@ class LogUploader():
             data = data[0]
 
         # Add the data to the queue
-        # Data is appended to a list under table_name key in self.queue
-        # e.g. {
-        #    "table_name": [data]
-        # }
-        if table_name in self.queue:
-            self.queue[table_name].append(data)
-        else:
-            self.queue[table_name] = [data]
+        # Data is appended to the buffer under table_name key in self.queue
+        if table_name not in self.queue:
+            self.queue[table_name] = EventBuffer(columns=data.keys())
+        self.queue[table_name].append_row(data)
+        memoryBudget.add_rows(1)
 
         # reached the queue limit
         # submit all existing records and clear the queue
         if self.get_queue_length() > self.queue_limit:
-            for table_name, data in self.queue.items():
-                self.ingestion_props = IngestionProperties(
-                    database=self.DATABASE,
-                    table=table_name,
-                    data_format=DataFormat.CSV,
-                    report_level=ReportLevel.FailuresAndSuccesses
-                )
-
-                # turn list of rows in a dataframe
-                # TODO: sort by time before uploading -
-                #   need to first standardize time columns accross tables
-                data_table_df = pd.DataFrame(self.queue[table_name])
-                
-                try:
-                    # if possible sort value using the "timestamp" column
-                    data_table_df = data_table_df.sort_values("timestamp", ascending=True)
-                except Exception as e:
-                    print(f"failed to sort rows: {e}")
-
-
-                print(f"uploading data for type {table_name}")
-                print(data_table_df.shape)
-
-                if current_app.config["ADX_DEBUG_MODE"]:
-                    # If ADX_DEBUG_MODE is enabled, print JSON representation of data
-                    # Then, return early to prevent queueing and uploading to ADX
-                    print(f"Uploading to table {table_name}...")
-
-                    # if table_name == "SecurityAlert":
-                    #     print(data_table_df.to_markdown())
-                else:
-                    # submit logs to Kusto
-                    result =  self.ingest.ingest_from_dataframe(
-                        data_table_df, ingestion_properties=self.ingestion_props)
-                    print(result)
-                    print(f"....adding {data_table_df.shape} to azure for {table_name} table")
-
-            # reset the quee
-            self.queue = {}
+            self.flush()
         else:
             pass
-            # print(f"======> Submission queue @ {self.get_queue_length()}")
\ No newline at end of file
+            # print(f"======> Submission queue @ {self.get_queue_length()}")
+
+    def send_batch(self, data: "dict[str, list]", table_name: str) -> None:
+        """
+        Queue a batch of rows given as columns
+        e.g. {
+            "timestamp": [time, time],
+            "src_ip": [ip, ip]
+        }
+        Column names and order should match the stringify() output of the table's event type
+        """
+        if table_name not in self.queue:
+            self.queue[table_name] = EventBuffer(columns=data.keys())
+        self.queue[table_name].append_columns(data)
+        memoryBudget.add_rows(len(data[next(iter(data))]))
+
+        if self.get_queue_length() > self.queue_limit:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Submit all existing records and clear the queue
+        """
+        for table_name, buffer in self.queue.items():
+            if not len(buffer):
+                continue
+            # turn the buffered rows into a dataframe
+            data_table_df = buffer.to_dataframe()
+            buffer.clear()
+
+            if self.sorter:
+                # rows behind the table's watermark are uploaded out of order with the next release
+                time_column = get_time_column(data_table_df.columns)
+                if time_column and table_name in self.watermarks:
+                    count_late = int((data_table_df[time_column].astype(str) < self.watermarks[table_name]).sum())
+                    if count_late:
+                        self.count_late_rows[table_name] = self.count_late_rows.get(table_name, 0) + count_late
+                        print(f"WARNING: {count_late} {table_name} rows are behind its watermark {self.watermarks[table_name]}")
+                # hold the rows on disk until they are released in time order
+                self.sorter.add_run(table_name, data_table_df)
+                continue
+
+            # sort value using the table's time column
+            time_column = get_time_column(data_table_df.columns)
+            if time_column:
+                data_table_df = data_table_df.sort_values(time_column, ascending=True)
+
+            self.ingest_dataframe(data_table_df, table_name)
+
+    def spill(self) -> int:
+        """
+        Free the memory held by the queue, e.g. when the game is over its memory budget
+        Queued rows are written to disk as sorted runs (or uploaded if output isn't ordered)
+        and the buffers' dictionaries are dropped
+        Returns the number of rows that were spilled
+        """
+        count_rows = self.get_queue_length()
+        self.flush()
+        for buffer in self.queue.values():
+            buffer.clear(drop_dictionaries=True)
+        return count_rows
+
+    def release(self, watermark: str = None) -> None:
+        """
+        Upload the rows held by the sorter in time order
+        If a watermark (time string) is given, only rows before it are uploaded
+        Live games upload their blobs straight away, so released rows can be queried
+        """
+        if self.sorter:
+            for table_name in self.sorter.tables():
+                for data_table_df in self.sorter.merge(table_name, watermark=watermark):
+                    self.ingest_dataframe(data_table_df, table_name)
+                    # without a watermark, the table has been uploaded up to its latest row
+                    time_column = get_time_column(data_table_df.columns)
+                    if watermark is None and time_column and not data_table_df.empty:
+                        self._advance_watermark(table_name, data_table_df[time_column].iloc[-1])
+
+            if watermark is not None:
+                for table_name in self.sorter.columns:
+                    self._advance_watermark(table_name, watermark)
+
+        if watermark is None or gameSettings.LIVE_MODE:
+            self.submit_blobs()
+
+    def _advance_watermark(self, table_name: str, watermark: str) -> None:
+        # watermarks only move forward
+        if watermark > self.watermarks.get(table_name, ""):
+            self.watermarks[table_name] = watermark
+
+    def finalize(self) -> None:
+        """
+        Submit everything that is still queued or held, e.g. at the end of the game
+        """
+        self.flush()
+        self.release()
+        if self.sorter:
+            self.sorter.cleanup()
+        self.blob_writer.cleanup()
+
+    def discard(self) -> None:
+        """
+        Drop the rows that haven't been released, e.g. when a live game is stopped
+        before its clock reaches them, so they are never uploaded
+        Rows that were already released are still uploaded
+        """
+        self.submit_blobs()
+        for buffer in self.queue.values():
+            buffer.clear(drop_dictionaries=True)
+        if self.sorter:
+            self.sorter.discard()
+            self.sorter.cleanup()
+        self.blob_writer.cleanup()
+
+    def get_ingestion_properties(self, table_name: str, data_format: DataFormat = DataFormat.CSV) -> IngestionProperties:
+        return IngestionProperties(
+            database=self.DATABASE,
+            table=table_name,
+            data_format=data_format,
+            report_level=ReportLevel.FailuresAndSuccesses
+        )
+
+    def ingest_dataframe(self, data_table_df: pd.DataFrame, table_name: str) -> None:
+        """
+        Add a dataframe of rows to its table's blob
+        The blob is uploaded to Kusto once it reaches INGEST_BLOB_TARGET_MB (uncompressed)
+        or as many rows as the ingestion governor allows per batch
+        """
+        print(f"uploading data for type {table_name}")
+        print(data_table_df.shape)
+
+        if gameSettings.ADX_DEBUG_MODE:
+            # If ADX_DEBUG_MODE is enabled, print JSON representation of data
+            # Then, return early to prevent queueing and uploading to ADX
+            print(f"Uploading to table {table_name}...")
+
+            # if table_name == "SecurityAlert":
+            #     print(data_table_df.to_markdown())
+            return
+
+        blob = self.blob_writer.get_blob(table_name)
+        target_size = gameSettings.INGEST_BLOB_TARGET_MB * 1024 * 1024
+        start = 0
+        while start < len(data_table_df):
+            # fill the blob up to the governor's batch size, and upload it when it is full
+            count_rows = max(ingestionGovernor.get_batch_size(table_name) - len(blob), 1)
+            blob.write(data_table_df.iloc[start:start + count_rows])
+            start += count_rows
+            if blob.raw_size >= target_size or len(blob) >= ingestionGovernor.get_batch_size(table_name):
+                self.submit_blob(table_name)
+
+    def submit_blob(self, table_name: str) -> None:
+        """
+        Upload a table's blob to Kusto, paced by the ingestion governor
+        """
+        blob = self.blob_writer.get_blob(table_name)
+        data_format = blob.data_format
+        closed_blob = blob.close()
+        if closed_blob is None:
+            return
+        path, count_rows, raw_size = closed_blob
+
+        # the bandwidth limit applies to the compressed bytes that are sent
+        count_bytes = os.path.getsize(path)
+        ingestionGovernor.acquire(table_name, count_rows, count_bytes)
+
+        upload_start = monotonic()
+        result = self.ingest.ingest_from_file(
+            path, raw_size, ingestion_properties=self.get_ingestion_properties(table_name, data_format))
+        ingestionGovernor.record(table_name, count_rows, count_bytes,
+                                 latency=monotonic() - upload_start, is_success=result is not None)
+        print(result)
+        print(f"....adding {count_rows} rows ({raw_size} bytes, {count_bytes} compressed) to azure for {table_name} table")
+
+    def submit_blobs(self) -> None:
+        """
+        Upload every table's blob, however full it is
+        """
+        for table_name in self.blob_writer.tables():
+            self.submit_blob(table_name)
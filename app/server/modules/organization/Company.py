@@ -1,27 +1,19 @@
 from os import name
 import random
-import string
-import ipaddress
 from json import JSONEncoder
-from faker import Faker
-from faker.providers import internet, user_agent, person
-from user_agent import generate_user_agent, generate_navigator
 from sqlalchemy import func
 import names
 from datetime import date, timedelta, datetime
 
 from app.server.models import Base
 from app.server.modules.clock.Clock import Clock
+from app.server.modules.helpers.identifier_factory import identifierFactory
+from app.server.modules.helpers.faker_pool import fakerPool
+from app.server.modules.infrastructure.address_allocator import addressAllocator
 from app.server.models import GameSession
 
 from app import db
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(internet)
-fake.add_provider(user_agent)
-fake.add_provider(person)
-
 
 class Company(Base):
     """
@@ -56,7 +48,7 @@ class Company(Base):
             self.domain = domain
         else:
             # If a domain is not provided, take the name and add a random TLD
-            self.domain = str.lower("".join(name.split())).replace(",", "") + "." + fake.tld()
+            self.domain = str.lower("".join(name.split())).replace(",", "") + "." + fakerPool.get_one("tld")
 
         self.count_employees = count_employees
         # this var will allow us to keep count of company employees 
@@ -138,10 +130,10 @@ class Company(Base):
 
     def get_internal_ip(self) -> str:
         """Assign the employee an IP on the local network"""
-        #  IP is 192.168.0.2 + count of employee (using CIDR addition)
-        # this tries to reduce chance of IP collisions
-    
-        ip = format(ipaddress.IPv4Address('192.168.0.2') + self.get_num_generated_ips())
+        #  IP is the count of employee'th address in the internal subnet plan
+        # (192.168.0.2 onwards, then 10.0.0.2 onwards once the /16 is full)
+        # so IPs never collide
+        ip = addressAllocator.get_internal_ip(self.get_num_generated_ips())
         # increment this -> so we know we have one more employee 
         # without needing to query the DB
         self.num_generated_ips +=1
@@ -220,10 +212,10 @@ class Employee(Base):
                 timestamp:float, role:str="",  user_agent: str=None,) -> None:
         self.name = name
         
-        self.user_agent = generate_user_agent(os=('win'))
+        self.user_agent = identifierFactory.user_agents(1, profile="windows")[0]
         self.ip_addr = ip_addr
-        self.home_ip_addr = fake.ipv4_public()
-        self.home_ua = fake.user_agent()
+        self.home_ip_addr = addressAllocator.allocate_public_ips(1)[0]
+        self.home_ua = identifierFactory.user_agents(1, profile="any")[0]
         self.company = company
         # TODO: Make this global setting
         self.awareness = random.randint(30, 90)
@@ -284,10 +276,7 @@ class Employee(Base):
 
         Example: X7O9-DESTOP
         """
-        prefix = random.choices(string.ascii_letters + string.digits, k=4)
-        prefix = str.upper("".join(prefix))
-        postfix = random.choice(["DESKTOP", "LAPTOP", "MACHINE"])
-        self.hostname = f"{prefix}-{postfix}"
+        self.hostname = identifierFactory.hostnames(1)[0]
 
 
     def stringify(self) -> "dict[str,str]":
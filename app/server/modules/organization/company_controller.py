@@ -1,9 +1,6 @@
 import random 
 
 # Import external modules
-from flask import current_app
-from faker import Faker
-from faker.providers import internet, person, company
 
 # Import internal modules
 from app.server.models import db
@@ -12,12 +9,6 @@ from app.server.modules.logging.uploadLogs import LogUploader
 from app.server.modules.clock.Clock import Clock
 from app.server.modules.helpers.config_helper import read_config_from_yaml
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(internet)
-fake.add_provider(person)
-fake.add_provider(company)
-
 
 def upload_employee_to_azure(employee: Employee) -> None:
     """
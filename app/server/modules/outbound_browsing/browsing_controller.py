@@ -1,59 +1,59 @@
 import os
 import random, json
 import urllib.parse
+import numpy as np
 from datetime import datetime, timedelta, date
  
-from faker import Faker
-from faker.providers import internet
-from faker.providers import user_agent
 
 # Import internal modules
-from flask import current_app
+from app.server.settings import gameSettings
 from app.server.modules.logging.uploadLogs import LogUploader
-from app.server.modules.outbound_browsing.outboundEvent import OutboundEvent
+from app.server.modules.outbound_browsing.outboundEvent import OutboundEvent, METHODS
 from app.server.modules.clock.Clock import Clock 
+from app.server.modules.triggers.scheduler import eventScheduler
 from app.server.models import GameSession
 from app.server.utils import *
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(internet)
-fake.add_provider(user_agent)
 
 @timing
 def browse_random_website(employees:"list[Employee]", actor:Actor, count_browsing:int, percent_employees_to_generate: float, start_date: date):
     """
     Generate n web requests to random websites on the internet  
     # this should typically be for the default actor  
+
+    The whole day of browsing is built column by column
+    (employee indices, timestamps, urls, methods and status codes)
+    and handed to the uploader as a single batch
     """
     company = get_company()
 
     # for default actor, browse partner domains 5% of the time
+    domains_to_browse = get_actor_domains(actor)
     if actor.is_default_actor:
-        if random.random() < current_app.config['RATE_USER_BROWSE_TO_PARTNER_DOMAIN_RANDOM']:
-            domains_to_browse = company.get_partners()
-        else:
-            domains_to_browse=actor.domains_list
+        if random.random() < gameSettings.RATE_USER_BROWSE_TO_PARTNER_DOMAIN_RANDOM:
+            domains_to_browse = np.array(company.get_partners(), dtype=object)
 
     # Get the number of employees to generate
     total_num_employees = company.count_employees
     employees_for_activity_generation = int(total_num_employees*percent_employees_to_generate)
-    employees_to_generate = random.choices(employees, k=employees_for_activity_generation)
-
-    browsing_events = []
-    # TODO: Can this be made more efficient?
-    for employee in employees_to_generate:
-        for _ in range(count_browsing):
-            link = get_link(actor=actor, actor_domains=domains_to_browse)
-            employee = random.choice(employees)
-            time = Clock.generate_bimodal_timestamp(start_date, actor.activity_start_hour, actor.workday_length_hours).timestamp()
-            outbound_event = OutboundEvent(
-                time=time,
-                src_ip=employee.ip_addr,
-                user_agent=employee.user_agent,
-                url=link,
-            )
-            upload_event_to_azure(outbound_event, "OutboundBrowsing")    
+    count_events = employees_for_activity_generation * count_browsing
+    if not (count_events and len(domains_to_browse) and employees):
+        return
+
+    # every browsing event is made by a random employee
+    employee_ips = np.array([employee.ip_addr for employee in employees], dtype=object)
+    employee_user_agents = np.array([employee.user_agent for employee in employees], dtype=object)
+    employee_indices = np.random.randint(0, len(employees), count_events)
+
+    timestamps = Clock.generate_bimodal_timestamps(start_date, actor.activity_start_hour, actor.workday_length_hours, count_events)
+
+    upload_batch_to_azure({
+        "timestamp": Clock.from_timestamps_to_strings(timestamps),
+        "method": np.array(METHODS, dtype=object)[np.random.randint(0, len(METHODS), count_events)],
+        "src_ip": employee_ips[employee_indices],
+        "user_agent": employee_user_agents[employee_indices],
+        "url": get_links(actor, domains_to_browse, count_events)
+    }, "OutboundBrowsing")
 
 
 def browse_website(employee:Employee, link:str, time:float, method: str = None):
@@ -85,6 +85,16 @@ def upload_event_to_azure(events, table_name:str):
             data=[event],
             table_name=table_name)
 
+def upload_batch_to_azure(columns: "dict[str, list]", table_name:str):
+    """
+    Queue a batch of rows given as columns, e.g. {"timestamp": [...], "url": [...]}
+    """
+    from app.server.game_functions import LOG_UPLOADER
+
+    LOG_UPLOADER.send_batch(
+        data=columns,
+        table_name=table_name)
+
 @timing
 def actor_stages_watering_hole(actor:Actor, start_date: date, num_employees:int, link_type="malware_delivery"):
     """
@@ -125,9 +135,10 @@ def actor_stages_watering_hole(actor:Actor, start_date: date, num_employees:int,
         )
 
         # then browse to the malicious url
-        Trigger.user_clicks_link(
+        eventScheduler.schedule(
+            Clock.delay_time_by(start_time=time, factor="seconds"),
+            Trigger.user_clicks_link,
             recipient=employee,
             link=malicious_url,
-            actor=actor,
-            time=Clock.delay_time_by(start_time=time, factor="seconds")
+            actor=actor
         )
@@ -2,13 +2,8 @@ import random
 import string
 from datetime import datetime
 
-from faker import Faker
-from faker.providers import internet
-from faker.providers import user_agent
 from app.server.modules.clock.Clock import Clock
-# instantiate faker
-fake = Faker()
-fake.add_provider(internet)
+from app.server.modules.helpers.faker_pool import fakerPool
 
 METHODS = ["GET", "POST"]
 STATUS_CODES = ["202", "301", "302", "404", "403"]
@@ -27,7 +22,7 @@ class OutboundEvent:
         self.user_agent = user_agent
         self.method = method or random.choice(METHODS)
         self.status_code = status_code or random.choice(STATUS_CODES)
-        self.url = url or fake.uri()
+        self.url = url or fakerPool.get_one("uri")
 
     def stringify(self):
         """Return event in json format"""    
@@ -1,18 +1,18 @@
 # Import external modules
 from asyncore import write
 from re import S
-from faker import Faker
-from faker.providers import user_agent
-import uuid
+import numpy as np
 
 # Import internal modules
 from code import interact
-from flask import current_app
+from app.server.settings import gameSettings
 from app.server.models import *
 from app.server.modules.email.email import Email
 from app.server.modules.outbound_browsing.browsing_controller import browse_website
 from app.server.modules.logging.uploadLogs import LogUploader
 from app.server.modules.clock.Clock import Clock
+from app.server.modules.triggers.scheduler import eventScheduler
+from app.server.modules.helpers.identifier_factory import identifierFactory
 from app.server.modules.endpoints.file_creation_event import FileCreationEvent, File
 from app.server.modules.endpoints.processes import Process, ProcessEvent
 from app.server.modules.endpoints.endpoint_alerts import EndpointAlert
@@ -30,10 +30,6 @@ from app.server.modules.constants.constants import FILE_CREATING_PROCESSES
 
 from app.server.utils import *
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(user_agent)
-
 
 class Trigger:
     """
@@ -43,6 +39,9 @@ class Trigger:
          Use downloads file -> Process runs on user machine
 
     Logic for event trigger should be handled here ???
+
+    Each stage emits its own events and schedules the next stage on the event scheduler
+    at the time it happens, rather than calling it directly
     """
 
     @staticmethod
@@ -53,37 +52,59 @@ class Trigger:
 
         TODO: add some variability later?
         """
+        Trigger.users_receive_emails(
+            times=[email.time],
+            recipients=[recipient],
+            links=[email.link],
+            subjects=[email.subject],
+            accepted=[email.accepted],
+            authenticity=email.authenticity,
+            actor=email.actor
+        )
+
+    @staticmethod
+    def users_receive_emails(times: "list[float]", recipients: "list[Employee]", links: "list[str]", subjects: "list[str]",
+                             accepted: "list[bool]", authenticity: int, actor: Actor) -> None:
+        """
+        Batch version of user_receives_email: one row per recieved email
+        Whether each user clicks the link or reports the email is decided with masks,
+        then only the users that act on their email are fanned out into follow-on events
+        """
         from app.server.modules.alerts.alerts_controller import generate_email_alert
 
-        company = get_company()
-        action_time = Clock.delay_time_in_working_hours(
-                start_time=email.time, factor="minutes", 
-                workday_start_hour=company.activity_start_hour,
-                workday_length_hours=company.workday_length_hours, 
-                working_days_of_week=company.working_days_list
-            )
+        if not len(recipients):
+            return
+
+        accepted = np.asarray(accepted, dtype=bool)
+        awareness = np.array([recipient.awareness for recipient in recipients])
+
+        # users click on the link when the email is more convincing than they are aware
+        clicks = accepted & (np.asarray(authenticity) >= awareness)
 
-        if email.accepted:
-            if email.authenticity >= recipient.awareness and email.accepted:
-                # users click on email minutes (within working hours) after it was sent to them
-                # add time delay
-                Trigger.user_clicks_link(recipient=recipient, link=email.link, actor=email.actor, time=action_time)
+        # user didn't click the link they might report it instead
+        if actor.is_default_actor:
+            report_rate = gameSettings.FP_RATE_EMAIL_ALERTS # FP, user reports legit email
+        else:
+            report_rate = gameSettings.TP_RATE_EMAIL_ALERTS # TP, user reports malicious email
+        reports = accepted & ~clicks & (np.random.random(len(recipients)) < report_rate)
+
+        company = get_company()
+        for i in np.flatnonzero(clicks | reports):
+            # users act on the email minutes (within working hours) after it was sent to them
+            action_time = Clock.delay_time_in_working_hours(
+                    start_time=float(times[i]), factor="minutes", 
+                    workday_start_hour=company.activity_start_hour,
+                    workday_length_hours=company.workday_length_hours, 
+                    working_days_of_week=company.working_days_list
+                )
+
+            if clicks[i]:
+                eventScheduler.schedule(action_time, Trigger.user_clicks_link, recipient=recipients[i], link=links[i], actor=actor)
             else:
-                # user didn't click the link they might report it instead
-                if email.actor.is_default_actor:
-                    if random.random() < current_app.config['FP_RATE_EMAIL_ALERTS']: # FP, user reports legit email
-                        generate_email_alert(
-                            time=action_time,
-                            username=recipient.username,
-                            subject=email.subject
-                        )
-                elif random.random() < current_app.config['TP_RATE_EMAIL_ALERTS']: # TP, user reports malicious email
-                    generate_email_alert(
-                        time=action_time,
-                        username=recipient.username,
-                        subject=email.subject
-                    )
-                
+                eventScheduler.schedule(action_time, generate_email_alert,
+                    username=recipients[i].username,
+                    subject=subjects[i]
+                )
 
 
     @staticmethod
@@ -102,12 +123,12 @@ class Trigger:
         if ("." in link.split("/")[-1]) and ("html" not in link): # could be cleaner
             # This should be conditionals
             download_time = Clock.delay_time_by(time, "seconds")
-            Trigger.user_downloads_file(recipient=recipient, link=link, actor=actor, time=download_time)
+            eventScheduler.schedule(download_time, Trigger.user_downloads_file, recipient=recipient, link=link, actor=actor)
         elif actor.name != "Default":
             # Use working time delay because this is an actor hands-on-keyboard activity
             login_time = Clock.delay_time_in_working_hours(start_time=time, factor="hours", workday_start_hour=actor.activity_start_hour,
                                                            workday_length_hours=actor.workday_length_hours, working_days_of_week=actor.working_days_list)
-            Trigger.actor_auths_into_user_email(recipient=recipient, actor=actor, time=login_time)
+            eventScheduler.schedule(login_time, Trigger.actor_auths_into_user_email, recipient=recipient, actor=actor)
 
 
     @staticmethod
@@ -137,7 +158,7 @@ class Trigger:
         if actor.name != "Default":
             if actor.malware:
                 payload_time = Clock.delay_time_by(start_time=time, factor="seconds")
-                Trigger.email_attachment_drops_payload(filename, recipient, payload_time, actor)
+                eventScheduler.schedule(payload_time, Trigger.email_attachment_drops_payload, attachment_name=filename, recipient=recipient, actor=actor)
 
     @staticmethod
     def email_attachment_drops_payload(attachment_name:str, recipient: Employee, time: float, actor: Actor) -> None:
@@ -171,16 +192,15 @@ class Trigger:
             process_name=process_name
         )
         
-        if random.random() < current_app.config['TP_RATE_HOST_ALERTS']:
-            generate_host_alert(
-                time=Clock.delay_time_by(start_time=time, factor="minutes"),
+        if random.random() < gameSettings.TP_RATE_HOST_ALERTS:
+            eventScheduler.schedule(Clock.delay_time_by(start_time=time, factor="minutes"), generate_host_alert,
                 hostname=recipient.hostname,
                 filename=implant.filename,
                 sha256=implant.sha256
             )
 
         process_creation_time = Clock.delay_time_by(start_time=time, factor="minutes")
-        Trigger.payload_creates_processes(recipient, process_creation_time, actor, malware, payload=implant)
+        eventScheduler.schedule(process_creation_time, Trigger.payload_creates_processes, recipient=recipient, actor=actor, malware=malware, payload=implant)
 
 
         
@@ -213,7 +233,7 @@ class Trigger:
         if actor.post_exploit_commands:
             post_exploit_time = Clock.delay_time_in_working_hours(start_time=time, factor="hours", workday_start_hour=actor.activity_start_hour,
                                                            workday_length_hours=actor.workday_length_hours, working_days_of_week=actor.working_days_list)
-            Trigger.actor_runs_post_exploitation_commands(recipient=recipient, time=post_exploit_time, actor=actor )
+            eventScheduler.schedule(post_exploit_time, Trigger.actor_runs_post_exploitation_commands, recipient=recipient, actor=actor)
 
 
     @staticmethod
@@ -230,7 +250,7 @@ class Trigger:
 
         # Upload the recon and C2 processes to Azure
         for process in processes:
-            if random.random() < current_app.config['RATE_ACTOR_SKIPS_HANDS_ON_KEYBOARD']:
+            if random.random() < gameSettings.RATE_ACTOR_SKIPS_HANDS_ON_KEYBOARD:
                 break
             # now turn the command into necessry process object
             # print("getting actor hands on keyboard")
@@ -272,13 +292,13 @@ class Trigger:
             password = f"{recipient.username}2023"
         else:
             # Get a random password (that is incorrect) if we have an unsuccessful login
-            password = f"{uuid.uuid4()}"
+            password = identifierFactory.uuids(1)[0]
 
         auth_to_mail_server(
             timestamp= login_time,
             username=recipient.username,
             src_ip=src_ip,  
-            user_agent = fake.firefox(),
+            user_agent = identifierFactory.user_agents(1, profile="firefox")[0],
             result = result,
             password=password
         )
@@ -286,7 +306,7 @@ class Trigger:
         if result == "Successful Login":
             download_time = Clock.delay_time_in_working_hours(start_time=time, factor="minutes", workday_start_hour=actor.activity_start_hour,
                                                            workday_length_hours=actor.workday_length_hours, working_days_of_week=actor.working_days_list)
-            Trigger.actor_downloads_files_from_email(recipient=recipient.username, src_ip=src_ip, time=download_time)
+            eventScheduler.schedule(download_time, Trigger.actor_downloads_files_from_email, recipient=recipient.username, src_ip=src_ip)
 
     @staticmethod
     def actor_downloads_files_from_email(recipient:Employee, src_ip:str, time: float) -> None:
@@ -305,7 +325,7 @@ class Trigger:
             method="GET",
             status_code="200", # TODO: maybe these fail sometimes?
             url=exfil_url,
-            user_agent=fake.firefox()
+            user_agent=identifierFactory.user_agents(1, profile="firefox")[0]
         )
 
         
\ No newline at end of file
@@ -0,0 +1,54 @@
+import heapq
+from itertools import count
+
+
+class EventScheduler:
+    """
+    A discrete event scheduler for trigger chains
+
+    Instead of calling the next stage of a chain directly (and recursing deeper with every stage),
+    a trigger schedules it for the time it happens at.
+    The game releases scheduled actions in time order at the end of every simulated day;
+    an action may schedule further actions, which are released in turn if they fall on the same day.
+    Actions that happen on a later day wait in the heap until that day is released.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        # heap of (time, sequence, action, kwargs)
+        # the sequence number keeps actions with the same time in the order they were scheduled
+        self.heap = []
+        self.sequence = count()
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def schedule(self, time: float, action, **kwargs) -> None:
+        """
+        Schedule action(time=time, **kwargs) to run at time
+        """
+        heapq.heappush(self.heap, (float(time), next(self.sequence), action, kwargs))
+
+    def run_until(self, end_time: float) -> int:
+        """
+        Run every action scheduled before end_time, in time order
+        Returns the number of actions that were run
+        """
+        count_actions = 0
+        while self.heap and self.heap[0][0] < end_time:
+            time, _, action, kwargs = heapq.heappop(self.heap)
+            action(time=time, **kwargs)
+            count_actions += 1
+        return count_actions
+
+    def drain(self) -> int:
+        """
+        Run every remaining action, e.g. when the game ends
+        """
+        return self.run_until(float("inf"))
+
+
+# shared scheduler used by all triggers
+eventScheduler = EventScheduler()
@@ -0,0 +1,41 @@
+import config
+
+
+class GameSettings:
+    """
+    A plain snapshot of the game settings in config.py
+
+    The generators read rates and sizes from here instead of current_app.config,
+    so the game can run without a Flask app context (e.g. from the CLI or in a worker process),
+    and reading a setting in a per-event loop is a plain attribute lookup
+    e.g. gameSettings.RATE_USER_AUTHS_FROM_WORK
+    """
+
+    # config objects the settings are read from, in the same order as the Flask app loads them
+    CONFIG_OBJECTS = [config.DevelopmentConfig, config.ActivityVolumeSettings]
+
+    def __init__(self) -> None:
+        for config_object in GameSettings.CONFIG_OBJECTS:
+            self.load(config_object)
+
+    def load(self, config_object) -> None:
+        """
+        Copy the uppercase attributes of a config class
+        """
+        self.update({key: getattr(config_object, key) for key in dir(config_object) if key.isupper()})
+
+    def update(self, settings: dict) -> None:
+        """
+        Copy the uppercase keys of a mapping, e.g. the Flask app's config
+        """
+        for key, value in settings.items():
+            if key.isupper():
+                setattr(self, key, value)
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+
+# shared settings read by all generators
+# the web app syncs them with its config when a game is started
+gameSettings = GameSettings()
@@ -1,6 +1,9 @@
 # Import internal modules
 from app.server.models import db
 from app.server.modules.helpers.word_generator import WordGenerator
+from app.server.modules.helpers.url_synthesizer import URLSynthesizer
+from app.server.modules.helpers.faker_pool import fakerPool
+from app.server.modules.infrastructure.noise_domain_pool import noiseDomainPool
 from app.server.modules.actors.Actor import Actor
 from app.server.modules.organization.Company import Company, Employee
 from app.server.modules.clock.Clock import Clock 
@@ -10,8 +13,6 @@ from app.server.models import GameSession
 from fileinput import filename
 from enum import Enum
 import random
-from faker import Faker
-from faker.providers import internet, lorem, file
 from itsdangerous import base64_encode
 import string
 from functools import wraps
@@ -19,11 +20,6 @@ from time import time
 import names
 import numpy as np
 
-# instantiate faker
-fake = Faker()
-fake.add_provider(internet)
-fake.add_provider(file)
-fake.add_provider(lorem)
 
 # instantiate word genertor
 wordGenerator = WordGenerator()
@@ -55,22 +51,26 @@ def timing(f):
 
 def get_link(actor:Actor, actor_domains:"list[str]", return_domain:bool=False) -> str:
     """Get a link containing actor's domain"""
+    links, domains = URLSynthesizer.for_actor(actor).get_links(1, actor_domains, return_domains=True)
 
-    domain = random.choice(actor_domains)
-
-    try:
-        uri_type = random.choice(actor.get_attacks_by_type("email"))
-    except IndexError:
-        all_uri_types = ["browsing", "phishing", "malware_delivery"]
-        uri_type = random.choice(all_uri_types)
-
-    link = random.choice(["http://", "https://"]) + domain + "/" + get_uri_path(uri_type=uri_type, actor=actor)
-    
     # return both the links and the domain - 
     # so that we can access the domain without having to do a weird regex
     if return_domain:
-        return link, domain
-    return link
+        return links[0], domains[0]
+    return links[0]
+
+def get_links(actor:Actor, actor_domains:"list[str]", count:int, return_domains:bool=False):
+    """Get a batch of links containing the actor's domains"""
+    return URLSynthesizer.for_actor(actor).get_links(count, actor_domains, return_domains=return_domains)
+
+def get_actor_domains(actor:Actor) -> np.ndarray:
+    """
+    Get the domains used in an actor's links
+    The default actor's come straight from the noise domain pool, without building a list
+    """
+    if actor.is_default_actor:
+        return noiseDomainPool.get_domains()
+    return np.array(actor.domains_list, dtype=object)
 
 def get_uri_path(max_depth:int=4, max_params:int=6, uri_type:str="browsing", actor:Actor=None) -> str:
     """
@@ -82,48 +82,9 @@ def get_uri_path(max_depth:int=4, max_params:int=6, uri_type:str="browsing", act
     auth uri example
         - google.com/login
 
-    NOTE: This function is poorly optimized due to repeated iterations for URL generation. Can we make this more efficient?
+    See URLSynthesizer for generating many uri paths at once
     """
-    uri_path = ""
-
-    dir_words = ['share','files','search','published','online','images','modules','public']
-
-    # Define constants for browsing-type
-    param_names = ['query','source','id','keyword', 'search', 'user','uid','aid','tracking','type']
-    param_values = wordGenerator.get_words(10)
-
-    login_paths = ['login', 'login.html', 'signin', 'sign_in', 'enter','login?language=en', 'auth']
-
-   
-    # Generate these using faker
-    file_extensions = ['zip','rar','docx','7z','pptx', 'xls','exe']
-
-    # Generate the URL
-    for i in range(random.randint(1,max_depth)):
-        if i > 0:
-            # if this isn't the first dir, add a slash to the end
-            uri_path += "/"
-
-        dir_word = random.choice(dir_words)
-        uri_path += f"{dir_word}"
-            
-    if uri_type == "browsing":
-        for _ in range(random.randint(1,max_params)):
-            param_name = random.choice(param_names)
-            param_value = random.choice(param_values)
-            uri_path += f"?{param_name}={param_value}"
-    elif uri_type == "malware_delivery":
-        # Overide default filenames if new ones provided in config
-        if actor and actor.get_file_names():
-            file_name = random.choice(actor.get_file_names())
-        else:
-            # Randomly append filenames
-            file_name = f"{random.choice(param_values)}.{random.choice(file_extensions)}"
-        uri_path += f"/{file_name}"
-    elif uri_type == "phishing":
-        # crude but will do for now
-        uri_path += f"/{random.choice(login_paths)}"
-    return uri_path
+    return URLSynthesizer.for_actor(actor).get_uri_paths(1, uri_type=uri_type, max_depth=max_depth, max_params=max_params)[0]
 
 
 def get_employees(roles_list=None, count=0) -> "list[Employee]":
@@ -170,6 +131,9 @@ def get_actors() -> "list[Actor]":
 def get_email_prefix() -> str:
     return "_".join(names.get_full_name().split(" ")).lower()
 
+# names is slow, so this pool is kept small
+fakerPool.register("email_prefix", get_email_prefix, pool_size=200)
+
 def write_seed_files(max_num_files: int = 25):
     eicar_string = 'X5O!P%@AP[4\PZX54(P^)7CC)7}$EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*'
     for i in range(1, max_num_files):
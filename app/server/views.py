@@ -13,9 +13,10 @@ from sqlalchemy.sql.expression import func, select
 
 # Import module models (i.e. Company, Employee, Actor, DNSRecord)
 from app.server.models import db, Team, Users, Roles, GameSession
+from app.server.settings import gameSettings
 from app.server.modules.organization.Company import Company, Employee
 from app.server.modules.clock.Clock import Clock
-from app.server.modules.logging.uploadLogs import LogUploader
+from app.server.modules.logging.kusto_clients import kustoClients
 from app.server.modules.email.email_controller import gen_email
 from app.server.modules.infrastructure.DNSRecord import DNSRecord
 from app.server.modules.outbound_browsing.browsing_controller import *
@@ -59,8 +60,7 @@ def manage_game():
 @roles_required('Admin')
 @login_required
 def manage_database():
-    log_uploader = LogUploader()
-    perms = log_uploader.get_user_permissions()
+    perms = kustoClients.get_user_permissions()
     return render_template("admin/manage_database.html", perms=perms)
 
 @main.route("/admin/start_game", methods=['GET'])
@@ -71,10 +71,23 @@ def call_start():
     web endpoint to start the game. 
     Returns game state - this is used to update the view
     """
+    # the game reads its settings from a snapshot, bring it in line with the app's config
+    gameSettings.update(current_app.config)
     start_game()
     return jsonify({"STATE": True})
 
 
+@main.route("/admin/progress", methods=['GET'])
+@roles_required('Admin')
+@login_required
+def progress():
+    """
+    Progress of the running game as JSON:
+    upload watermarks, ingestion rates and batch sizes, memory use
+    """
+    return jsonify(get_progress())
+
+
 @main.route("/admin/stop_game", methods=['GET'])
 @roles_required('Admin')
 @login_required
@@ -196,10 +209,8 @@ def update_permissions():
     """
     try:
         permissions_list = request.form['plist']
-        log_uploader = LogUploader()
-        user_strings = [x for x in permissions_list.split("\n") if x]
-        for user_string in user_strings:
-                log_uploader.add_user_permissions(user_string)
+        user_strings = [x.strip() for x in permissions_list.split("\n") if x.strip()]
+        kustoClients.add_user_permissions(user_strings)
         return jsonify(success=True)
     except Exception as e:
         print(e)
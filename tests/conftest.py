@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Importing any app module creates the Flask app and its databases,
+# so point them at a scratch directory before anything is imported
+DATABASE_DIR = tempfile.mkdtemp(prefix="kc7_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(DATABASE_DIR, 'flaskr.db')}")
+os.environ.setdefault("GAME_STATE_DATABASE_URL", f"sqlite:///{os.path.join(DATABASE_DIR, 'game_state.db')}")
+
+# run from the repository root, like app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
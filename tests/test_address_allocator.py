@@ -0,0 +1,37 @@
+from app.server.modules.infrastructure.address_allocator import AddressAllocator
+
+
+def test_allocated_public_ips_are_unique():
+    allocator = AddressAllocator()
+    first = allocator.allocate_public_ips(5000).tolist()
+    second = allocator.allocate_public_ips(5000).tolist()
+
+    assert len(set(first + second)) == 10000
+    assert allocator.count_allocated == 10000
+    assert all(allocator.is_allocated(address) for address in first + second)
+
+
+def test_reserved_ips_are_never_allocated():
+    allocator = AddressAllocator()
+    reserved = allocator.get_unallocated_public_ips(1000).tolist()
+    allocator.reserve(reserved + [""])
+
+    assert allocator.count_allocated == len(set(reserved))
+    assert set(allocator.allocate_public_ips(5000).tolist()).isdisjoint(reserved)
+
+
+def test_unallocated_ips_are_not_allocated():
+    allocator = AddressAllocator()
+    allocated = allocator.allocate_public_ips(1000).tolist()
+    unallocated = allocator.get_unallocated_public_ips(5000).tolist()
+
+    assert set(unallocated).isdisjoint(allocated)
+    # looking addresses up doesn't allocate them
+    assert allocator.count_allocated == 1000
+
+
+def test_internal_ip_plan():
+    assert AddressAllocator.get_internal_ip(0) == "192.168.0.2"
+    assert AddressAllocator.get_internal_ip(253) == "192.168.0.255"
+    assert AddressAllocator.get_internal_ip(65533) == "10.0.0.2"
+    assert AddressAllocator.get_internal_ips(65532, 2).tolist() == ["192.168.255.254", "10.0.0.2"]
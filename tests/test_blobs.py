@@ -0,0 +1,56 @@
+import gzip
+import json
+import pandas as pd
+from azure.kusto.data.data_format import DataFormat
+
+from app.server.modules.logging.blobs import BlobWriter, get_data_format
+
+
+def make_rows(count: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "timestamp": [f"2023-03-01 00:00:{i:02d}" for i in range(count)],
+        "host": [f"host{i}" for i in range(count)]
+    })
+
+
+def test_csv_blob_counts_rows_and_raw_size(tmp_path):
+    blob = BlobWriter(directory=str(tmp_path)).get_blob("Email")
+    blob.write(make_rows(3))
+    blob.write(make_rows(2))
+    assert len(blob) == 5
+
+    path, count_rows, raw_size = blob.close()
+    with gzip.open(path, "rb") as f:
+        data = f.read()
+    assert path.endswith(".csv.gz")
+    assert count_rows == 5
+    assert raw_size == len(data)
+    # no header, Kusto would ingest it as a row
+    assert data.decode("utf-8").splitlines()[0] == "2023-03-01 00:00:00,host0"
+    assert get_data_format(path) == DataFormat.CSV
+
+
+def test_multijson_blob_has_one_object_per_line(tmp_path):
+    blob = BlobWriter(directory=str(tmp_path), blob_format="multijson").get_blob("Email")
+    blob.write(make_rows(2))
+
+    path, count_rows, raw_size = blob.close()
+    with gzip.open(path, "rt") as f:
+        rows = [json.loads(line) for line in f]
+    assert rows == [{"timestamp": "2023-03-01 00:00:00", "host": "host0"},
+                    {"timestamp": "2023-03-01 00:00:01", "host": "host1"}]
+    assert get_data_format(path) == DataFormat.MULTIJSON
+
+
+def test_empty_blob_closes_to_none_and_is_reused(tmp_path):
+    writer = BlobWriter(directory=str(tmp_path))
+    blob = writer.get_blob("Email")
+    assert blob.close() is None
+
+    blob.write(make_rows(1))
+    first_path, _, _ = blob.close()
+    blob.write(make_rows(1))
+    second_path, _, _ = blob.close()
+    # every closed blob is a new file
+    assert first_path != second_path
+    assert writer.tables() == []
@@ -0,0 +1,103 @@
+import os
+import pandas as pd
+import pytest
+from azure.kusto.data.data_format import DataFormat
+from azure.kusto.ingest import IngestionProperties
+
+from app.server.settings import gameSettings
+from app.server.modules.logging.blobs import BlobWriter
+from app.server.modules.logging.ingestion import ReliableIngestClient
+
+
+class FakeIngestClient:
+    """
+    Records uploads, failing the first count_failures of them
+    """
+
+    def __init__(self, count_failures: int = 0) -> None:
+        self.count_failures = count_failures
+        self.uploads = []
+
+    def _upload(self, upload):
+        if self.count_failures:
+            self.count_failures -= 1
+            raise Exception("throttled")
+        self.uploads.append(upload)
+        return "ok"
+
+    def ingest_from_dataframe(self, df, ingestion_properties):
+        return self._upload((ingestion_properties.table, len(df)))
+
+    def ingest_from_file(self, file_descriptor, ingestion_properties):
+        return self._upload((ingestion_properties.table, file_descriptor.path))
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    spool_dir = str(tmp_path / "spool")
+    monkeypatch.setattr(gameSettings, "INGEST_SPOOL_DIR", spool_dir)
+    monkeypatch.setattr(gameSettings, "INGEST_MAX_RETRIES", 2)
+    monkeypatch.setattr(gameSettings, "INGEST_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(gameSettings, "INGEST_MAX_BACKOFF_SECONDS", 0)
+    return spool_dir
+
+
+def get_properties(table_name: str, data_format: DataFormat = DataFormat.CSV) -> IngestionProperties:
+    return IngestionProperties(database="test", table=table_name, data_format=data_format)
+
+
+def make_rows(count: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "timestamp": [f"2023-03-01 00:00:{i:02d}" for i in range(count)],
+        "host": [f"host{i}" for i in range(count)]
+    })
+
+
+def test_upload_is_retried(spool_dir):
+    ingest_client = FakeIngestClient(count_failures=2)
+    client = ReliableIngestClient(ingest_client)
+
+    assert client.ingest_from_dataframe(make_rows(3), get_properties("Email")) == "ok"
+    assert ingest_client.uploads == [("Email", 3)]
+    assert client.get_stats() == {"retries": 2, "spooled_batches": 0}
+
+
+def test_failed_batch_is_spooled_and_replayed(spool_dir):
+    # every attempt fails: the first try and both retries
+    client = ReliableIngestClient(FakeIngestClient(count_failures=3))
+
+    assert client.ingest_from_dataframe(make_rows(3), get_properties("Email")) is None
+    assert client.get_stats() == {"retries": 2, "spooled_batches": 1}
+    [file_name] = os.listdir(spool_dir)
+    assert file_name.startswith("Email__") and file_name.endswith(".csv")
+
+    ingest_client = FakeIngestClient()
+    assert ReliableIngestClient(ingest_client).replay() == (1, 0)
+    assert ingest_client.uploads == [("Email", 3)]
+    assert os.listdir(spool_dir) == []
+
+
+def test_failed_blob_is_spooled_and_replayed(spool_dir, tmp_path):
+    blob = BlobWriter(directory=str(tmp_path / "blobs")).get_blob("ProcessEvents")
+    blob.write(make_rows(4))
+    path, _, raw_size = blob.close()
+    client = ReliableIngestClient(FakeIngestClient(count_failures=3))
+
+    assert client.ingest_from_file(path, raw_size, get_properties("ProcessEvents")) is None
+    # the blob is moved to the spool, not copied
+    assert not os.path.exists(path)
+    [file_name] = os.listdir(spool_dir)
+    assert file_name.startswith("ProcessEvents__") and file_name.endswith(".csv.gz")
+
+    ingest_client = FakeIngestClient()
+    assert ReliableIngestClient(ingest_client).replay() == (1, 0)
+    assert ingest_client.uploads == [("ProcessEvents", os.path.join(spool_dir, file_name))]
+    assert os.listdir(spool_dir) == []
+
+
+def test_batch_that_fails_again_stays_spooled(spool_dir):
+    client = ReliableIngestClient(FakeIngestClient(count_failures=3))
+    client.ingest_from_dataframe(make_rows(1), get_properties("Email"))
+
+    assert ReliableIngestClient(FakeIngestClient(count_failures=3)).replay() == (0, 1)
+    assert len(os.listdir(spool_dir)) == 1
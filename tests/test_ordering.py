@@ -0,0 +1,47 @@
+import os
+import pandas as pd
+
+from app.server.modules.logging.ordering import ExternalSorter
+
+
+def make_rows(times: "list[str]") -> pd.DataFrame:
+    return pd.DataFrame({"timestamp": times, "host": [f"host{i}" for i in range(len(times))]})
+
+
+def merged_times(sorter: ExternalSorter, table_name: str, watermark: str = None) -> "list[str]":
+    return [time for df in sorter.merge(table_name, watermark=watermark) for time in df["timestamp"]]
+
+
+def test_merge_orders_rows_across_runs(tmp_path):
+    sorter = ExternalSorter(directory=str(tmp_path), chunk_size=2)
+    sorter.add_run("Email", make_rows(["2023-03-01 10:00:00", "2023-03-01 08:00:00"]))
+    sorter.add_run("Email", make_rows(["2023-03-01 09:00:00", "2023-03-01 11:00:00.500000"]))
+
+    assert merged_times(sorter, "Email") == [
+        "2023-03-01 08:00:00", "2023-03-01 09:00:00", "2023-03-01 10:00:00", "2023-03-01 11:00:00.500000"]
+    # every run has been merged and removed
+    assert sorter.tables() == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_merge_writes_rows_after_the_watermark_back(tmp_path):
+    sorter = ExternalSorter(directory=str(tmp_path))
+    sorter.add_run("Email", make_rows(["2023-03-03 00:00:00", "2023-03-01 00:00:00"]))
+    sorter.add_run("Email", make_rows(["2023-03-02 00:00:00", "2023-03-04 00:00:00"]))
+
+    assert merged_times(sorter, "Email", watermark="2023-03-03 00:00:00") == [
+        "2023-03-01 00:00:00", "2023-03-02 00:00:00"]
+    # the rest is held as a single run and merged with later runs
+    assert len(sorter.runs["Email"]) == 1
+    sorter.add_run("Email", make_rows(["2023-03-02 12:00:00"]))
+    assert merged_times(sorter, "Email") == [
+        "2023-03-02 12:00:00", "2023-03-03 00:00:00", "2023-03-04 00:00:00"]
+
+
+def test_discard_removes_runs(tmp_path):
+    sorter = ExternalSorter(directory=str(tmp_path))
+    sorter.add_run("Email", make_rows(["2023-03-01 00:00:00"]))
+    sorter.discard()
+
+    assert sorter.tables() == []
+    assert os.listdir(tmp_path) == []
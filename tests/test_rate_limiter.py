@@ -0,0 +1,34 @@
+from app.server.modules.logging.rate_limiter import IngestionGovernor
+
+
+def upload(governor: IngestionGovernor, table_name: str, latency: float, is_success: bool = True) -> int:
+    count_rows = governor.get_batch_size(table_name)
+    governor.acquire(table_name, count_rows, count_rows * 100)
+    governor.record(table_name, count_rows, count_rows * 100, latency, is_success)
+    return governor.get_batch_size(table_name)
+
+
+def test_batch_size_slow_starts_then_backs_off():
+    governor = IngestionGovernor()
+    governor.reset(target_latency=5.0, min_batch_rows=1000, max_batch_rows=100000)
+    assert governor.get_batch_size("Email") == 1000
+
+    # slow start doubles the batch size while uploads are fast
+    assert [upload(governor, "Email", 1.0) for _ in range(3)] == [2000, 4000, 8000]
+    # a slow batch halves it, and it grows additively after that
+    assert upload(governor, "Email", 10.0) == 4000
+    assert upload(governor, "Email", 1.0) == 5000
+    assert upload(governor, "Email", 1.0, is_success=False) == 2500
+
+    stats = governor.get_stats()["Email"]
+    assert stats["batches"] == 6 and stats["failures"] == 1 and stats["batch_size"] == 2500
+    # other tables are paced on their own
+    assert governor.get_batch_size("ProcessEvents") == 1000
+
+
+def test_batch_size_stays_within_bounds():
+    governor = IngestionGovernor()
+    governor.reset(min_batch_rows=1000, max_batch_rows=3000)
+
+    assert [upload(governor, "Email", 0.1) for _ in range(3)] == [2000, 3000, 3000]
+    assert [upload(governor, "Email", 60.0) for _ in range(3)] == [1500, 1000, 1000]
@@ -0,0 +1,46 @@
+from app.server.modules.triggers.scheduler import EventScheduler
+
+
+def test_actions_run_in_time_order():
+    scheduler = EventScheduler()
+    ran = []
+    for time, name in [(30, "c"), (10, "a"), (20, "b"), (10, "a2")]:
+        scheduler.schedule(time, lambda time, name: ran.append((time, name)), name=name)
+
+    assert scheduler.run_until(25) == 3
+    # actions at the same time run in the order they were scheduled
+    assert ran == [(10.0, "a"), (10.0, "a2"), (20.0, "b")]
+    assert len(scheduler) == 1
+
+    assert scheduler.drain() == 1
+    assert ran[-1] == (30.0, "c")
+    assert len(scheduler) == 0
+
+
+def test_run_until_excludes_end_time():
+    scheduler = EventScheduler()
+    ran = []
+    scheduler.schedule(100, lambda time: ran.append(time))
+
+    assert scheduler.run_until(100) == 0
+    assert scheduler.run_until(101) == 1
+    assert ran == [100.0]
+
+
+def test_actions_can_schedule_further_actions():
+    scheduler = EventScheduler()
+    ran = []
+
+    def stage(time, remaining):
+        ran.append(time)
+        if remaining:
+            scheduler.schedule(time + 10, stage, remaining=remaining - 1)
+
+    scheduler.schedule(0, stage, remaining=5)
+    scheduler.schedule(15, lambda time: ran.append("other"))
+
+    # stages inside the window are run as they are scheduled, the rest wait for a later window
+    assert scheduler.run_until(35) == 5
+    assert ran == [0.0, 10.0, "other", 20.0, 30.0]
+    assert scheduler.drain() == 2
+    assert ran[-2:] == [40.0, 50.0]